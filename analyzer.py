@@ -4,12 +4,16 @@ import logging
 import pandas as pd
 import re
 import io
+import warnings
 import base64
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
 import matplotlib.pyplot as plt
 from app import db
 from models import ScrapedData, AnalysisResult
+from cache import BoundedCache
+from listing import listing_column, listing_columns
+from write_queue import run_write
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -111,6 +115,109 @@ def remove_outliers(data):
     upper_bound = Q3 + 1.5 * IQR
     return data[(data >= lower_bound) & (data <= upper_bound)]
 
+def _finite_or_none(x):
+    """
+    Converts a numpy scalar to float, mapping NaN and infinity to None
+    """
+    x = float(x)
+    return x if np.isfinite(x) else None
+
+def _listing_matrix(listings, parameters):
+    """
+    Converts listing records (or dictionaries) into a float matrix with one column per parameter
+    
+    Missing values become NaN.
+    """
+    columns = listing_columns(listings, parameters)
+    return np.column_stack([columns[parameter] for parameter in parameters])
+
+class SummaryAccumulator:
+    """
+    Accumulates summary statistics over batches of listings
+    
+    Each batch is processed in one vectorized pass. Counts, means and variances are merged
+    batch by batch (Chan's parallel algorithm) and min/max are tracked exactly, so listings
+    are not kept. Quartiles are exact, so every non-null value is retained as float32: memory
+    grows linearly with the number of listings, about 4 bytes per value of each parameter.
+    """
+    
+    def __init__(self):
+        self.parameters = [param['id'] for param in get_analysis_parameters()]
+        size = len(self.parameters)
+        self.listing_count = 0
+        self.counts = np.zeros(size, dtype=np.int64)
+        self.means = np.zeros(size)
+        self.m2 = np.zeros(size)
+        self.mins = np.full(size, np.inf)
+        self.maxs = np.full(size, -np.inf)
+        self._values = [[] for _ in range(size)]
+    
+    def add(self, listings):
+        """
+        Adds a batch of listing records or dictionaries
+        """
+        if not listings:
+            return
+        
+        values = _listing_matrix(listings, self.parameters)
+        present = ~np.isnan(values)
+        counts = np.count_nonzero(present, axis=0)
+        
+        with warnings.catch_warnings():
+            # All-NaN columns produce NaN, which is neutralized below
+            warnings.simplefilter('ignore', RuntimeWarning)
+            batch_means = np.where(counts > 0, np.nanmean(values, axis=0), 0.0)
+            batch_m2 = np.nansum((values - batch_means) ** 2, axis=0)
+            self.mins = np.fmin(self.mins, np.nanmin(values, axis=0))
+            self.maxs = np.fmax(self.maxs, np.nanmax(values, axis=0))
+        
+        total = self.counts + counts
+        delta = batch_means - self.means
+        safe_total = np.maximum(total, 1)
+        self.means = self.means + delta * counts / safe_total
+        self.m2 = self.m2 + batch_m2 + delta ** 2 * self.counts * counts / safe_total
+        self.counts = total
+        self.listing_count += len(listings)
+        
+        for i in range(len(self.parameters)):
+            if counts[i]:
+                self._values[i].append(values[present[:, i], i].astype(np.float32))
+    
+    def result(self):
+        """
+        Returns the accumulated summary
+        
+        Returns:
+            dict: Summary with keys:
+                - listing_count (int): Number of listings
+                - statistics (dict): Per-parameter dict with count (non-null values),
+                  mean, std, min, q1, median, q3 and max
+        """
+        statistics = {}
+        for i, parameter in enumerate(self.parameters):
+            count = int(self.counts[i])
+            if count == 0:
+                statistics[parameter] = {'count': 0, 'mean': None, 'std': None, 'min': None,
+                                         'q1': None, 'median': None, 'q3': None, 'max': None}
+                continue
+            
+            quartiles = np.quantile(np.concatenate(self._values[i]).astype(float), [0.25, 0.5, 0.75])
+            statistics[parameter] = {
+                'count': count,
+                'mean': _finite_or_none(self.means[i]),
+                'std': _finite_or_none(np.sqrt(self.m2[i] / (count - 1))) if count > 1 else None,
+                'min': _finite_or_none(self.mins[i]),
+                'q1': _finite_or_none(quartiles[0]),
+                'median': _finite_or_none(quartiles[1]),
+                'q3': _finite_or_none(quartiles[2]),
+                'max': _finite_or_none(self.maxs[i])
+            }
+        
+        return {
+            'listing_count': self.listing_count,
+            'statistics': statistics
+        }
+
 def format_axis_label(x, include_rub=False):
     """
     Formats axis labels for better readability
@@ -128,26 +235,17 @@ def format_axis_label(x, include_rub=False):
         return f"{x/1000:.0f}K{'₽' if include_rub else ''}"
     return f"{x:.0f}{'₽' if include_rub else ''}"
 
-def generate_visualization(data, parameter, title=None, bins=30):
+def _basic_statistics(clean_data):
     """
-    Generates visualization for the given data and parameters
+    Calculates the statistics shown with a histogram
     
     Args:
-        data (pandas.Series): Data to visualize
-        parameter (str): Parameter being analyzed
-        title (str, optional): Custom title for visualization
-        bins (int, optional): Number of bins for histogram
+        clean_data (pandas.Series): Data without outliers
         
     Returns:
-        dict: Visualization data with keys:
-            - image_base64 (str): Base64-encoded image data
-            - statistics (dict): Statistical information
+        dict: count, mean, median, min, max and std
     """
-    # Remove outliers
-    clean_data = remove_outliers(data)
-    
-    # Calculate statistics
-    stats = {
+    return {
         'count': len(clean_data),
         'mean': float(clean_data.mean()),
         'median': float(clean_data.median()),
@@ -155,8 +253,21 @@ def generate_visualization(data, parameter, title=None, bins=30):
         'max': float(clean_data.max()),
         'std': float(clean_data.std())
     }
+
+def _choose_bins(clean_data, parameter, bins, stats):
+    """
+    Picks the histogram bins for the data
     
-    # Check data variance to determine appropriate bin strategy
+    Args:
+        clean_data (pandas.Series): Data without outliers
+        parameter (str): Parameter being analyzed
+        bins (int): Requested number of bins
+        stats (dict): Statistics from _basic_statistics
+        
+    Returns:
+        tuple: (actual_bins, unique_values) where actual_bins is a bin count or, for data
+            with few distinct values, the sorted values themselves
+    """
     data_range = stats['max'] - stats['min']
     unique_values = clean_data.nunique()
     
@@ -179,6 +290,12 @@ def generate_visualization(data, parameter, title=None, bins=30):
             actual_bins = bins
             logger.info(f"Using {bins} bins for parameter {parameter}")
     
+    return actual_bins, unique_values
+
+def _draw_histogram(clean_data, parameter, title, actual_bins, unique_values, stats):
+    """
+    Draws the histogram with mean and median lines on a new matplotlib figure
+    """
     # Create histogram visualization
     plt.figure(figsize=(12, 6), facecolor='white')
     
@@ -258,15 +375,28 @@ def generate_visualization(data, parameter, title=None, bins=30):
     
     plt.ylabel("Number of Listings", labelpad=10)
     plt.legend(frameon=True, facecolor='white', shadow=True)
+
+def _render_png():
+    """
+    Renders the current matplotlib figure to PNG and closes it
     
-    # Save figure to a base64-encoded string
+    Returns:
+        bytes: PNG image
+    """
     buffer = io.BytesIO()
     plt.savefig(buffer, format='png', bbox_inches='tight')
-    buffer.seek(0)
-    image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
     plt.close()
+    return buffer.getvalue()
+
+def _build_chart_data(clean_data, parameter, actual_bins, unique_values, stats):
+    """
+    Builds the histogram data for Chart.js, using the same bins as the rendered image
+    
+    Returns:
+        dict: labels and values
+    """
+    include_rub = parameter == 'price'
     
-    # Prepare histogram data for Chart.js
     # For area with narrow range, use custom bins
     if parameter == 'area' and stats['max'] - stats['min'] < 10:
         # Если диапазон площади очень узкий, используем бины для каждого уникального значения
@@ -308,12 +438,67 @@ def generate_visualization(data, parameter, title=None, bins=30):
             'values': hist.tolist()
         }
     
+    return chart_data
+
+def generate_visualization(data, parameter, title=None, bins=30):
+    """
+    Generates visualization for the given data and parameters
+    
+    Args:
+        data (pandas.Series): Data to visualize
+        parameter (str): Parameter being analyzed
+        title (str, optional): Custom title for visualization
+        bins (int, optional): Number of bins for histogram
+        
+    Returns:
+        dict: Visualization data with keys:
+            - image_base64 (str): Base64-encoded image data
+            - statistics (dict): Statistical information
+    """
+    # Remove outliers
+    clean_data = remove_outliers(data)
+    
+    # Calculate statistics
+    stats = _basic_statistics(clean_data)
+    
+    # Check data variance to determine appropriate bin strategy
+    actual_bins, unique_values = _choose_bins(clean_data, parameter, bins, stats)
+    
+    # Create histogram visualization and save it to a base64-encoded string
+    _draw_histogram(clean_data, parameter, title, actual_bins, unique_values, stats)
+    image_base64 = base64.b64encode(_render_png()).decode('utf-8')
+    
+    # Prepare histogram data for Chart.js
+    chart_data = _build_chart_data(clean_data, parameter, actual_bins, unique_values, stats)
+    
     return {
         'image_base64': image_base64,
         'statistics': stats,
         'chart_data': chart_data
     }
 
+def _store_analysis(data_id, parameter, title, bins, viz_result):
+    """
+    Adds an analysis result to the session without committing
+    
+    Returns:
+        int: ID of the new analysis
+    """
+    new_analysis = AnalysisResult(
+        data_id=data_id,
+        parameter=parameter,
+        title=title,
+        bins=bins,
+        statistics=json.dumps(viz_result['statistics']),
+        visualization_data=json.dumps({
+            'image_base64': viz_result['image_base64'],
+            'chart_data': viz_result['chart_data']
+        })
+    )
+    db.session.add(new_analysis)
+    db.session.flush()
+    return new_analysis.id
+
 def analyze_data(data_id, analysis_params):
     """
     Analyzes scraped data with the given parameters
@@ -339,9 +524,6 @@ def analyze_data(data_id, analysis_params):
         if not scraped_data:
             return {"success": False, "error": f"No scraped data found with ID: {data_id}"}
         
-        # Parse JSON data
-        data_json = json.loads(scraped_data.data)
-        
         # Extract parameter to analyze
         parameter = analysis_params.get('parameter')
         title = analysis_params.get('title', '')
@@ -350,32 +532,22 @@ def analyze_data(data_id, analysis_params):
         if not parameter:
             return {"success": False, "error": "No parameter specified for analysis"}
         
-        # Create DataFrame from listings
-        listings = data_json.get('listings', [])
-        df = pd.DataFrame(listings)
-        
-        # Добавляем логирование для отладки
-        logger.info(f"Available columns in data: {list(df.columns)}")
-        logger.info(f"Sample data from first 3 listings: {listings[:3]}")
-        
         # Check if parameter exists in data
-        if parameter not in df.columns:
+        if parameter not in {param['id'] for param in get_analysis_parameters()}:
             return {"success": False, "error": f"Parameter '{parameter}' not found in the data"}
         
-        # Выводим данные по параметру перед обработкой
-        logger.info(f"Raw {parameter} values before extraction: {df[parameter].head().tolist()}")
+        # Only the requested column is extracted while listing records are streamed batch by batch
+        from storage import iter_listing_records
+        values = pd.Series(listing_column(iter_listing_records(scraped_data), parameter))
         
-        # Extract numeric data from parameter
-        df[parameter] = df[parameter].apply(extract_number)
-        
-        # Выводим данные после извлечения чисел
-        logger.info(f"Processed {parameter} values after extraction: {df[parameter].head().tolist()}")
+        # Выводим данные по параметру
+        logger.info(f"Extracted {parameter} values: {values.head().tolist()}")
         
         # Filter out missing values
-        data = df[parameter].dropna()
+        data = values.dropna()
         
         # Выводим количество действительных значений
-        logger.info(f"Valid {parameter} values count: {len(data)} out of {len(df)}")
+        logger.info(f"Valid {parameter} values count: {len(data)} out of {len(values)}")
         
         if len(data) == 0:
             return {"success": False, "error": f"No valid numeric data found for parameter '{parameter}'"}
@@ -384,25 +556,13 @@ def analyze_data(data_id, analysis_params):
         viz_result = generate_visualization(data, parameter, title, bins)
         
         # Save analysis results to database
-        new_analysis = AnalysisResult(
-            data_id=data_id,
-            parameter=parameter,
-            title=title,
-            bins=bins,
-            statistics=json.dumps(viz_result['statistics']),
-            visualization_data=json.dumps({
-                'image_base64': viz_result['image_base64'],
-                'chart_data': viz_result['chart_data']
-            })
-        )
-        db.session.add(new_analysis)
-        db.session.commit()
-        
-        logger.info(f"Analysis completed successfully. Analysis ID: {new_analysis.id}")
+        analysis_id = run_write(_store_analysis, data_id, parameter, title, bins, viz_result)
+        
+        logger.info(f"Analysis completed successfully. Analysis ID: {analysis_id}")
         
         return {
             "success": True,
-            "analysis_id": new_analysis.id
+            "analysis_id": analysis_id
         }
         
     except Exception as e:
@@ -412,5 +572,88 @@ def analyze_data(data_id, analysis_params):
             "error": str(e)
         }
 
+# Cleaned, sorted numeric values per (data_id, parameter), used for interactive rebinning.
+# Scraped data never changes after insert, so entries only go stale when retention deletes it.
+_sorted_values_cache = BoundedCache(maxsize=int(os.environ.get("HISTOGRAM_CACHE_SIZE", 64)))
+
+def evict_sorted_values(data_id):
+    """
+    Removes the cached sorted values of every parameter of a scraped dataset
+    """
+    for param in get_analysis_parameters():
+        _sorted_values_cache.pop((data_id, param['id']))
+
+def get_sorted_values(data_id, parameter):
+    """
+    Returns the cleaned, sorted numeric values of a parameter for a scraped dataset
+    
+    Values go through the same extraction and outlier removal as analyze_data. Results
+    are kept in a bounded in-process cache.
+    
+    Args:
+        data_id (int): ID of the scraped data
+        parameter (str): Parameter to extract
+        
+    Returns:
+        numpy.ndarray: Sorted values, or None if the scraped data does not exist
+    """
+    def load():
+        scraped_data = ScrapedData.query.get(data_id)
+        if not scraped_data:
+            return None
+        
+        # Only the requested column is collected while listing records are streamed batch by batch
+        from storage import iter_listing_records
+        data = pd.Series(listing_column(iter_listing_records(scraped_data), parameter)).dropna()
+        if len(data) == 0:
+            return np.empty(0)
+        
+        return np.sort(remove_outliers(data).to_numpy())
+    
+    return _sorted_values_cache.get_or_create((data_id, parameter), load)
+
+def compute_histogram(sorted_values, parameter, bins=30, range_min=None, range_max=None):
+    """
+    Counts sorted values into equal-width bins using binary search
+    
+    Each bin edge is located with np.searchsorted, so the cost depends on the number of
+    bins rather than the number of values. Bins are half-open except the last one, which
+    includes its right edge, matching np.histogram.
+    
+    Args:
+        sorted_values (numpy.ndarray): Values sorted in ascending order
+        parameter (str): Parameter being analyzed, used for label formatting
+        bins (int, optional): Number of bins
+        range_min (float, optional): Left edge of the first bin, defaults to the minimum value
+        range_max (float, optional): Right edge of the last bin, defaults to the maximum value
+        
+    Returns:
+        dict: Chart.js-ready data with keys labels, values and bin_edges,
+            plus count of values inside the range
+    """
+    if len(sorted_values) == 0:
+        return {'labels': [], 'values': [], 'bin_edges': [], 'count': 0}
+    
+    lower = float(sorted_values[0]) if range_min is None else float(range_min)
+    upper = float(sorted_values[-1]) if range_max is None else float(range_max)
+    if upper < lower:
+        raise ValueError("Range maximum must not be less than range minimum")
+    if upper == lower:
+        # Same convention as np.histogram for a single distinct value
+        lower, upper = lower - 0.5, upper + 0.5
+    
+    edges = np.linspace(lower, upper, bins + 1)
+    positions = np.searchsorted(sorted_values, edges, side='left')
+    positions[-1] = np.searchsorted(sorted_values, upper, side='right')
+    counts = np.diff(positions)
+    
+    include_rub = parameter == 'price'
+    return {
+        'labels': [format_axis_label((edges[i] + edges[i+1])/2, include_rub) for i in range(bins)],
+        'values': counts.tolist(),
+        'bin_edges': edges.tolist(),
+        'count': int(counts.sum())
+    }
+
 # Add import here to avoid circular imports
 import numpy as np
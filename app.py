@@ -1,9 +1,12 @@
 import os
+import math
 import logging
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+import click
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, Response, stream_with_context, make_response
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 import json
+from datetime import datetime
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -24,23 +27,150 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
 }
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+# Configure bulk scraping limits
+app.config["SCRAPE_BULK_MAX_URLS"] = int(os.environ.get("SCRAPE_BULK_MAX_URLS", 500))
+app.config["SCRAPE_BULK_CONCURRENCY"] = int(os.environ.get("SCRAPE_BULK_CONCURRENCY", 4))
+app.config["SCRAPE_BULK_BATCH_SIZE"] = int(os.environ.get("SCRAPE_BULK_BATCH_SIZE", 50))
+
+# Seconds between keep-alive comments on idle progress streams
+app.config["SCRAPE_EVENTS_KEEPALIVE"] = float(os.environ.get("SCRAPE_EVENTS_KEEPALIVE", 15))
+
+# SQLite production mode: WAL journaling and tuned pragmas on every connection, and scrape and
+# analysis writes through a single writer thread per process
+app.config["SQLITE_PRODUCTION_MODE"] = (
+    os.environ.get("SQLITE_PRODUCTION_MODE", "").lower() in ('1', 'true', 'yes')
+    and app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite")
+)
+app.config["SQLITE_BUSY_TIMEOUT"] = int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000))
+app.config["SQLITE_CACHE_SIZE_KB"] = int(os.environ.get("SQLITE_CACHE_SIZE_KB", 20000))
+app.config["WRITE_QUEUE_MAX_BATCH"] = int(os.environ.get("WRITE_QUEUE_MAX_BATCH", 32))
+
+# Retention policy and schedule; a rule is disabled while its variable is not set
+for name, cast in (("RETENTION_MAX_AGE_DAYS", float), ("RETENTION_KEEP_PER_URL", int),
+                   ("RETENTION_IMAGE_MAX_AGE_DAYS", float), ("RETENTION_INTERVAL_HOURS", float)):
+    app.config[name] = cast(os.environ[name]) if os.environ.get(name) else None
+
+# Run due saved searches from a background scheduler in this process
+app.config["SCHEDULER_ENABLED"] = os.environ.get("SCHEDULER_ENABLED", "").lower() in ('1', 'true', 'yes')
+
 # Initialize database
 db.init_app(app)
 
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Configures every new SQLite connection for concurrent readers and one writer"""
+    cursor = dbapi_connection.cursor()
+    # Readers no longer block the writer and commits append to the log instead of rewriting pages
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # In WAL mode NORMAL only syncs at checkpoints and still cannot corrupt the database
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT']}")
+    cursor.execute(f"PRAGMA cache_size=-{app.config['SQLITE_CACHE_SIZE_KB']}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
 with app.app_context():
     # Import models after db is defined
-    from models import ScrapedData, AnalysisResult
+    from models import ScrapedData, AnalysisResult, ListingBatch, ListingDescriptions, ScrapeSummary, ScrapeFlight, FetchRecord, SavedSearch
+    if app.config["SQLITE_PRODUCTION_MODE"]:
+        db.event.listen(db.engine, 'connect', _set_sqlite_pragmas)
     db.create_all()
+    
+    # create_all does not add indexes or columns to tables that already exist; added columns
+    # need a server default so that existing rows get a value
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                default = column.server_default.arg
+                null = '' if column.nullable else ' NOT NULL'
+                db.session.execute(db.text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{null} "
+                                           f"DEFAULT {default}"))
+        db.session.commit()
+        for table_index in table.indexes:
+            table_index.create(bind=db.engine, checkfirst=True)
 
 # Import routes after models and db setup
-from scraper import scrape_avito_data
-from analyzer import analyze_data, get_analysis_parameters, generate_visualization
+from scraper import scrape_avito_data, scrape_avito_data_bulk, bulk_concurrency
+from analyzer import analyze_data, get_analysis_parameters, generate_visualization, get_sorted_values, compute_histogram
+from search import get_listing_index, RANGE_FIELDS, FACET_FIELDS
+from grouping import get_group_columns, group_listings, GROUP_KEYS, GROUP_METRICS
+from comparables import get_comparables_index, find_comparables, listing_query, describe_listing, COMPARABLES_MAX_K
+from storage import load_descriptions, load_summary, migrate_descriptions, backfill_summaries
+from jobs import start_scrape_job, get_scrape_job, TERMINAL_STAGES
+from export import parse_columns, iter_csv, iter_parquet, pa
+from pagination import keyset_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from singleflight import get_dedup_stats
+from fetcher import get_fetch_stats
+from http_cache import analysis_response, data_response, analysis_etag, not_modified, evict_responses
+from scheduler import (create_saved_search, saved_search_to_dict, start_scheduler, get_scheduler_metrics, next_run_time,
+                       SCHEDULER_MIN_INTERVAL_MINUTES)
+from retention import RetentionPolicy, apply_retention, start_retention_schedule, RETENTION_BATCH_SIZE
+
+if app.config["RETENTION_INTERVAL_HOURS"]:
+    start_retention_schedule(app, app.config["RETENTION_INTERVAL_HOURS"])
+
+if app.config["SCHEDULER_ENABLED"]:
+    start_scheduler(app)
+
+@app.cli.command('migrate-descriptions')
+def migrate_descriptions_command():
+    """Move inline listing descriptions into compressed storage"""
+    report = migrate_descriptions()
+    evict_responses()
+    saved = report['bytes_before'] - report['bytes_after']
+    print(f"Migrated {report['rows_migrated']} rows: "
+          f"{report['bytes_before']} bytes -> {report['bytes_after']} bytes ({saved} bytes saved)")
+
+@app.cli.command('backfill-summaries')
+def backfill_summaries_command():
+    """Compute summary statistics for data scraped before summaries existed"""
+    created = backfill_summaries()
+    print(f"Created {created} scrape summaries")
+
+@app.cli.command('apply-retention')
+@click.option('--max-age-days', type=float, help='Delete scrapes older than this many days')
+@click.option('--keep-per-url', type=int, help='Keep only this many newest scrapes of every URL')
+@click.option('--image-max-age-days', type=float, help='Drop images of analyses older than this many days')
+@click.option('--batch-size', type=int, default=RETENTION_BATCH_SIZE, show_default=True, help='Rows per transaction')
+@click.option('--dry-run', is_flag=True, help='Only count the scrapes that would be deleted')
+@click.option('--no-vacuum', is_flag=True, help='Do not reclaim free space after deleting')
+def apply_retention_command(max_age_days, keep_per_url, image_max_age_days, batch_size, dry_run, no_vacuum):
+    """Delete old scrapes, drop old analysis images and reclaim space; options override RETENTION_* settings"""
+    policy = RetentionPolicy.from_config(app.config)
+    if max_age_days is not None:
+        policy.max_age_days = max_age_days
+    if keep_per_url is not None:
+        policy.keep_per_url = keep_per_url
+    if image_max_age_days is not None:
+        policy.image_max_age_days = image_max_age_days
+    if policy.empty:
+        raise click.UsageError('No retention rule is configured')
+    
+    report = apply_retention(policy, batch_size=batch_size, dry_run=dry_run, vacuum=not no_vacuum)
+    if dry_run:
+        print(f"Would delete {report['scrapes_deleted']} scrapes")
+        return
+    print(f"Deleted {report['scrapes_deleted']} scrapes ({report['rows_deleted']}), "
+          f"dropped {report['images_dropped']} analysis images")
+    if report['bytes_freed'] is not None:
+        print(f"Database size: {report['bytes_before']} bytes -> {report['bytes_after']} bytes "
+              f"({report['bytes_freed']} bytes freed, vacuum: {report['vacuum'] or 'skipped'})")
 
 @app.route('/')
 def index():
     """Render the main page"""
     analysis_params = get_analysis_parameters()
-    return render_template('index.html', analysis_params=analysis_params)
+    
+    summary = None
+    if session.get('data_id'):
+        try:
+            summary = load_summary(session['data_id'])
+        except Exception as e:
+            app.logger.error(f"Error loading scrape summary: {str(e)}")
+    
+    return render_template('index.html', analysis_params=analysis_params, summary=summary)
 
 @app.route('/scrape', methods=['POST'])
 def scrape():
@@ -62,11 +192,10 @@ def scrape():
         if result['success']:
             session['data_id'] = result['data_id']
             
-            # Get listing count to display to user
+            # Get listing count to display to user from the precomputed summary
             try:
-                scraped_data = ScrapedData.query.get(result['data_id'])
-                data_json = json.loads(scraped_data.data)
-                listing_count = len(data_json.get('listings', []))
+                summary = load_summary(result['data_id'])
+                listing_count = summary['listing_count']
                 
                 # Save listing count in session for display on multiple pages
                 session['listing_count'] = listing_count
@@ -85,6 +214,264 @@ def scrape():
         flash(f'An error occurred: {str(e)}', 'danger')
         return redirect(url_for('index'))
 
+def _run_scrape_job(job, url, api_key):
+    """Runs a scrape for a background job inside its own app context"""
+    with app.app_context():
+        scrape_avito_data(url, api_key, progress=job.emit)
+
+@app.route('/api/scrape/jobs', methods=['POST'])
+def create_scrape_job():
+    """API endpoint to start a scrape in the background and follow its progress"""
+    payload = request.get_json(silent=True) or request.form
+    url = (payload.get('url') or '').strip()
+    api_key = payload.get('api_key') or None
+    
+    if not url:
+        return jsonify({'error': 'Please provide a valid URL'}), 400
+    
+    try:
+        job, created = start_scrape_job(url, api_key, lambda job: _run_scrape_job(job, url, api_key))
+        session['scrape_url'] = url
+        return jsonify({
+            'job_id': job.id,
+            'created': created,
+            'state': job.state,
+            'events_url': url_for('scrape_job_events', job_id=job.id),
+            'complete_url': url_for('complete_scrape_job', job_id=job.id)
+        }), 202
+    except Exception as e:
+        app.logger.error(f"Error starting scrape job: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/scrape/jobs/<job_id>')
+def get_scrape_job_state(job_id):
+    """API endpoint to retrieve the current progress of a scrape job"""
+    job = get_scrape_job(job_id)
+    if not job:
+        return jsonify({'error': 'Scrape job not found'}), 404
+    return jsonify(dict(job.state, job_id=job.id, url=job.url))
+
+@app.route('/api/scrape/jobs/<job_id>/events')
+def scrape_job_events(job_id):
+    """Server-sent events stream with the progress of a scrape job"""
+    job = get_scrape_job(job_id)
+    if not job:
+        return jsonify({'error': 'Scrape job not found'}), 404
+    
+    # A reconnecting EventSource sends the ID of the last event it received
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    start = 0 if last_event_id is None else last_event_id + 1
+    keepalive = app.config["SCRAPE_EVENTS_KEEPALIVE"]
+    
+    def stream():
+        position = start
+        while True:
+            events = job.wait_events(position, timeout=keepalive)
+            if not events:
+                if job.finished:
+                    return
+                yield ': keepalive\n\n'
+                continue
+            for event in events:
+                yield f"id: {position}\ndata: {json.dumps(event)}\n\n"
+                position += 1
+            # A job read from another process repeats its final event instead of ending
+            if events[-1]['stage'] in TERMINAL_STAGES:
+                return
+    
+    # Jobs of other processes are read from the database while streaming
+    return Response(stream_with_context(stream()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/scrape/jobs/<job_id>/complete')
+def complete_scrape_job(job_id):
+    """Store the result of a finished scrape job in the session and show it"""
+    job = get_scrape_job(job_id)
+    if not job or not job.finished:
+        flash('Scraping is not finished yet', 'warning')
+        return redirect(url_for('index'))
+    
+    result = job.result
+    if result['stage'] == 'error':
+        flash(f'Error during scraping: {result["error"]}', 'danger')
+        return redirect(url_for('index'))
+    
+    session['scrape_url'] = job.url
+    session['data_id'] = result['data_id']
+    session['listing_count'] = result['listing_count']
+    flash(f'Scraping completed successfully! Found {result["listing_count"]} listings.', 'success')
+    return redirect(url_for('index', _anchor='analysis-section'))
+
+@app.route('/api/scrape/dedup')
+def get_scrape_dedup_stats():
+    """API endpoint to report how many scrape calls reused another call's scrape"""
+    try:
+        return jsonify(get_dedup_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/scrape/fetches')
+def get_scrape_fetch_stats():
+    """API endpoint to report page downloads, unchanged pages and bytes transferred"""
+    try:
+        return jsonify(get_fetch_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/searches', methods=['GET'])
+def list_saved_searches():
+    """API endpoint to list saved searches with their schedule and last result"""
+    try:
+        searches = SavedSearch.query.order_by(SavedSearch.id).all()
+        return jsonify({'searches': [saved_search_to_dict(search) for search in searches]})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def parse_saved_search_fields(payload):
+    """
+    Validates the interval_minutes and name of a saved search request
+    
+    Args:
+        payload (dict): JSON body of the request
+        
+    Returns:
+        tuple: (fields, error) where fields holds the valid fields present in the payload and
+            error is an error message, or None if the fields are valid
+    """
+    fields = {}
+    if 'interval_minutes' in payload:
+        value = payload['interval_minutes']
+        try:
+            interval_minutes = float(value)
+        except (TypeError, ValueError):
+            return fields, 'interval_minutes must be a number'
+        if isinstance(value, bool) or not math.isfinite(interval_minutes):
+            return fields, 'interval_minutes must be a number'
+        if interval_minutes < SCHEDULER_MIN_INTERVAL_MINUTES:
+            return fields, f'interval_minutes must be at least {SCHEDULER_MIN_INTERVAL_MINUTES}'
+        fields['interval_minutes'] = interval_minutes
+    if 'name' in payload:
+        if payload['name'] is not None and not isinstance(payload['name'], str):
+            return fields, 'name must be a string'
+        fields['name'] = payload['name']
+    return fields, None
+
+@app.route('/api/searches', methods=['POST'])
+def create_saved_search_route():
+    """API endpoint to save a search that is re-scraped on a schedule"""
+    payload = request.get_json(silent=True) or {}
+    url = payload.get('url')
+    if not isinstance(url, str) or not url.strip():
+        return jsonify({'error': 'Please provide a valid URL'}), 400
+    if 'interval_minutes' not in payload:
+        return jsonify({'error': 'interval_minutes must be a number'}), 400
+    fields, error = parse_saved_search_fields(payload)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    try:
+        search = create_saved_search(url.strip(), fields['interval_minutes'], fields.get('name'))
+        db.session.commit()
+        return jsonify(saved_search_to_dict(search)), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/searches/<int:search_id>', methods=['PATCH'])
+def update_saved_search(search_id):
+    """API endpoint to pause, resume or reschedule a saved search"""
+    payload = request.get_json(silent=True) or {}
+    search = db.session.get(SavedSearch, search_id)
+    if not search:
+        return jsonify({'error': 'Saved search not found'}), 404
+    
+    fields, error = parse_saved_search_fields(payload)
+    if error:
+        return jsonify({'error': error}), 400
+    if 'enabled' in payload and not isinstance(payload['enabled'], bool):
+        return jsonify({'error': 'enabled must be true or false'}), 400
+    
+    if 'interval_minutes' in fields and fields['interval_minutes'] != search.interval_minutes:
+        # The next run follows the new interval from the last run rather than the old schedule
+        search.interval_minutes = fields['interval_minutes']
+        search.next_run_at = next_run_time(search.interval_minutes, search.last_run_at or search.created_at,
+                                           datetime.utcnow())
+    if 'enabled' in payload:
+        search.enabled = payload['enabled']
+    if 'name' in fields:
+        search.name = fields['name']
+    
+    try:
+        db.session.commit()
+        return jsonify(saved_search_to_dict(search))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/searches/<int:search_id>', methods=['DELETE'])
+def delete_saved_search(search_id):
+    """API endpoint to delete a saved search; its scraped data is kept"""
+    search = db.session.get(SavedSearch, search_id)
+    if not search:
+        return jsonify({'error': 'Saved search not found'}), 404
+    try:
+        db.session.delete(search)
+        db.session.commit()
+        return '', 204
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/scheduler')
+def get_scheduler_state():
+    """API endpoint to report scheduler lag, queue depth and run counters"""
+    try:
+        return jsonify(get_scheduler_metrics())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/scrape/bulk', methods=['POST'])
+def scrape_bulk():
+    """API endpoint to scrape many URLs in one request"""
+    payload = request.get_json(silent=True) or {}
+    urls = payload.get('urls')
+    
+    if not isinstance(urls, list) or not urls:
+        return jsonify({'error': 'Request body must contain a non-empty "urls" list'}), 400
+    if not all(isinstance(url, str) and url.strip() for url in urls):
+        return jsonify({'error': 'Every URL must be a non-empty string'}), 400
+    
+    max_urls = app.config["SCRAPE_BULK_MAX_URLS"]
+    if len(urls) > max_urls:
+        return jsonify({'error': f'Too many URLs: {len(urls)} (maximum is {max_urls})'}), 400
+    
+    # Concurrency may be lowered per request but never raised above the configured limit
+    try:
+        max_workers = bulk_concurrency(payload, app.config["SCRAPE_BULK_CONCURRENCY"])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        results = scrape_avito_data_bulk(
+            [url.strip() for url in urls],
+            payload.get('api_key'),
+            max_workers=max_workers,
+            batch_size=app.config["SCRAPE_BULK_BATCH_SIZE"]
+        )
+        succeeded = sum(1 for r in results if r['status'] == 'success')
+        
+        return jsonify({
+            'total': len(results),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'results': results
+        })
+    except Exception as e:
+        app.logger.error(f"Bulk scraping error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/analyze', methods=['GET', 'POST'])
 def analyze():
     """Handle analysis request"""
@@ -139,6 +526,11 @@ def results():
         return redirect(url_for('index'))
     
     try:
+        # The page only changes with the analysis, unless messages are waiting to be shown
+        etag = analysis_etag(analysis_id) if '_flashes' not in session else None
+        if etag and request.if_none_match.contains_weak(etag):
+            return not_modified(etag, 'private, no-cache')
+        
         # Retrieve analysis result from database
         result = AnalysisResult.query.get(analysis_id)
         if not result:
@@ -149,29 +541,322 @@ def results():
         statistics = json.loads(result.statistics)
         visualization_data = json.loads(result.visualization_data)
         
-        return render_template('results.html', 
-                              result=result, 
-                              statistics=statistics,
-                              visualization_data=visualization_data)
+        response = make_response(render_template('results.html', 
+                                                 result=result, 
+                                                 statistics=statistics,
+                                                 visualization_data=visualization_data))
+        if etag:
+            response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
     except Exception as e:
         app.logger.error(f"Error displaying results: {str(e)}")
         flash(f'An error occurred: {str(e)}', 'danger')
         return redirect(url_for('index'))
 
+def _page_args():
+    """
+    Reads the cursor and limit query parameters of a paginated endpoint
+
+    Returns:
+        tuple: (cursor, limit)
+
+    Raises:
+        ValueError: If limit is out of range
+    """
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    return request.args.get('cursor') or None, limit
+
+@app.route('/api/scrapes')
+def list_scrapes():
+    """API endpoint to page through scraped datasets, newest first"""
+    try:
+        cursor, limit = _page_args()
+        # The data column is deferred and summaries are loaded in the same query
+        query = ScrapedData.query.options(db.joinedload(ScrapedData.summary).load_only(ScrapeSummary.listing_count))
+        rows, next_cursor = keyset_page(query, ScrapedData, cursor, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        # Analysis counts of the whole page in one grouped query
+        analysis_counts = dict(
+            db.session.query(AnalysisResult.data_id, db.func.count(AnalysisResult.id))
+            .filter(AnalysisResult.data_id.in_([row.id for row in rows]))
+            .group_by(AnalysisResult.data_id)
+            .all()
+        ) if rows else {}
+
+        return jsonify({
+            'scrapes': [{
+                'id': row.id,
+                'url': row.url,
+                'listing_count': row.summary.listing_count if row.summary else None,
+                'analysis_count': analysis_counts.get(row.id, 0),
+                'created_at': row.created_at.isoformat()
+            } for row in rows],
+            'next_cursor': next_cursor
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/scrapes/<int:data_id>/analyses')
+def list_scrape_analyses(data_id):
+    """API endpoint to page through the analyses of a scraped dataset, newest first"""
+    try:
+        cursor, limit = _page_args()
+        # visualization_data is deferred, only the listed columns are read
+        query = AnalysisResult.query.filter_by(data_id=data_id)
+        rows, next_cursor = keyset_page(query, AnalysisResult, cursor, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        if not rows and not cursor and not db.session.get(ScrapedData, data_id):
+            return jsonify({'error': 'Data not found'}), 404
+
+        return jsonify({
+            'data_id': data_id,
+            'analyses': [{
+                'id': row.id,
+                'parameter': row.parameter,
+                'title': row.title,
+                'bins': row.bins,
+                'statistics': json.loads(row.statistics),
+                'created_at': row.created_at.isoformat()
+            } for row in rows],
+            'next_cursor': next_cursor
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/data/<int:data_id>')
 def get_data(data_id):
     """API endpoint to retrieve scraped data"""
+    try:
+        # Descriptions are stored separately and only loaded on request
+        include_descriptions = request.args.get('include_descriptions', '').lower() in ('1', 'true', 'yes')
+        
+        response = data_response(data_id, include_descriptions)
+        if response is None:
+            return jsonify({'error': 'Data not found'}), 404
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/data/<int:data_id>/summary')
+def get_data_summary(data_id):
+    """API endpoint to retrieve precomputed summary statistics of scraped data"""
+    try:
+        summary = load_summary(data_id)
+        if not summary:
+            return jsonify({'error': 'Summary not found'}), 404
+        
+        return jsonify({
+            'id': data_id,
+            'listing_count': summary['listing_count'],
+            'statistics': summary['statistics']
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/data/<int:data_id>/search')
+def search_data(data_id):
+    """API endpoint to search listings of scraped data with range and facet filters"""
+    ranges = {
+        field: (request.args.get(f'{field}_min', type=float), request.args.get(f'{field}_max', type=float))
+        for field in RANGE_FIELDS
+    }
+    facets = {field: request.args.getlist(field) for field in FACET_FIELDS}
+    
+    sort = request.args.get('sort')
+    if sort is not None and sort not in RANGE_FIELDS:
+        return jsonify({'error': f"Cannot sort by '{sort}'"}), 400
+    descending = request.args.get('order', 'asc').lower() == 'desc'
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 200)
+    
+    try:
+        index = get_listing_index(data_id)
+        if index is None:
+            return jsonify({'error': 'Data not found'}), 404
+        
+        result = index.search(ranges, facets, sort, descending, page, per_page)
+        result['id'] = data_id
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/comparables')
+def get_comparables():
+    """API endpoint to find the listings most similar to a listing or to given values across scraped datasets"""
+    try:
+        data_ids = [int(value) for param in request.args.getlist('ids') for value in param.split(',') if value.strip()]
+    except ValueError:
+        return jsonify({'error': 'ids must be integers'}), 400
+    
+    k = request.args.get('k', 10, type=int)
+    if not 1 <= k <= COMPARABLES_MAX_K:
+        return jsonify({'error': f'k must be between 1 and {COMPARABLES_MAX_K}'}), 400
+    
+    # A reference listing is given by its dataset and its position, as in search hits
+    listing_data_id = request.args.get('data_id', type=int)
+    position = request.args.get('index', type=int)
+    if listing_data_id is None and request.args.get('area', type=float) is None:
+        return jsonify({'error': 'Provide a listing with ?data_id=1&index=0 or values with ?area=54&rooms=2&floor=5'}), 400
+    if listing_data_id is not None and position is None:
+        return jsonify({'error': 'index is required with data_id'}), 400
+    if not data_ids:
+        if listing_data_id is None:
+            return jsonify({'error': 'Provide dataset IDs with ?ids=1,2,3'}), 400
+        data_ids = [listing_data_id]
+    data_ids = list(dict.fromkeys(data_ids))
+    
+    try:
+        indexes = {}
+        for data_id in dict.fromkeys(data_ids + ([listing_data_id] if listing_data_id is not None else [])):
+            indexes[data_id] = get_comparables_index(data_id)
+        missing = [data_id for data_id, index in indexes.items() if index is None]
+        if missing:
+            return jsonify({'error': f"Data not found: {', '.join(map(str, missing))}"}), 404
+        
+        reference = None
+        if listing_data_id is not None:
+            reference = indexes[listing_data_id]
+            if not 0 <= position < reference.size:
+                return jsonify({'error': 'Listing not found'}), 404
+            query = listing_query(reference.listings[position], request.args.get('location', 'city'))
+            exclude = (listing_data_id, position)
+        else:
+            query = {
+                'area': request.args.get('area', type=float),
+                'rooms': request.args.get('rooms', type=int),
+                'floor': request.args.get('floor', type=int),
+                'city': request.args.get('city'),
+                'district': request.args.get('district')
+            }
+            exclude = None
+        
+        result = find_comparables({data_id: indexes[data_id] for data_id in data_ids}, k=k, exclude=exclude, **query)
+        result['ids'] = data_ids
+        if reference is not None:
+            result['listing'] = describe_listing(reference, listing_data_id, position, result['comparables'])
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/data/<int:data_id>/descriptions')
+def get_data_descriptions(data_id):
+    """API endpoint to retrieve listing descriptions of scraped data"""
     try:
         data = ScrapedData.query.get(data_id)
         if not data:
             return jsonify({'error': 'Data not found'}), 404
         
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = request.args.get('limit', type=int)
+        
         return jsonify({
             'id': data.id,
-            'url': data.url,
-            'data': json.loads(data.data),
-            'created_at': data.created_at.isoformat()
+            'offset': offset,
+            'descriptions': load_descriptions(data.id, offset, limit)
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _export_response(data_ids, filename):
+    """Streams the listings of the given datasets as CSV or Parquet"""
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'parquet'):
+        return jsonify({'error': 'format must be csv or parquet'}), 400
+    if export_format == 'parquet' and pa is None:
+        return jsonify({'error': 'Parquet export requires the pyarrow package'}), 501
+    
+    try:
+        columns = parse_columns(request.args.get('columns'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        # The rows are read again while the response streams, after this request's session is
+        # closed, so the deferred data column has to be loaded here
+        datasets = (ScrapedData.query
+                    .options(db.undefer(ScrapedData.data))
+                    .filter(ScrapedData.id.in_(data_ids))
+                    .all())
+        found = {data.id for data in datasets}
+        missing = [data_id for data_id in data_ids if data_id not in found]
+        if missing:
+            return jsonify({'error': f"Data not found: {', '.join(map(str, missing))}"}), 404
+        
+        # Export in the requested order
+        by_id = {data.id: data for data in datasets}
+        datasets = [by_id[data_id] for data_id in data_ids]
+        
+        if export_format == 'csv':
+            body, mimetype = iter_csv(datasets, columns), 'text/csv'
+        else:
+            body, mimetype = iter_parquet(datasets, columns), 'application/vnd.apache.parquet'
+        
+        return Response(stream_with_context(body), mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename="{filename}.{export_format}"'
         })
+    except Exception as e:
+        app.logger.error(f"Export error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/data/<int:data_id>/export')
+def export_data(data_id):
+    """API endpoint to stream the listings of scraped data as CSV or Parquet"""
+    return _export_response([data_id], f"avito_{data_id}")
+
+@app.route('/api/export')
+def export_datasets():
+    """API endpoint to stream the listings of several scraped datasets as one CSV or Parquet file"""
+    try:
+        data_ids = [int(value) for param in request.args.getlist('ids') for value in param.split(',') if value.strip()]
+    except ValueError:
+        return jsonify({'error': 'ids must be integers'}), 400
+    if not data_ids:
+        return jsonify({'error': 'Provide dataset IDs with ?ids=1,2,3'}), 400
+    
+    # Keep the first occurrence of every ID
+    data_ids = list(dict.fromkeys(data_ids))
+    return _export_response(data_ids, "avito_export")
+
+@app.route('/api/data/<int:data_id>/groups')
+def get_data_groups(data_id):
+    """API endpoint to compare statistics and histograms of a metric across groups of listings"""
+    by = [key.strip() for key in request.args.get('by', 'rooms').split(',') if key.strip()]
+    unknown = [key for key in by if key not in GROUP_KEYS]
+    if unknown or not 1 <= len(by) <= 2:
+        return jsonify({'error': f"by must be one or two of: {', '.join(GROUP_KEYS)}"}), 400
+    
+    metric = request.args.get('metric', 'price_per_sqm')
+    if metric not in GROUP_METRICS:
+        return jsonify({'error': f"Unknown metric '{metric}'"}), 400
+    
+    bins = request.args.get('bins', 20, type=int)
+    if not 1 <= bins <= 500:
+        return jsonify({'error': 'bins must be between 1 and 500'}), 400
+    range_min = request.args.get('min', type=float)
+    range_max = request.args.get('max', type=float)
+    drop_outliers = request.args.get('keep_outliers', '').lower() not in ('1', 'true', 'yes')
+    
+    try:
+        columns = get_group_columns(data_id)
+        if columns is None:
+            return jsonify({'error': 'Data not found'}), 404
+        
+        result = group_listings(columns, by, metric, bins, range_min, range_max, drop_outliers)
+        result['data_id'] = data_id
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -179,19 +864,38 @@ def get_data(data_id):
 def get_analysis(analysis_id):
     """API endpoint to retrieve analysis results"""
     try:
-        analysis = AnalysisResult.query.get(analysis_id)
-        if not analysis:
+        response = analysis_response(analysis_id)
+        if response is None:
             return jsonify({'error': 'Analysis not found'}), 404
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/analysis/<int:data_id>/<parameter>/histogram')
+def get_histogram(data_id, parameter):
+    """API endpoint to rebin a parameter of scraped data without storing a new analysis"""
+    if parameter not in {param['id'] for param in get_analysis_parameters()}:
+        return jsonify({'error': f"Unknown parameter '{parameter}'"}), 400
+    
+    bins = request.args.get('bins', 30, type=int)
+    if not 1 <= bins <= 500:
+        return jsonify({'error': 'bins must be between 1 and 500'}), 400
+    range_min = request.args.get('min', type=float)
+    range_max = request.args.get('max', type=float)
+    
+    try:
+        values = get_sorted_values(data_id, parameter)
+        if values is None:
+            return jsonify({'error': 'Data not found'}), 404
         
+        chart_data = compute_histogram(values, parameter, bins, range_min, range_max)
         return jsonify({
-            'id': analysis.id,
-            'data_id': analysis.data_id,
-            'parameter': analysis.parameter,
-            'title': analysis.title,
-            'bins': analysis.bins,
-            'statistics': json.loads(analysis.statistics),
-            'visualization_data': json.loads(analysis.visualization_data),
-            'created_at': analysis.created_at.isoformat()
+            'data_id': data_id,
+            'parameter': parameter,
+            'bins': bins,
+            'chart_data': chart_data
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -0,0 +1,201 @@
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import aiohttp
+from aiohttp import web
+from app import app
+from models import ScrapedData
+from scraper import fetch_avito_data_async, scrape_avito_data_summary, bulk_concurrency
+from storage import load_scraped_data, load_summary
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Maximum number of pages downloaded at the same time by one service process
+ASYNC_MAX_CONNECTIONS = int(os.environ.get("ASYNC_MAX_CONNECTIONS", 100))
+
+# Number of threads serving database reads
+ASYNC_DB_READERS = int(os.environ.get("ASYNC_DB_READERS", 4))
+
+# Application keys for objects shared by all requests
+SESSION_KEY = web.AppKey("session", aiohttp.ClientSession)
+SCRAPERS_KEY = web.AppKey("scrapers", ThreadPoolExecutor)
+READERS_KEY = web.AppKey("readers", ThreadPoolExecutor)
+
+def _scrape(loop, session, url, api_key):
+    """
+    Scrapes one URL through scrape_avito_data in its own app context
+
+    Runs on a worker thread, so coordination with other scrapes of the URL (run_single_flight)
+    may block while waiting. The download itself runs on the event loop and its shared session.
+
+    Returns:
+        dict: Summary as returned by scrape_avito_data_summary
+    """
+    def fetch(url, api_key, progress, validators):
+        return asyncio.run_coroutine_threadsafe(fetch_avito_data_async(url, api_key, session, validators), loop).result()
+
+    with app.app_context():
+        return scrape_avito_data_summary(url, api_key, fetch)
+
+def _read_data(data_id, include_descriptions):
+    with app.app_context():
+        data = ScrapedData.query.get(data_id)
+        if not data:
+            return None
+        return {
+            'id': data.id,
+            'url': data.url,
+            'data': load_scraped_data(data, include_descriptions),
+            'created_at': data.created_at.isoformat()
+        }
+
+def _read_summary(data_id):
+    with app.app_context():
+        return load_summary(data_id)
+
+async def _read_json(request):
+    """
+    Returns the JSON object of a request body, or an empty dict if the body is not a JSON object
+    """
+    try:
+        payload = await request.json()
+    except ValueError:
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+async def _run(request, key, function, *args):
+    """
+    Runs a blocking function on one of the service executors
+    """
+    return await asyncio.get_running_loop().run_in_executor(request.app[key], function, *args)
+
+async def scrape_url(request, url, api_key=None):
+    """
+    Scrapes one URL, coalesced with other scrapes of it like scrape_avito_data
+
+    Returns:
+        dict: Summary with keys url, status, source, listing_count, data_id, elapsed and
+            error (on failure), as returned by scrape_avito_data_bulk
+    """
+    loop = asyncio.get_running_loop()
+    return await _run(request, SCRAPERS_KEY, _scrape, loop, request.app[SESSION_KEY], url, api_key)
+
+async def scrape(request):
+    """API endpoint to scrape one URL"""
+    payload = await _read_json(request)
+    url = payload.get('url')
+    if not isinstance(url, str) or not url.strip():
+        return web.json_response({'error': 'Request body must contain a "url" string'}, status=400)
+
+    result = await scrape_url(request, url.strip(), payload.get('api_key'))
+    if result['status'] == 'error':
+        return web.json_response({'success': False, 'error': result['error']}, status=500)
+    return web.json_response({
+        'success': True,
+        'data_id': result['data_id'],
+        'source': result['source'],
+        'listing_count': result['listing_count'],
+        'elapsed': result['elapsed']
+    })
+
+async def scrape_bulk(request):
+    """API endpoint to scrape many URLs in one request"""
+    payload = await _read_json(request)
+    urls = payload.get('urls')
+
+    if not isinstance(urls, list) or not urls:
+        return web.json_response({'error': 'Request body must contain a non-empty "urls" list'}, status=400)
+    if not all(isinstance(url, str) and url.strip() for url in urls):
+        return web.json_response({'error': 'Every URL must be a non-empty string'}, status=400)
+
+    max_urls = app.config["SCRAPE_BULK_MAX_URLS"]
+    if len(urls) > max_urls:
+        return web.json_response({'error': f'Too many URLs: {len(urls)} (maximum is {max_urls})'}, status=400)
+
+    # Concurrency may be lowered per request but never raised above the configured limit
+    try:
+        concurrency = bulk_concurrency(payload, app.config["SCRAPE_BULK_CONCURRENCY"])
+    except ValueError as e:
+        return web.json_response({'error': str(e)}, status=400)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(url):
+        async with semaphore:
+            return await scrape_url(request, url.strip(), payload.get('api_key'))
+
+    results = await asyncio.gather(*(bounded(url) for url in urls))
+    succeeded = sum(1 for r in results if r['status'] == 'success')
+
+    return web.json_response({
+        'total': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'results': results
+    })
+
+async def get_data(request):
+    """API endpoint to retrieve scraped data"""
+    try:
+        data_id = int(request.match_info['data_id'])
+        include_descriptions = request.query.get('include_descriptions', '').lower() in ('1', 'true', 'yes')
+        data = await _run(request, READERS_KEY, _read_data, data_id, include_descriptions)
+        if data is None:
+            return web.json_response({'error': 'Data not found'}, status=404)
+        return web.json_response(data)
+    except Exception as e:
+        return web.json_response({'error': str(e)}, status=500)
+
+async def get_data_summary(request):
+    """API endpoint to retrieve precomputed summary statistics of scraped data"""
+    try:
+        data_id = int(request.match_info['data_id'])
+        summary = await _run(request, READERS_KEY, _read_summary, data_id)
+        if not summary:
+            return web.json_response({'error': 'Summary not found'}, status=404)
+        return web.json_response({
+            'id': data_id,
+            'listing_count': summary['listing_count'],
+            'statistics': summary['statistics']
+        })
+    except Exception as e:
+        return web.json_response({'error': str(e)}, status=500)
+
+async def _open_resources(application):
+    connector = aiohttp.TCPConnector(limit=ASYNC_MAX_CONNECTIONS)
+    application[SESSION_KEY] = aiohttp.ClientSession(connector=connector)
+    # One thread per concurrent scrape; it mostly waits for the download on the event loop
+    application[SCRAPERS_KEY] = ThreadPoolExecutor(max_workers=ASYNC_MAX_CONNECTIONS, thread_name_prefix="scrape")
+    application[READERS_KEY] = ThreadPoolExecutor(max_workers=ASYNC_DB_READERS, thread_name_prefix="db-reader")
+
+async def _close_resources(application):
+    await application[SESSION_KEY].close()
+    application[SCRAPERS_KEY].shutdown(wait=True)
+    application[READERS_KEY].shutdown(wait=True)
+
+def create_async_app():
+    """
+    Creates the async scraping service
+
+    The service exposes the scraping and data endpoints of the JSON API on an aiohttp event
+    loop, so one process serves many scrapes at once while they wait on the network. Pages
+    are downloaded through one pooled client session and parsing runs in the default executor.
+    Every scrape is coordinated with other scrapes of its URL and stored (through run_write)
+    on a thread of its own pool, and reads use a small thread pool.
+
+    Returns:
+        aiohttp.web.Application: Application to run with web.run_app or an aiohttp worker
+    """
+    application = web.Application()
+    application.on_startup.append(_open_resources)
+    application.on_cleanup.append(_close_resources)
+    application.router.add_post('/api/scrape', scrape)
+    application.router.add_post('/api/scrape/bulk', scrape_bulk)
+    application.router.add_get('/api/data/{data_id:\\d+}', get_data)
+    application.router.add_get('/api/data/{data_id:\\d+}/summary', get_data_summary)
+    return application
+
+if __name__ == "__main__":
+    web.run_app(create_async_app(), host="0.0.0.0", port=int(os.environ.get("ASYNC_PORT", 5001)))
@@ -0,0 +1,60 @@
+"""
+Synthetic listings shared by the benchmarks
+"""
+import numpy as np
+
+CITIES = ["Москва", "Санкт-Петербург", "Казань", "Екатеринбург", "Новосибирск"]
+CITY_WEIGHTS = [0.4, 0.25, 0.15, 0.1, 0.1]
+
+# Every listing gets a window of this text, like the overlapping windows of the text extractor
+DESCRIPTION = ("Продается светлая квартира с ремонтом, рядом метро, школа, детский сад и парк. "
+               "Один взрослый собственник, без обременений. ") * 6
+
+# Listings drawn per vectorized step; the generator never holds more than this many
+_CHUNK_SIZE = 10000
+
+def generate_listings(count, seed=42, descriptions=True):
+    """
+    Yields synthetic listing dictionaries in the stored format
+
+    Area grows with the number of rooms, price is area times a lognormal price per m², floors
+    lie within buildings of 2 to 30 floors, cities are weighted by CITY_WEIGHTS and one
+    listing in 41 has no district. Values are drawn with numpy in chunks, so a million
+    listings are generated quickly and can be streamed into store_listings.
+
+    Args:
+        count (int): Number of listings
+        seed (int, optional): Random seed
+        descriptions (bool, optional): Whether listings have descriptions
+
+    Yields:
+        dict: Listing with title, price, location, city, district, street, area, rooms,
+            floor ("5/9"), description, seller_rating and views
+    """
+    rng = np.random.default_rng(seed)
+    for start in range(0, count, _CHUNK_SIZE):
+        size = min(_CHUNK_SIZE, count - start)
+        rooms = rng.integers(1, 6, size)
+        area = np.round(rng.normal(18 + 17 * rooms, 6).clip(12, 250), 1)
+        total_floors = rng.integers(2, 31, size)
+        floor = rng.integers(1, total_floors + 1)
+        price = np.round(area * rng.lognormal(12.4, 0.3, size), -3)
+        city = rng.choice(len(CITIES), size, p=CITY_WEIGHTS)
+        district = rng.integers(0, 41, size)
+
+        for j in range(size):
+            i = start + j
+            yield {
+                "title": f"{rooms[j]}-к. квартира, {area[j]} м², {floor[j]}/{total_floors[j]} эт.",
+                "price": int(price[j]),
+                "location": f"{CITIES[city[j]]}, ул. Примерная, {i % 200 + 1}",
+                "city": CITIES[city[j]],
+                "district": f"Район {district[j]}" if district[j] else None,
+                "street": "улица Примерная",
+                "area": float(area[j]),
+                "rooms": int(rooms[j]),
+                "floor": f"{floor[j]}/{total_floors[j]}",
+                "description": DESCRIPTION[i % 50:][:800] if descriptions else None,
+                "seller_rating": None,
+                "views": None
+            }
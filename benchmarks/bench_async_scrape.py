@@ -0,0 +1,142 @@
+"""
+Load test comparing concurrent-scrape throughput of the sync Flask endpoint with the
+async service.
+
+A stub page server returns the fixture search page after a fixed delay, standing in for a
+slow Avito response. The Flask app runs on a single-threaded WSGI server, like one sync
+gunicorn worker, and the async service runs on one event loop. Both receive the same number
+of concurrent scrape requests.
+
+Usage:
+    python benchmarks/bench_async_scrape.py [--requests 50] [--concurrency 25] [--latency 0.5]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "avito_search_moskva.html")
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_in_thread(application, port):
+    """Runs an aiohttp application on its own event loop in a daemon thread"""
+    from aiohttp import web
+
+    ready = threading.Event()
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(application)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+
+def start_stub_pages(port, latency):
+    """Serves the fixture page after latency seconds on every path"""
+    from aiohttp import web
+
+    with open(FIXTURE, encoding="utf-8") as f:
+        html = f.read()
+
+    async def page(request):
+        await asyncio.sleep(latency)
+        return web.Response(text=html, content_type="text/html")
+
+    application = web.Application()
+    application.router.add_get("/{tail:.*}", page)
+    start_in_thread(application, port)
+
+def start_sync_app(port):
+    """Runs the Flask app on a single-threaded WSGI server"""
+    from werkzeug.serving import make_server
+    from app import app
+
+    server = make_server("127.0.0.1", port, app, threaded=False)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+async def fire(url, requests, concurrency, build_request):
+    """Sends requests with at most concurrency in flight and returns (seconds, failures)"""
+    import aiohttp
+
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def one(session, i):
+        nonlocal failures
+        async with semaphore:
+            method, kwargs = build_request(i)
+            async with session.request(method, url, allow_redirects=False, **kwargs) as response:
+                await response.read()
+                if response.status >= 400:
+                    failures += 1
+
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(session, i) for i in range(requests)))
+        return time.perf_counter() - started, failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=25)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds the stub page server waits")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ.pop("FIRECRAWL_API_KEY", None)
+    logging.disable(logging.WARNING)
+
+    # The stub server listens on a loopback address, which both scrapers block by default
+    from trafilatura.settings import DEFAULT_CONFIG
+    DEFAULT_CONFIG.set("DEFAULT", "SSRF_PROTECTION", "off")
+
+    import app  # noqa: F401 - initializes the database before the scraper is imported
+    from async_app import create_async_app
+
+    pages_port, sync_port, async_port = free_port(), free_port(), free_port()
+    start_stub_pages(pages_port, args.latency)
+    start_sync_app(sync_port)
+    start_in_thread(create_async_app(), async_port)
+
+    # Every service gets its own pages; the same URLs would be served from the other's fresh scrapes
+    def page_url(name, i):
+        return f"http://127.0.0.1:{pages_port}/moskva/kvartiry/prodam?p={i}&run={name}"
+
+    results = {}
+    for name, url, build_request in (
+        ("sync", f"http://127.0.0.1:{sync_port}/scrape",
+         lambda i: ("POST", {"data": {"url": page_url("sync", i)}})),
+        ("async", f"http://127.0.0.1:{async_port}/api/scrape",
+         lambda i: ("POST", {"json": {"url": page_url("async", i)}})),
+    ):
+        seconds, failures = asyncio.run(fire(url, args.requests, args.concurrency, build_request))
+        results[name] = {
+            "requests": args.requests,
+            "failures": failures,
+            "seconds": round(seconds, 2),
+            "scrapes_per_second": round(args.requests / seconds, 2)
+        }
+
+    results["speedup"] = round(results["async"]["scrapes_per_second"] / results["sync"]["scrapes_per_second"], 1)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
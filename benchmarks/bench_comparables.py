@@ -0,0 +1,108 @@
+"""
+Compares comparables queries through the k-d tree with a linear scan over all listings.
+
+Generates synthetic listings (area, rooms, floor, price, city), builds a ComparablesIndex,
+then times k-nearest-neighbour queries for random listings through the tree and through a
+vectorized scan computing every distance. Checks that both return the same distances.
+
+Usage:
+    python benchmarks/bench_comparables.py [--sizes 10000 100000 1000000] [--k 10] [--queries 200]
+        [--location city]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from listing import Listing
+from _common import generate_listings
+
+def linear_scan(index, query, k, exclude, scales):
+    """Distances of the k nearest listings computed over every listing"""
+    mask = ~np.isnan(index.price_per_sqm)
+    distances = np.zeros(index.size)
+    for field, scale in scales.items():
+        if query[field] is not None:
+            mask &= ~np.isnan(index.features[field])
+            distances += (index.features[field] - query[field] / scale) ** 2
+    if query['city'] is not None:
+        mask &= index.cities == query['city']
+    mask[exclude] = False
+    distances = distances[mask]
+    nearest = np.argpartition(distances, k - 1)[:k] if len(distances) > k else np.arange(len(distances))
+    return np.sort(np.sqrt(distances[nearest]))
+
+def percentile_ms(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 3)
+
+def run_case(comparables, size, k, queries, location):
+    listings = [Listing.from_dict(listing) for listing in generate_listings(size, descriptions=False)]
+
+    started = time.perf_counter()
+    index = comparables.ComparablesIndex(listings)
+    index_seconds = time.perf_counter() - started
+
+    rng = np.random.default_rng(0)
+    positions = rng.integers(0, size, queries)
+    query_args = [comparables.listing_query(listings[position], location) for position in positions]
+
+    # The first query per feature set and location builds its tree
+    started = time.perf_counter()
+    for query in {(query['city'], query['district']): query for query in query_args}.values():
+        index.query(query, k, query['city'], query['district'])
+    tree_seconds = time.perf_counter() - started
+
+    tree_times, scan_times = [], []
+    mismatches = 0
+    for position, query in zip(positions, query_args):
+        started = time.perf_counter()
+        found = index.query(query, k, query['city'], query['district'], exclude=int(position))
+        tree_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        expected = linear_scan(index, query, k, int(position), comparables.FEATURE_SCALES)
+        scan_times.append(time.perf_counter() - started)
+
+        if not np.allclose([distance for distance, _ in found], expected):
+            mismatches += 1
+
+    return {
+        "size": size,
+        "k": k,
+        "location": location,
+        "queries": queries,
+        "index_seconds": round(index_seconds, 3),
+        "tree_build_seconds": round(tree_seconds, 3),
+        "tree_ms": {"p50": percentile_ms(tree_times, 50), "p99": percentile_ms(tree_times, 99)},
+        "linear_scan_ms": {"p50": percentile_ms(scan_times, 50), "p99": percentile_ms(scan_times, 99)},
+        "speedup_p50": round(float(np.median(scan_times) / np.median(tree_times)), 1),
+        "mismatches": mismatches
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--location", choices=["any", "city"], default="city",
+                        help="Search everywhere or only in the city of the reference listing")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    logging.disable(logging.CRITICAL)
+
+    import app
+    import comparables
+
+    results = [run_case(comparables, size, args.k, args.queries, args.location) for size in args.sizes]
+    print(json.dumps({"numpy": np.__version__, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
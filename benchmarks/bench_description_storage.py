@@ -0,0 +1,117 @@
+"""
+Measures database size and parse time before and after moving listing descriptions
+into compressed storage.
+
+Usage:
+    python benchmarks/bench_description_storage.py [--scrapes 50] [--listings 50]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STREETS = ["ул. Ленина", "ул. Гагарина", "проспект Мира", "ул. Садовая", "пр-т Победы", "бульвар Космонавтов"]
+CITIES = ["Москва", "Санкт-Петербург", "Казань", "Екатеринбург"]
+
+def make_page_text(listing_count, rng):
+    """Builds text resembling a flattened Avito search page"""
+    blocks = []
+    for _ in range(listing_count):
+        rooms = rng.randint(1, 4)
+        area = round(rng.uniform(25, 120), 1)
+        floor = rng.randint(1, 20)
+        total_floors = rng.randint(floor, 25)
+        price = rng.randint(30, 250) * 100000
+        blocks.append(
+            f"{rooms}-комн. квартира, {area} м², {floor}/{total_floors} эт.\n"
+            f"{price:,} ₽\n".replace(',', ' ') +
+            f"{rng.choice(CITIES)}, {rng.choice(STREETS)}, {rng.randint(1, 200)}\n"
+            f"Продается квартира в хорошем состоянии, рядом метро, школа и парк. "
+            f"Собственник, один взрослый, без обременений.\n"
+        )
+    return "\n".join(blocks)
+
+def make_structured_data(listing_count, rng):
+    """Builds structured data with overlapping description windows like the text extractor"""
+    text = make_page_text(listing_count, rng)
+    listings = []
+    position = 0
+    for _ in range(listing_count):
+        position = text.find("₽", position + 1)
+        listing_text = text[max(0, position - 500):min(len(text), position + 300)]
+        listings.append({
+            "title": listing_text.split("\n")[0],
+            "price": rng.randint(30, 250) * 100000,
+            "location": rng.choice(CITIES),
+            "area": round(rng.uniform(25, 120), 1),
+            "rooms": rng.randint(1, 4),
+            "floor": f"{rng.randint(1, 9)}/9",
+            "description": listing_text,
+            "seller_rating": None,
+            "views": None
+        })
+    return {"listings": listings, "pagination": {"next_page": None, "total_pages": None}}
+
+def measure_parse(rows, repeat=5):
+    """Returns the best time in seconds to json.loads every data column"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for row in rows:
+            json.loads(row.data)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scrapes", type=int, default=50)
+    parser.add_argument("--listings", type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+    import logging
+    logging.disable(logging.INFO)
+
+    from app import app, db
+    from models import ScrapedData
+    from storage import migrate_descriptions
+
+    rng = random.Random(42)
+    with app.app_context():
+        # Insert rows in the old format, with descriptions inline
+        for i in range(args.scrapes):
+            db.session.add(ScrapedData(url=f"https://www.avito.ru/bench/{i}",
+                                       data=json.dumps(make_structured_data(args.listings, rng))))
+        db.session.commit()
+        db.session.execute(db.text("VACUUM"))
+        size_before = os.path.getsize(db_path)
+        parse_before = measure_parse(ScrapedData.query.all())
+
+        report = migrate_descriptions()
+        db.session.execute(db.text("VACUUM"))
+        db.session.expire_all()
+        size_after = os.path.getsize(db_path)
+        parse_after = measure_parse(ScrapedData.query.all())
+
+    print(json.dumps({
+        "scrapes": args.scrapes,
+        "listings_per_scrape": args.listings,
+        "rows_migrated": report["rows_migrated"],
+        "db_bytes_before": size_before,
+        "db_bytes_after": size_after,
+        "column_bytes_before": report["bytes_before"],
+        "column_bytes_after": report["bytes_after"],
+        "parse_seconds_before": round(parse_before, 4),
+        "parse_seconds_after": round(parse_after, 4)
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Measures streaming export throughput of the CSV and Parquet export endpoints.
+
+A temporary database is filled with one dataset of synthetic listings, which is then
+exported through the Flask app with the response consumed piece by piece, as a client
+downloading the file would.
+
+Usage:
+    python benchmarks/bench_export.py [--rows 1000000] [--descriptions] [--trace-memory]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _common import generate_listings
+
+def consume(client, url):
+    """Downloads a streamed response and returns (bytes, seconds)"""
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    size = 0
+    for piece in response.response:
+        size += len(piece)
+    response.close()
+    return size, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--descriptions", action="store_true", help="Store and export descriptions")
+    parser.add_argument("--trace-memory", action="store_true", help="Report peak traced memory (slower)")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    logging.disable(logging.INFO)
+
+    from app import app, db
+    from storage import store_listings
+
+    with app.app_context():
+        started = time.perf_counter()
+        data_id = store_listings("https://www.avito.ru/bench", generate_listings(args.rows, descriptions=args.descriptions)).id
+        db.session.commit()
+        load_seconds = time.perf_counter() - started
+
+    columns = "&columns=data_id,title,price,area,rooms,floor,description" if args.descriptions else ""
+    client = app.test_client()
+    results = {"rows": args.rows, "load_seconds": round(load_seconds, 1)}
+    for export_format in ("csv", "parquet"):
+        if args.trace_memory:
+            tracemalloc.start()
+        size, seconds = consume(client, f"/api/data/{data_id}/export?format={export_format}{columns}")
+        result = {
+            "megabytes": round(size / 2**20, 1),
+            "seconds": round(seconds, 2),
+            "rows_per_second": round(args.rows / seconds),
+            "megabytes_per_second": round(size / 2**20 / seconds, 1)
+        }
+        if args.trace_memory:
+            result["peak_memory_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+            tracemalloc.stop()
+        results[export_format] = result
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
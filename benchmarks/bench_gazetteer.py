@@ -0,0 +1,88 @@
+"""
+Compares location matching with one regex alternation against the Aho-Corasick gazetteer
+for dictionaries of 10, 1k and 50k names.
+
+Usage:
+    python benchmarks/bench_gazetteer.py [--windows 200] [--sizes 10 1000 50000]
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gazetteer import Gazetteer
+
+ALPHABET = "абвгдежзиклмнопрстуфхцчшэюя"
+
+def make_names(count, rng):
+    """Generates distinct capitalized pseudo place names"""
+    names = set()
+    while len(names) < count:
+        names.add("".join(rng.choice(ALPHABET) for _ in range(rng.randint(5, 12))).capitalize())
+    return sorted(names)
+
+def make_windows(names, count, rng):
+    """Generates 800-character listing windows mentioning a couple of dictionary names"""
+    filler = ("2-комн. квартира, 54 м², 7/12 эт. Продается светлая квартира с ремонтом, "
+              "рядом школа, детский сад и парк. Один взрослый собственник. ")
+    windows = []
+    for _ in range(count):
+        text = filler * 3
+        position = rng.randint(0, len(text) - 1)
+        text = text[:position] + f" {rng.choice(names)}, ул. {rng.choice(names)}, 12 " + text[position:]
+        windows.append(text[:800])
+    return windows
+
+def best_of(function, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--windows", type=int, default=200)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 50000])
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rng = random.Random(42)
+    results = []
+
+    for size in args.sizes:
+        names = make_names(size, rng)
+        windows = make_windows(names, args.windows, rng)
+
+        started = time.perf_counter()
+        # Longest names first so the alternation prefers the longest match, as the gazetteer does
+        pattern = re.compile("|".join(re.escape(name) for name in sorted(names, key=len, reverse=True)), re.IGNORECASE)
+        regex_build = time.perf_counter() - started
+
+        started = time.perf_counter()
+        gazetteer = Gazetteer.from_dict({"cities": [{"name": name} for name in names]})
+        automaton_build = time.perf_counter() - started
+
+        regex_scan = best_of(lambda: [list(pattern.finditer(window)) for window in windows])
+        automaton_scan = best_of(lambda: [gazetteer.find(window) for window in windows])
+
+        results.append({
+            "dictionary_size": size,
+            "windows": len(windows),
+            "regex_build_seconds": round(regex_build, 4),
+            "automaton_build_seconds": round(automaton_build, 4),
+            "regex_us_per_window": round(regex_scan / len(windows) * 1e6, 1),
+            "automaton_us_per_window": round(automaton_scan / len(windows) * 1e6, 1)
+        })
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Times grouped analytics of listings: extracting the group columns (floor bands, price per m²)
+from stored listing dictionaries and computing per-group statistics and histograms in one
+sorted pass, compared with a loop that removes outliers and bins every group separately, as
+analyze_data does for a single column. Checks that both give the same statistics and counts.
+
+Usage:
+    python benchmarks/bench_grouping.py [--sizes 100000 1000000] [--by rooms floor_band city district rooms,floor_band]
+        [--metric price_per_sqm] [--bins 20] [--repeat 3]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from _common import generate_listings
+
+def group_codes(columns, by, metric):
+    """Group code of every listing and the labels, as group_listings assigns them"""
+    values = columns[metric]
+    valid = ~np.isnan(values)
+    groups = np.zeros(len(values), dtype=np.int64)
+    combinations = [()]
+    for key in by:
+        codes, labels = columns["codes"][key], columns["labels"][key]
+        valid &= codes >= 0
+        groups = groups * max(len(labels), 1) + codes
+        combinations = [combination + (label,) for combination in combinations for label in labels]
+    return np.where(valid, groups, -1), [' / '.join(combination) for combination in combinations]
+
+def per_group_loop(analyzer, columns, codes, labels, metric, bins):
+    """Removes outliers, computes statistics and bins every group separately"""
+    values = columns[metric]
+    cleaned = {}
+    for code in np.unique(codes[codes >= 0]):
+        cleaned[labels[code]] = analyzer.remove_outliers(pd.Series(values[codes == code]))
+    lower = min(data.min() for data in cleaned.values())
+    upper = max(data.max() for data in cleaned.values())
+
+    result = {}
+    for label, data in cleaned.items():
+        stats = analyzer._basic_statistics(data)
+        stats['p25'], stats['p75'] = float(data.quantile(0.25)), float(data.quantile(0.75))
+        stats['histogram'] = np.histogram(data, bins=bins, range=(lower, upper))[0].tolist()
+        result[label] = stats
+    return result
+
+def matches(result, expected):
+    """Whether the grouped pass agrees with the per-group loop"""
+    if result['labels'] != list(expected):
+        return False
+    for i, label in enumerate(result['labels']):
+        stats = expected[label]
+        if result['statistics']['count'][i] != stats['count']:
+            return False
+        if result['histogram']['datasets'][i]['data'] != stats['histogram']:
+            return False
+        for name in ('mean', 'median', 'min', 'max', 'p25', 'p75', 'std'):
+            value = result['statistics'][name][i]
+            if value is None and stats[name] != stats[name]:
+                continue
+            if value is None or not np.isclose(value, stats[name], rtol=1e-6, atol=0.01):
+                return False
+    return True
+
+def timed(function, repeat):
+    """Returns (result, fastest seconds) of repeated calls"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--by", nargs="+", default=["rooms", "floor_band", "city", "district", "rooms,floor_band"],
+                        help="Group keys to time; combine keys with a comma")
+    parser.add_argument("--metric", default="price_per_sqm", choices=["price_per_sqm", "price", "area"])
+    parser.add_argument("--bins", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the fastest run is reported")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    logging.disable(logging.CRITICAL)
+
+    import app
+    import analyzer
+    import grouping
+
+    results = []
+    for size in args.sizes:
+        listings = list(generate_listings(size, descriptions=False))
+        started = time.perf_counter()
+        columns = grouping.group_columns(listings)
+        extract_seconds = time.perf_counter() - started
+        del listings
+
+        for by in args.by:
+            keys = by.split(",")
+            result, grouped_seconds = timed(
+                lambda: grouping.group_listings(columns, keys, args.metric, args.bins), args.repeat)
+            codes, labels = group_codes(columns, keys, args.metric)
+            expected, loop_seconds = timed(
+                lambda: per_group_loop(analyzer, columns, codes, labels, args.metric, args.bins), args.repeat)
+            results.append({
+                "size": size,
+                "by": keys,
+                "metric": args.metric,
+                "groups": len(result["labels"]),
+                "extract_seconds": round(extract_seconds, 3),
+                "grouped_seconds": round(grouped_seconds, 4),
+                "per_group_loop_seconds": round(loop_seconds, 4),
+                "speedup": round(loop_seconds / grouped_seconds, 1),
+                "matches": matches(result, expected)
+            })
+
+    print(json.dumps({"versions": {"numpy": np.__version__, "pandas": pd.__version__}, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
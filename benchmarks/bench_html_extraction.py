@@ -0,0 +1,69 @@
+"""
+Compares listing extraction throughput of the direct HTML path with the
+trafilatura text path on saved fixture pages.
+
+Usage:
+    python benchmarks/bench_html_extraction.py [--repeat 20] [fixture.html ...]
+"""
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def time_pages(function, pages, repeat):
+    """Returns (seconds per page, listings extracted per pass)"""
+    listing_count = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        listing_count = 0
+        for html in pages:
+            result = function(html)
+            listing_count += len(result['listings']) if result else 0
+    return (time.perf_counter() - started) / (repeat * len(pages)), listing_count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("fixtures", nargs="*",
+                        default=sorted(glob.glob(os.path.join(ROOT, "benchmarks", "fixtures", "*.html"))))
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    logging.disable(logging.WARNING)
+
+    import app  # noqa: F401 - initializes the app before the scraper module, as main.py does
+    from scraper import extract_avito_listings_from_html, extract_avito_listings_from_text, extract_text_content
+
+    pages = []
+    for path in args.fixtures:
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+
+    html_seconds, html_listings = time_pages(extract_avito_listings_from_html, pages, args.repeat)
+    text_seconds, text_listings = time_pages(
+        lambda html: extract_avito_listings_from_text(extract_text_content(html)), pages, args.repeat)
+
+    print(json.dumps({
+        "pages": len(pages),
+        "repeat": args.repeat,
+        "html": {
+            "ms_per_page": round(html_seconds * 1000, 2),
+            "pages_per_second": round(1 / html_seconds, 1),
+            "listings": html_listings
+        },
+        "text": {
+            "ms_per_page": round(text_seconds * 1000, 2),
+            "pages_per_second": round(1 / text_seconds, 1),
+            "listings": text_listings
+        }
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Measures the time to read one page of the scrape history at increasing depths with
+OFFSET pagination and with keyset pagination on (created_at, id).
+
+Usage:
+    python benchmarks/bench_keyset_pagination.py [--rows 200000] [--depths 0 1000 10000 100000 199000]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def best_of(function, repeat):
+    """Returns the fastest of repeat calls of function in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 1000, 10000, 100000, 199000])
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    logging.disable(logging.INFO)
+
+    from app import app, db
+    from models import ScrapedData
+    from pagination import keyset_page, encode_cursor
+
+    # Rows carry a realistic data column, which the page queries must not read
+    started_at = datetime(2024, 1, 1)
+    payload = json.dumps({"listings": [], "pagination": None, "batch_count": 1}) + " " * 2000
+
+    results = []
+    with app.app_context():
+        for start in range(0, args.rows, 10000):
+            db.session.execute(db.insert(ScrapedData), [
+                {"url": f"https://www.avito.ru/bench/{i}", "data": payload,
+                 "created_at": started_at + timedelta(seconds=i // 3)}
+                for i in range(start, min(start + 10000, args.rows))
+            ])
+        db.session.commit()
+
+        ordered = ScrapedData.query.order_by(ScrapedData.created_at.desc(), ScrapedData.id.desc())
+        client = app.test_client()
+
+        for depth in args.depths:
+            if depth >= args.rows:
+                continue
+            cursor = None
+            if depth:
+                previous = ordered.offset(depth - 1).first()
+                cursor = encode_cursor(previous.created_at, previous.id)
+
+            offset_ms = best_of(lambda: ordered.offset(depth).limit(args.limit).all(), args.repeat)
+            keyset_ms = best_of(lambda: keyset_page(ScrapedData.query, ScrapedData, cursor, args.limit), args.repeat)
+            url = f"/api/scrapes?limit={args.limit}" + (f"&cursor={cursor}" if cursor else "")
+            endpoint_ms = best_of(lambda: client.get(url), args.repeat)
+            db.session.expunge_all()
+
+            results.append({
+                "depth": depth,
+                "offset_ms": round(offset_ms, 2),
+                "keyset_ms": round(keyset_ms, 2),
+                "endpoint_ms": round(endpoint_ms, 2)
+            })
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
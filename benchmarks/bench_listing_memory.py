@@ -0,0 +1,72 @@
+"""
+Measures the memory held by listings as JSON-parsed dictionaries versus Listing records,
+and the time to build summary statistics from each.
+
+Listings are created the way they are read back from storage: every batch is parsed from
+JSON, so strings are not shared between dictionaries.
+
+Usage:
+    python benchmarks/bench_listing_memory.py [--count 100000] [--descriptions]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from listing import Listing, listing_columns
+from _common import generate_listings
+
+def load_batches(count, descriptions, batch_size=500):
+    """Returns the listings as they come out of storage: JSON batches parsed one by one"""
+    listings = list(generate_listings(count, descriptions=descriptions))
+    return [json.dumps(listings[i:i + batch_size]) for i in range(0, count, batch_size)]
+
+def measure(build):
+    """Returns (retained bytes, seconds) of the object returned by build"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--descriptions", action="store_true", help="Include descriptions")
+    args = parser.parse_args()
+
+    batches = load_batches(args.count, args.descriptions)
+
+    dicts, dict_bytes, dict_seconds = measure(
+        lambda: [listing for batch in batches for listing in json.loads(batch)])
+    del dicts
+    records, record_bytes, record_seconds = measure(
+        lambda: [Listing.from_dict(listing) for batch in batches for listing in json.loads(batch)])
+
+    started = time.perf_counter()
+    columns = listing_columns(records)
+    columns_seconds = time.perf_counter() - started
+    column_bytes = sum(column.nbytes for column in columns.values())
+
+    per_100k = 100000 / args.count
+    print(json.dumps({
+        "listings": args.count,
+        "dict_mb_per_100k": round(dict_bytes * per_100k / 2**20, 1),
+        "record_mb_per_100k": round(record_bytes * per_100k / 2**20, 1),
+        "saved_mb_per_100k": round((dict_bytes - record_bytes) * per_100k / 2**20, 1),
+        "dict_bytes_per_listing": round(dict_bytes / args.count),
+        "record_bytes_per_listing": round(record_bytes / args.count),
+        "numeric_columns_mb_per_100k": round(column_bytes * per_100k / 2**20, 1),
+        "load_dicts_seconds": round(dict_seconds, 3),
+        "load_records_seconds": round(record_seconds, 3),
+        "columns_seconds": round(columns_seconds, 3)
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Measures reads and writes per second against one SQLite database with 1, 4 and 8 worker
+processes, each running several request threads like a threaded gunicorn worker, with the
+default SQLite settings and with SQLITE_PRODUCTION_MODE (WAL pragmas and a single-writer
+queue per process).
+
+Writes go through scrape_avito_data with the network fetch replaced by synthetic listings;
+reads request the scrape history and a scrape summary through the Flask test client.
+
+Usage:
+    python benchmarks/bench_sqlite_concurrency.py [--workers 1 4 8] [--duration 5] [--threads 4] [--write-ratio 0.2]
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _common import generate_listings
+
+def worker(database_url, production, duration, threads, write_ratio, results, start=None):
+    """Runs request threads in one process and reports its counters"""
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["SQLITE_PRODUCTION_MODE"] = "1" if production else "0"
+    logging.disable(logging.CRITICAL)
+
+    from app import app
+    import scraper
+
+    listings = list(generate_listings(50, seed=os.getpid()))
+    scraper.fetch_avito_data = lambda url, api_key=None, progress=None, validators=None: (
+        {"listings": listings, "pagination": None}, "bench")
+
+    counters = {"reads": 0, "writes": 0, "read_errors": 0, "write_errors": 0}
+    if not threads:
+        with app.app_context():
+            scraper.scrape_avito_data("https://www.avito.ru/bench/seed")
+        results.put(counters)
+        return
+
+    # All workers start measuring together once every one of them has imported the app
+    start.wait()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def run(seed):
+        rng = random.Random(seed)
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            if rng.random() < write_ratio:
+                with app.app_context():
+                    ok = scraper.scrape_avito_data(f"https://www.avito.ru/bench/{rng.randint(1, 100)}")['success']
+                key = "writes" if ok else "write_errors"
+            else:
+                path = "/api/scrapes?limit=20" if rng.random() < 0.5 else "/api/data/1/summary"
+                key = "reads" if client.get(path).status_code == 200 else "read_errors"
+            with lock:
+                counters[key] += 1
+
+    pool = [threading.Thread(target=run, args=(os.getpid() * 100 + i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(counters)
+
+def run_case(workers, production, args):
+    database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+
+    # Create the schema and one scrape for the summary reads before the workers start
+    seed = context.Process(target=worker, args=(database_url, production, 0, 0, 1, results))
+    seed.start()
+    results.get()
+    seed.join()
+
+    start = context.Barrier(workers)
+    processes = [
+        context.Process(target=worker, args=(database_url, production, args.duration, args.threads,
+                                              args.write_ratio, results, start))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    totals = {"reads": 0, "writes": 0, "read_errors": 0, "write_errors": 0}
+    for _ in processes:
+        for key, value in results.get().items():
+            totals[key] += value
+    for process in processes:
+        process.join()
+
+    return {
+        "mode": "production" if production else "default",
+        "workers": workers,
+        "reads_per_second": round(totals["reads"] / args.duration, 1),
+        "writes_per_second": round(totals["writes"] / args.duration, 1),
+        "read_errors": totals["read_errors"],
+        "write_errors": totals["write_errors"]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--duration", type=float, default=5, help="Seconds per case")
+    parser.add_argument("--threads", type=int, default=4, help="Request threads per worker")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="Share of requests that scrape")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    results = []
+    for production in (False, True):
+        for workers in args.workers:
+            results.append(run_case(workers, production, args))
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Measures peak memory of storing N synthetic listings with the previous single-row
+approach (full list + one json.dumps) and with batched streaming through store_listings.
+
+Usage:
+    python benchmarks/bench_streaming_ingestion.py [--sizes 10000 100000 1000000] [--legacy-max 100000]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _common import generate_listings
+
+def measure(function):
+    """Returns (peak traced bytes, seconds) of calling function"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--legacy-max", type=int, default=100000,
+                        help="Skip the single-row approach above this many listings")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    logging.disable(logging.INFO)
+
+    from app import app, db
+    from models import ScrapedData
+    from storage import store_listings
+
+    def legacy(count):
+        structured_data = {"listings": list(generate_listings(count)), "pagination": None}
+        db.session.add(ScrapedData(url="https://www.avito.ru/bench", data=json.dumps(structured_data)))
+        db.session.commit()
+
+    def streaming(count):
+        store_listings("https://www.avito.ru/bench", generate_listings(count))
+        db.session.commit()
+
+    results = []
+    with app.app_context():
+        for size in args.sizes:
+            result = {"listings": size}
+            if size <= args.legacy_max:
+                peak, elapsed = measure(lambda: legacy(size))
+                result["single_row_peak_mb"] = round(peak / 2**20, 1)
+                result["single_row_seconds"] = round(elapsed, 2)
+            peak, elapsed = measure(lambda: streaming(size))
+            result["streaming_peak_mb"] = round(peak / 2**20, 1)
+            result["streaming_seconds"] = round(elapsed, 2)
+            results.append(result)
+            db.session.expunge_all()
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
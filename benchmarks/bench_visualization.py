@@ -0,0 +1,133 @@
+"""
+Times every stage of generate_visualization separately: outlier removal, statistics, bin
+selection, drawing the histogram, PNG rendering, base64 encoding and Chart.js data, for each
+binning branch across data sizes and requested bin counts.
+
+Branches:
+    continuous    price with many distinct values (requested bins)
+    adjusted      floor with 30 distinct values (bins reduced to the distinct count)
+    rooms         rooms with 5 distinct values (values as bins, jittered plot, per-value scans)
+    narrow_area   area within 8 m² (custom bins, one axvline per point)
+    narrow_area_unique  area with 6 distinct values within 8 m² (as above, per-value scans)
+
+Drawing a narrow area range adds one line per data point, so the draw and render stages of
+the narrow branches are skipped above --axvline-max values.
+
+Usage:
+    python benchmarks/bench_visualization.py [--sizes 1000 10000 100000 1000000] [--bins 10 30 100 500]
+        [--branches continuous rooms] [--repeat 3] [--axvline-max 10000]
+"""
+import os
+import sys
+import json
+import time
+import base64
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+def generate_data(branch, size, seed=42):
+    """Returns (parameter, data) shaped to take the given binning branch"""
+    rng = np.random.default_rng(seed)
+    if branch == "continuous":
+        return "price", pd.Series(np.round(rng.normal(12e6, 4e6, size), -3))
+    if branch == "adjusted":
+        return "floor", pd.Series(rng.integers(1, 31, size).astype(float))
+    if branch == "rooms":
+        return "rooms", pd.Series(rng.integers(1, 6, size).astype(float))
+    if branch == "narrow_area":
+        return "area", pd.Series(np.round(rng.uniform(50, 58, size), 1))
+    if branch == "narrow_area_unique":
+        return "area", pd.Series(rng.choice([50.0, 51.5, 52.0, 54.0, 56.5, 58.0], size))
+    raise ValueError(f"Unknown branch: {branch}")
+
+def bin_strategy(actual_bins, unique_values, bins, narrow):
+    """Names the binning branch the plot took"""
+    if narrow:
+        return "narrow_area_custom"
+    if isinstance(actual_bins, list):
+        return "unique_values"
+    if unique_values < bins:
+        return "adjusted"
+    if actual_bins != bins:
+        return "discrete"
+    return "requested"
+
+def run_case(analyzer, plt, branch, size, bins, repeat, axvline_max):
+    parameter, data = generate_data(branch, size)
+    narrow = parameter == "area" and data.max() - data.min() < 10
+    draw = not (narrow and size > axvline_max)
+    stages = {}
+
+    def timed(stage, function):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        stages[stage] = min(stages.get(stage, elapsed), elapsed)
+        return result
+
+    for _ in range(repeat):
+        np.random.seed(0)
+        clean_data = timed("remove_outliers", lambda: analyzer.remove_outliers(data))
+        stats = timed("statistics", lambda: analyzer._basic_statistics(clean_data))
+        actual_bins, unique_values = timed(
+            "choose_bins", lambda: analyzer._choose_bins(clean_data, parameter, bins, stats))
+        if draw:
+            timed("draw", lambda: analyzer._draw_histogram(clean_data, parameter, None, actual_bins,
+                                                            unique_values, stats))
+            png = timed("png_render", analyzer._render_png)
+            timed("base64", lambda: base64.b64encode(png).decode("utf-8"))
+        chart_data = timed("chart_data", lambda: analyzer._build_chart_data(
+            clean_data, parameter, actual_bins, unique_values, stats))
+    plt.close("all")
+
+    return {
+        "branch": branch,
+        "parameter": parameter,
+        "size": size,
+        "bins": bins,
+        "bin_strategy": bin_strategy(actual_bins, unique_values, bins, narrow),
+        "chart_bins": len(chart_data["values"]),
+        "png_bytes": len(png) if draw else None,
+        "skipped": [] if draw else ["draw", "png_render", "base64"],
+        "seconds": {stage: round(elapsed, 6) for stage, elapsed in stages.items()},
+        "total_seconds": round(sum(stages.values()), 6)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--bins", type=int, nargs="+", default=[10, 30, 100, 500])
+    parser.add_argument("--branches", nargs="+",
+                        default=["continuous", "adjusted", "rooms", "narrow_area", "narrow_area_unique"])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the fastest run of each stage is reported")
+    parser.add_argument("--axvline-max", type=int, default=10000,
+                        help="Skip drawing narrow area ranges above this many values")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    logging.disable(logging.CRITICAL)
+
+    import matplotlib
+    import app
+    import analyzer
+    plt = analyzer.plt
+
+    results = []
+    for branch in args.branches:
+        for size in args.sizes:
+            for bins in args.bins:
+                results.append(run_case(analyzer, plt, branch, size, bins, args.repeat, args.axvline_max))
+
+    print(json.dumps({
+        "versions": {"numpy": np.__version__, "pandas": pd.__version__, "matplotlib": matplotlib.__version__},
+        "results": results
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""
+End-to-end load test of the Flask app.
+
+Starts the app in a separate process on a temporary SQLite database, together with a local
+stub server standing in for the Firecrawl API and the Avito search pages, then replays a mix
+of user sessions at a target request rate:
+
+    scrape     POST /scrape (page download), GET /, POST /analyze, GET /results, and a
+               reload of /results with If-None-Match
+    firecrawl  the same with an API key, so the scrape goes through the Firecrawl stub
+    api        GET /api/scrapes, then summary, data (and its revalidation), search,
+               histogram, analyses and one analysis of a random scrape
+
+Sessions arrive at random (Poisson) intervals so that requests average --rps; requests within
+a session run one after another. Arrivals do not wait for slow responses, so an overloaded app
+shows up as growing latency rather than a lower request rate. Sessions above --max-sessions in
+flight are dropped and counted.
+
+Prints JSON with p50/p95/p99 latency, request and error counts per endpoint, achieved request
+rate and the database size, split into the rows written by POST /scrape and POST /analyze.
+
+Usage:
+    python benchmarks/load_test.py [--rps 20] [--duration 30] [--mix scrape=2,firecrawl=1,api=7]
+        [--urls 50] [--stub-latency 0.2] [--max-sessions 200] [--sqlite-production]
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import sqlite3
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "avito_search_moskva.html")
+
+# Requests per session of each kind, used to turn the request rate into a session rate
+SESSION_REQUESTS = {"scrape": 5, "firecrawl": 5, "api": 8}
+
+PARAMETERS = ["price", "area", "rooms"]
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def parse_mix(text):
+    """Parses 'scrape=2,api=7' into normalized session weights"""
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SESSION_REQUESTS:
+            raise argparse.ArgumentTypeError(f"Unknown session kind: {name}")
+        weights[name] = float(weight or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise argparse.ArgumentTypeError("Session weights must add up to more than 0")
+    return {name: weight / total for name, weight in weights.items()}
+
+def firecrawl_listings(count=50, seed=0):
+    """Builds listings in the format the Firecrawl extraction schema returns"""
+    rng = random.Random(seed)
+    listings = []
+    for i in range(count):
+        rooms = rng.randint(1, 4)
+        area = round(rng.uniform(25, 120), 1)
+        floor = rng.randint(1, 20)
+        listings.append({
+            "title": f"{rooms}-к. квартира, {area} м², {floor}/25 эт.",
+            "price": rng.randint(30, 250) * 100000,
+            "location": f"Москва, ул. Примерная, {i + 1}",
+            "area": area,
+            "rooms": rooms,
+            "floor": f"{floor}/25",
+            "description": "Продается светлая квартира с ремонтом. " * 5
+        })
+    return listings
+
+def start_stub(port, latency):
+    """
+    Serves the fixture search page under /avito/ and a Firecrawl scrape endpoint, both after
+    latency seconds, in a daemon thread
+    """
+    from aiohttp import web
+
+    with open(FIXTURE, encoding="utf-8") as f:
+        html = f.read()
+    firecrawl_result = {"listings": firecrawl_listings(), "pagination": {"total_pages": 1}}
+
+    async def page(request):
+        await asyncio.sleep(latency)
+        return web.Response(text=html, content_type="text/html", headers={"ETag": '"fixture-1"'})
+
+    async def firecrawl(request):
+        await request.read()
+        await asyncio.sleep(latency)
+        return web.json_response(firecrawl_result)
+
+    application = web.Application()
+    application.router.add_get("/avito/{tail:.*}", page)
+    application.router.add_post("/api/v1/scrape", firecrawl)
+
+    ready = threading.Event()
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(application)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+
+def serve_app(port):
+    """Runs the Flask app on a threaded WSGI server; entry point of the app process"""
+    logging.disable(logging.WARNING)
+    # The stub server listens on a loopback address, which the scraper blocks by default
+    from trafilatura.settings import DEFAULT_CONFIG
+    DEFAULT_CONFIG.set("DEFAULT", "SSRF_PROTECTION", "off")
+
+    from werkzeug.serving import make_server
+    from app import app
+
+    make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+def start_app(port, database_path, stub_port, sqlite_production):
+    """Starts the app process and waits until it answers"""
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{database_path}",
+        FIRECRAWL_API_URL=f"http://127.0.0.1:{stub_port}/api/v1/scrape",
+        SQLITE_PRODUCTION_MODE="1" if sqlite_production else "0",
+        SCHEDULER_ENABLED="0"
+    )
+    env.pop("FIRECRAWL_API_KEY", None)
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve-app", str(port)],
+                               env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The app process exited during startup")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("The app did not start within 60 seconds")
+
+class Recorder:
+    """Collects latencies and errors per endpoint"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def request(self, session, endpoint, method, url, expect=(200,), **kwargs):
+        """
+        Sends one request and records it under endpoint
+
+        Returns:
+            tuple: (status, headers, body) or (None, None, None) if the request failed
+        """
+        started = time.perf_counter()
+        try:
+            async with session.request(method, url, allow_redirects=False, **kwargs) as response:
+                body = await response.read()
+                status, headers = response.status, response.headers
+        except Exception:
+            self.latencies[endpoint].append(time.perf_counter() - started)
+            self.errors[endpoint] += 1
+            self.statuses[endpoint]["exception"] += 1
+            return None, None, None
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        self.statuses[endpoint][str(status)] += 1
+        if status not in expect:
+            self.errors[endpoint] += 1
+        return status, headers, body
+
+    def report(self, duration):
+        def percentile(values, q):
+            return round(values[min(len(values) - 1, int(round(q * (len(values) - 1))))] * 1000, 1)
+
+        endpoints = {}
+        for endpoint in sorted(self.latencies):
+            values = sorted(self.latencies[endpoint])
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors[endpoint],
+                "statuses": dict(self.statuses[endpoint]),
+                "p50_ms": percentile(values, 0.50),
+                "p95_ms": percentile(values, 0.95),
+                "p99_ms": percentile(values, 0.99),
+                "max_ms": round(values[-1] * 1000, 1)
+            }
+        requests = sum(len(values) for values in self.latencies.values())
+        return {
+            "requests": requests,
+            "errors": sum(self.errors.values()),
+            "achieved_rps": round(requests / duration, 1),
+            "endpoints": endpoints
+        }
+
+async def scrape_session(session, base, recorder, rng, page_url, api_key=None):
+    form = {"url": page_url}
+    if api_key:
+        form["api_key"] = api_key
+    status, _, _ = await recorder.request(session, "POST /scrape", "POST", f"{base}/scrape", expect=(302,), data=form)
+    if status is None:
+        return
+    await recorder.request(session, "GET /", "GET", f"{base}/")
+
+    form = {"parameter": rng.choice(PARAMETERS), "bins": str(rng.choice([10, 30, 100])), "title": ""}
+    status, headers, _ = await recorder.request(session, "POST /analyze", "POST", f"{base}/analyze",
+                                                expect=(302,), data=form)
+    if status != 302 or not headers.get("Location", "").endswith("/results"):
+        return
+
+    status, headers, _ = await recorder.request(session, "GET /results", "GET", f"{base}/results")
+    etag = headers.get("ETag") if status == 200 else None
+    if etag:
+        await recorder.request(session, "GET /results (revalidate)", "GET", f"{base}/results",
+                               expect=(200, 304), headers={"If-None-Match": etag})
+
+async def api_session(session, base, recorder, rng):
+    status, _, body = await recorder.request(session, "GET /api/scrapes", "GET", f"{base}/api/scrapes?limit=20")
+    scrapes = json.loads(body).get("scrapes", []) if status == 200 else []
+    if not scrapes:
+        return
+    data_id = rng.choice(scrapes)["id"]
+
+    await recorder.request(session, "GET /api/data/<id>/summary", "GET", f"{base}/api/data/{data_id}/summary")
+    status, headers, _ = await recorder.request(session, "GET /api/data/<id>", "GET", f"{base}/api/data/{data_id}")
+    if status == 200 and headers.get("ETag"):
+        await recorder.request(session, "GET /api/data/<id> (revalidate)", "GET", f"{base}/api/data/{data_id}",
+                               expect=(304,), headers={"If-None-Match": headers["ETag"]})
+    await recorder.request(session, "GET /api/data/<id>/search", "GET",
+                           f"{base}/api/data/{data_id}/search?rooms={rng.randint(1, 4)}&price_max=15000000")
+    await recorder.request(session, "GET /api/analysis/<id>/<parameter>/histogram", "GET",
+                           f"{base}/api/analysis/{data_id}/{rng.choice(PARAMETERS)}/histogram?bins={rng.randint(10, 100)}")
+
+    status, _, body = await recorder.request(session, "GET /api/scrapes/<id>/analyses", "GET",
+                                             f"{base}/api/scrapes/{data_id}/analyses?limit=5")
+    analyses = json.loads(body).get("analyses", []) if status == 200 else []
+    if analyses:
+        await recorder.request(session, "GET /api/analysis/<id>", "GET",
+                               f"{base}/api/analysis/{rng.choice(analyses)['id']}")
+
+async def run_load(base, stub_base, args, recorder):
+    import aiohttp
+
+    rng = random.Random(args.seed)
+    kinds = list(args.mix)
+    weights = [args.mix[kind] for kind in kinds]
+    requests_per_session = sum(SESSION_REQUESTS[kind] * weight for kind, weight in args.mix.items())
+    session_rate = args.rps / requests_per_session
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    tasks = set()
+    dropped = 0
+
+    async def one(kind, seed):
+        session_rng = random.Random(seed)
+        page_url = f"{stub_base}/avito/moskva/kvartiry/prodam?p={session_rng.randint(1, args.urls)}"
+        # Every session is one browser with its own cookies
+        jar = aiohttp.CookieJar(unsafe=True)
+        async with aiohttp.ClientSession(timeout=timeout, cookie_jar=jar) as session:
+            if kind == "api":
+                await api_session(session, base, recorder, session_rng)
+            else:
+                await scrape_session(session, base, recorder, session_rng, page_url,
+                                     api_key="load-test" if kind == "firecrawl" else None)
+
+    # Store a few scrapes first so API sessions have data from the start
+    await asyncio.gather(*(one("scrape", rng.random()) for _ in range(args.warmup)))
+    recorder.__init__()
+
+    started = time.perf_counter()
+    next_arrival = started
+    while True:
+        next_arrival += rng.expovariate(session_rate)
+        if next_arrival - started >= args.duration:
+            break
+        await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+        if len(tasks) >= args.max_sessions:
+            dropped += 1
+            continue
+        task = asyncio.create_task(one(rng.choices(kinds, weights)[0], rng.random()))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return time.perf_counter() - started, dropped
+
+def database_report(path):
+    """Returns the database file size and the bytes of the rows written per endpoint"""
+    wal = path + "-wal"
+    connection = sqlite3.connect(path)
+    try:
+        def scalar(sql):
+            return connection.execute(sql).fetchone()[0] or 0
+
+        return {
+            "file_bytes": os.path.getsize(path),
+            "wal_bytes": os.path.getsize(wal) if os.path.exists(wal) else 0,
+            "per_endpoint": {
+                "POST /scrape": {
+                    "rows": scalar("SELECT count(*) FROM scraped_data"),
+                    "bytes": scalar("SELECT sum(length(listings)) FROM listing_batch")
+                             + scalar("SELECT sum(length(payload)) FROM listing_descriptions")
+                             + scalar("SELECT sum(length(data)) FROM scraped_data")
+                             + scalar("SELECT sum(length(statistics)) FROM scrape_summary")
+                },
+                "POST /analyze": {
+                    "rows": scalar("SELECT count(*) FROM analysis_result"),
+                    "bytes": scalar("SELECT sum(length(statistics) + length(visualization_data)) FROM analysis_result")
+                }
+            }
+        }
+    finally:
+        connection.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=20, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds during which sessions start")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("scrape=2,firecrawl=1,api=7"),
+                        help="Session weights, e.g. scrape=2,firecrawl=1,api=7")
+    parser.add_argument("--urls", type=int, default=50, help="Number of distinct search pages scraped")
+    parser.add_argument("--stub-latency", type=float, default=0.2, help="Seconds the stub waits per response")
+    parser.add_argument("--max-sessions", type=int, default=200, help="Sessions in flight before new ones are dropped")
+    parser.add_argument("--warmup", type=int, default=3, help="Scrape sessions run before measuring")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds before a request counts as failed")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--sqlite-production", action="store_true", help="Run the app with SQLITE_PRODUCTION_MODE")
+    parser.add_argument("--serve-app", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_app:
+        serve_app(args.serve_app)
+        return
+
+    database_path = os.path.join(tempfile.mkdtemp(), "load.db")
+    stub_port, app_port = free_port(), free_port()
+    start_stub(stub_port, args.stub_latency)
+    process = start_app(app_port, database_path, stub_port, args.sqlite_production)
+
+    recorder = Recorder()
+    try:
+        duration, dropped = asyncio.run(run_load(f"http://127.0.0.1:{app_port}", f"http://127.0.0.1:{stub_port}",
+                                                 args, recorder))
+    finally:
+        process.terminate()
+        process.wait()
+
+    report = {
+        "target_rps": args.rps,
+        "duration_seconds": round(duration, 1),
+        "mix": args.mix,
+        "sqlite_production_mode": args.sqlite_production,
+        "dropped_sessions": dropped
+    }
+    report.update(recorder.report(duration))
+    report["database"] = database_report(database_path)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import threading
+from collections import OrderedDict
+
+class BoundedCache:
+    """Thread-safe least-recently-used cache with a fixed maximum number of entries"""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for key and marks it as recently used
+
+        Args:
+            key: Cache key
+            default: Value returned when key is not cached
+
+        Returns:
+            Cached value or default
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """
+        Stores value under key, evicting the least recently used entries if full
+
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_create(self, key, factory):
+        """
+        Returns the cached value for key, building it with factory on a miss
+
+        The factory runs outside the lock, so slow builds do not block other keys.
+        A factory result of None is returned but not cached.
+
+        Args:
+            key: Cache key
+            factory (callable): Function without arguments that builds the value
+
+        Returns:
+            Cached or newly built value
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is not sentinel:
+            return value
+
+        value = factory()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def pop(self, key, default=None):
+        """Removes key from the cache and returns its value"""
+        with self._lock:
+            return self._entries.pop(key, default)
+
+    def clear(self):
+        """Removes all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns cache usage counters
+
+        Returns:
+            dict: size, maxsize, hits and misses
+        """
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,359 @@
+import os
+import heapq
+import logging
+import numpy as np
+from listing import listing_columns
+from search import get_listing_index, extract_city
+from cache import BoundedCache
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Difference in each feature that counts as distance 1, so that 10 m² of area weigh as much as
+# one room or five floors. Fixed units keep distances comparable across datasets.
+FEATURE_SCALES = {'area': 10.0, 'rooms': 1.0, 'floor': 5.0}
+
+# How a reference listing's location restricts its comparables
+LOCATION_MATCHES = ('any', 'city', 'district')
+
+# Points per k-d tree leaf, compared in one vectorized pass
+COMPARABLES_LEAF_SIZE = 32
+
+# Maximum number of comparables per query
+COMPARABLES_MAX_K = 100
+
+# Percentiles of the price per m² reported for comparables
+PRICE_PER_SQM_PERCENTILES = (10, 25, 50, 75, 90)
+
+class KDTree:
+    """
+    k-d tree answering k-nearest-neighbour queries over points in a few dimensions
+
+    Nodes split their points at the median of the widest dimension until at most leaf_size
+    points are left. Points are reordered so that every node covers a contiguous slice, and
+    each node keeps the bounding box of its points. A query visits nodes nearest box first
+    and stops once no box is closer than the k-th best point found, so it reads a few leaves
+    instead of every point.
+    """
+
+    def __init__(self, points, leaf_size=COMPARABLES_LEAF_SIZE):
+        """
+        Args:
+            points (numpy.ndarray): Array of shape (n, dimensions) without NaN values
+            leaf_size (int, optional): Maximum number of points in a leaf
+        """
+        points = np.asarray(points, dtype=float)
+        self.size = len(points)
+        order = np.arange(self.size)
+
+        # Node i covers order[starts[i]:ends[i]]; its children are lefts[i] and lefts[i] + 1,
+        # and lefts[i] is -1 for leaves
+        self.starts, self.ends, self.lefts = [], [], []
+        lows, highs = [], []
+
+        def add_node(start, end):
+            node_points = points[order[start:end]]
+            self.starts.append(start)
+            self.ends.append(end)
+            self.lefts.append(-1)
+            lows.append(node_points.min(axis=0))
+            highs.append(node_points.max(axis=0))
+            return len(self.starts) - 1
+
+        stack = [add_node(0, self.size)] if self.size else []
+        while stack:
+            node = stack.pop()
+            start, end = self.starts[node], self.ends[node]
+            spread = highs[node] - lows[node]
+            if end - start <= leaf_size or not spread.any():
+                continue
+            dimension = int(np.argmax(spread))
+            middle = (start + end) // 2
+            segment = order[start:end]
+            order[start:end] = segment[np.argpartition(points[segment, dimension], middle - start)]
+            left = add_node(start, middle)
+            add_node(middle, end)
+            self.lefts[node] = left
+            stack.extend((left, left + 1))
+
+        self.order = order
+        self.points = points[order]
+        self.lows = np.array(lows).reshape(-1, points.shape[1])
+        self.highs = np.array(highs).reshape(-1, points.shape[1])
+
+    def query(self, point, k):
+        """
+        Finds the k points nearest to point by Euclidean distance
+
+        Args:
+            point (sequence): Coordinates of the query point
+            k (int): Number of neighbours
+
+        Returns:
+            tuple: (distances, positions) arrays, nearest first; positions index the points
+                the tree was built from
+        """
+        best_distances = np.empty(0)
+        best_positions = np.empty(0, dtype=np.intp)
+        if not self.size or k <= 0:
+            return best_distances, best_positions
+
+        point = np.asarray(point, dtype=float)
+        # Squared distance of the k-th best point so far
+        bound = np.inf
+        heap = [(0.0, 0)]
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if distance >= bound:
+                break
+
+            left = self.lefts[node]
+            if left < 0:
+                start, end = self.starts[node], self.ends[node]
+                distances = ((self.points[start:end] - point) ** 2).sum(axis=1)
+                best_distances = np.concatenate([best_distances, distances])
+                best_positions = np.concatenate([best_positions, np.arange(start, end)])
+                if len(best_distances) > k:
+                    keep = np.argpartition(best_distances, k - 1)[:k]
+                    best_distances, best_positions = best_distances[keep], best_positions[keep]
+                if len(best_distances) == k:
+                    bound = best_distances.max()
+                continue
+
+            # Squared distance from the point to the bounding boxes of both children
+            gaps = (np.maximum(self.lows[left:left + 2] - point, 0)
+                    + np.maximum(point - self.highs[left:left + 2], 0))
+            for child, child_distance in zip((left, left + 1), (gaps ** 2).sum(axis=1)):
+                if child_distance < bound:
+                    heapq.heappush(heap, (float(child_distance), child))
+
+        ranked = np.lexsort((best_positions, best_distances))
+        return np.sqrt(best_distances[ranked]), self.order[best_positions[ranked]]
+
+class ComparablesIndex:
+    """
+    Nearest-neighbour index over the listings of one scraped dataset
+
+    Listings are compared by area, rooms and floor scaled by FEATURE_SCALES. Listings carry
+    no coordinates, so location is matched exactly on city and district instead of being
+    a distance. A k-d tree is built for every combination of compared features and location
+    on its first query, over the listings that have a price, an area and every compared
+    feature, and kept for later queries.
+    """
+
+    def __init__(self, listings):
+        """
+        Args:
+            listings (list): Listing records, kept by the index and converted to dictionaries for results
+        """
+        self.listings = listings
+        self.size = len(listings)
+
+        columns = listing_columns(listings, ('price',) + tuple(FEATURE_SCALES))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.price_per_sqm = np.where((columns['area'] > 0) & (columns['price'] > 0),
+                                          columns['price'] / columns['area'], np.nan)
+        self.features = {field: columns[field] / scale for field, scale in FEATURE_SCALES.items()}
+        self.cities = np.array([listing.city or extract_city(listing.location) for listing in listings], dtype=object)
+        self.districts = np.array([listing.district for listing in listings], dtype=object)
+
+        self._trees = BoundedCache(maxsize=int(os.environ.get("COMPARABLES_TREES_PER_INDEX", 32)))
+
+    def _tree(self, features, city, district):
+        """
+        Returns (positions, tree) for the listings matching the location that have every feature
+        """
+        def build():
+            mask = ~np.isnan(self.price_per_sqm)
+            for field in features:
+                mask &= ~np.isnan(self.features[field])
+            if city is not None:
+                mask &= self.cities == city
+            if district is not None:
+                mask &= self.districts == district
+            positions = np.flatnonzero(mask)
+            points = np.column_stack([self.features[field][positions] for field in features])
+            logger.info(f"Built comparables tree over {len(positions)} of {self.size} listings "
+                        f"({', '.join(features)}; city={city}, district={district})")
+            return positions, KDTree(points)
+
+        return self._trees.get_or_create((features, city, district), build)
+
+    def query(self, values, k, city=None, district=None, exclude=None):
+        """
+        Finds the k listings nearest to the given feature values
+
+        Args:
+            values (dict): Feature -> value in natural units; features that are None are not compared
+            k (int): Number of listings
+            city (str, optional): Only listings in this city
+            district (str, optional): Only listings in this district
+            exclude (int, optional): Position of a listing to leave out, e.g. the reference listing
+
+        Returns:
+            list: (distance, position) pairs, nearest first
+        """
+        features = tuple(field for field in FEATURE_SCALES if values.get(field) is not None)
+        point = [values[field] / FEATURE_SCALES[field] for field in features]
+        positions, tree = self._tree(features, city, district)
+        distances, found = tree.query(point, k + (exclude is not None))
+        return [(float(distance), int(positions[position]))
+                for distance, position in zip(distances, found)
+                if positions[position] != exclude][:k]
+
+# Comparables indexes per data_id, built on first query
+_index_cache = BoundedCache(maxsize=int(os.environ.get("COMPARABLES_INDEX_CACHE_SIZE", 16)))
+
+def get_comparables_index(data_id):
+    """
+    Returns the comparables index of a scraped dataset, building and caching it on first use
+
+    The listings are shared with the search index of the dataset.
+
+    Args:
+        data_id (int): ID of the scraped data
+
+    Returns:
+        ComparablesIndex: Index over the dataset listings, or None if the data does not exist
+    """
+    def build():
+        listing_index = get_listing_index(data_id)
+        if listing_index is None:
+            return None
+        return ComparablesIndex(listing_index.listings)
+
+    return _index_cache.get_or_create(data_id, build)
+
+def evict_comparables_index(data_id):
+    """
+    Removes the cached comparables index of a scraped dataset
+    """
+    _index_cache.pop(data_id)
+
+def listing_query(listing, location='city'):
+    """
+    Builds the query for the comparables of a listing
+
+    Args:
+        listing (Listing): Reference listing
+        location (str, optional): 'city' or 'district' to keep comparables in the listing's
+            city or district, 'any' to search everywhere
+
+    Returns:
+        dict: Keyword arguments of find_comparables
+
+    Raises:
+        ValueError: If the listing has no area or the location match is unknown
+    """
+    if location not in LOCATION_MATCHES:
+        raise ValueError(f"location must be one of: {', '.join(LOCATION_MATCHES)}")
+    if not listing.area:
+        raise ValueError("Listing has no area to compare")
+
+    city = listing.city or extract_city(listing.location)
+    return {
+        'area': listing.area,
+        'rooms': listing.rooms,
+        'floor': listing.floor,
+        'city': city if location in ('city', 'district') else None,
+        'district': listing.district if location == 'district' else None
+    }
+
+def price_per_sqm_distribution(values):
+    """
+    Summarizes prices per m²
+
+    Args:
+        values (numpy.ndarray): Prices per m²
+
+    Returns:
+        dict: count, min, max, mean and percentiles p10 to p90, or only count if empty
+    """
+    if not len(values):
+        return {'count': 0}
+    percentiles = np.percentile(values, PRICE_PER_SQM_PERCENTILES)
+    distribution = {
+        'count': int(len(values)),
+        'min': round(float(values.min()), 2),
+        'max': round(float(values.max()), 2),
+        'mean': round(float(values.mean()), 2)
+    }
+    for percentile, value in zip(PRICE_PER_SQM_PERCENTILES, percentiles):
+        distribution[f'p{percentile}'] = round(float(value), 2)
+    return distribution
+
+def find_comparables(indexes, area, rooms=None, floor=None, city=None, district=None, k=10, exclude=None):
+    """
+    Finds the k listings most similar to the given values across scraped datasets
+
+    Every dataset returns its own k nearest listings; the nearest k of all of them are kept.
+
+    Args:
+        indexes (dict): data_id -> ComparablesIndex of the datasets to search
+        area (float): Area in square meters
+        rooms (int, optional): Number of rooms, not compared if None
+        floor (int, optional): Floor, not compared if None
+        city (str, optional): Only listings in this city
+        district (str, optional): Only listings in this district
+        k (int, optional): Number of comparables
+        exclude (tuple, optional): (data_id, index) of a listing to leave out
+
+    Returns:
+        dict: Query, compared features, comparables nearest first and the distribution of
+            their prices per m²
+    """
+    values = {'area': area, 'rooms': rooms, 'floor': floor}
+    candidates = []
+    for data_id, index in indexes.items():
+        excluded = exclude[1] if exclude and exclude[0] == data_id else None
+        for distance, position in index.query(values, k, city, district, excluded):
+            candidates.append((distance, data_id, position))
+    candidates.sort()
+
+    comparables = []
+    for distance, data_id, position in candidates[:k]:
+        index = indexes[data_id]
+        comparable = index.listings[position].to_dict(include_description=False)
+        comparable.update({
+            'data_id': data_id,
+            'index': position,
+            'distance': round(distance, 4),
+            'price_per_sqm': round(float(index.price_per_sqm[position]), 2)
+        })
+        comparables.append(comparable)
+
+    return {
+        'query': dict(values, city=city, district=district),
+        'features': [field for field in FEATURE_SCALES if values[field] is not None],
+        'k': k,
+        'comparables': comparables,
+        'price_per_sqm': price_per_sqm_distribution(
+            np.array([comparable['price_per_sqm'] for comparable in comparables]))
+    }
+
+def describe_listing(index, data_id, position, comparables):
+    """
+    Returns a reference listing with its price per m² ranked among its comparables
+
+    Args:
+        index (ComparablesIndex): Index of the listing's dataset
+        data_id (int): ID of the listing's dataset
+        position (int): Position of the listing in the dataset
+        comparables (list): Comparables returned by find_comparables
+
+    Returns:
+        dict: Listing dictionary with data_id, index, price_per_sqm and percentile, the share
+            of comparables cheaper per m² than the listing
+    """
+    price_per_sqm = index.price_per_sqm[position]
+    known = not np.isnan(price_per_sqm)
+    cheaper = sum(1 for comparable in comparables if comparable['price_per_sqm'] < price_per_sqm)
+    listing = index.listings[position].to_dict(include_description=False)
+    listing.update({
+        'data_id': data_id,
+        'index': position,
+        'price_per_sqm': round(float(price_per_sqm), 2) if known else None,
+        'percentile': round(100 * cheaper / len(comparables), 1) if known and comparables else None
+    })
+    return listing
@@ -0,0 +1,183 @@
+import io
+import os
+import csv
+import logging
+import tempfile
+from itertools import islice
+from operator import attrgetter
+from listing import Listing
+from storage import iter_listing_batches, iter_descriptions
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Use pyarrow for Parquet export if it is installed
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Exportable columns in output order, with their Parquet types
+EXPORT_COLUMNS = {
+    'data_id': 'int64',
+    'title': 'string',
+    'price': 'int64',
+    'location': 'string',
+    'city': 'string',
+    'district': 'string',
+    'street': 'string',
+    'area': 'float64',
+    'rooms': 'int64',
+    'floor': 'int64',
+    'total_floors': 'int64',
+    'seller_rating': 'float64',
+    'views': 'int64',
+    'description': 'string'
+}
+
+# Columns exported when none are requested; descriptions are large and only exported on request
+DEFAULT_EXPORT_COLUMNS = [column for column in EXPORT_COLUMNS if column != 'description']
+
+# Parquet exports up to this size stay in memory, larger ones are spooled to a temporary file
+EXPORT_SPOOL_MAX_MEMORY = int(os.environ.get("EXPORT_SPOOL_MAX_MEMORY", 16 * 1024 * 1024))
+
+# Size of the pieces a spooled export is streamed in
+EXPORT_STREAM_CHUNK_SIZE = 256 * 1024
+
+def parse_columns(value):
+    """
+    Parses a comma-separated column selection
+
+    Args:
+        value (str): Column names separated by commas, or None for the default columns
+
+    Returns:
+        list: Selected columns in request order
+
+    Raises:
+        ValueError: If an unknown column is requested
+    """
+    if not value:
+        return list(DEFAULT_EXPORT_COLUMNS)
+    columns = [column.strip() for column in value.split(',') if column.strip()]
+    unknown = [column for column in columns if column not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown export columns: {', '.join(unknown)}")
+    if not columns:
+        raise ValueError("No export columns selected")
+    return columns
+
+def _row_getter(fields):
+    """
+    Returns a function mapping a Listing to the tuple of its values for fields
+    """
+    if not fields:
+        return lambda record: ()
+    getter = attrgetter(*fields)
+    if len(fields) == 1:
+        return lambda record: (getter(record),)
+    return getter
+
+def iter_export_batches(datasets, columns):
+    """
+    Yields the listings of several datasets as batches of rows, one stored batch at a time
+
+    Args:
+        datasets (list): ScrapedData rows to export, in output order
+        columns (list): Columns of every row
+
+    Yields:
+        list: Rows as tuples of column values
+    """
+    with_descriptions = 'description' in columns
+    getter = _row_getter([column for column in columns if column != 'data_id'])
+    data_id_position = columns.index('data_id') if 'data_id' in columns else None
+
+    for scraped_data in datasets:
+        descriptions = iter_descriptions(scraped_data.id) if with_descriptions else None
+        for batch in iter_listing_batches(scraped_data):
+            if not batch:
+                continue
+            records = [Listing.from_dict(listing) for listing in batch]
+            if with_descriptions:
+                # Rows stored before descriptions were split out carry them inline
+                for record, description in zip(records, islice(descriptions, len(records))):
+                    if record.description is None:
+                        record.description = description
+            rows = [getter(record) for record in records]
+            if data_id_position is not None:
+                prefix = (scraped_data.id,)
+                rows = [row[:data_id_position] + prefix + row[data_id_position:] for row in rows]
+            yield rows
+
+def iter_csv(datasets, columns):
+    """
+    Streams datasets as CSV text, one encoded piece per stored batch
+
+    Args:
+        datasets (list): ScrapedData rows to export
+        columns (list): Columns to export
+
+    Yields:
+        bytes: UTF-8 encoded CSV, starting with the header row
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in iter_export_batches(datasets, columns):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def write_parquet(datasets, columns, target):
+    """
+    Writes datasets to a Parquet file, one row group per stored batch
+
+    Args:
+        datasets (list): ScrapedData rows to export
+        columns (list): Columns to export
+        target: Binary file object to write to
+
+    Returns:
+        int: Number of exported rows
+    """
+    if pa is None:
+        raise RuntimeError("Parquet export requires the pyarrow package")
+
+    schema = pa.schema([(column, EXPORT_COLUMNS[column]) for column in columns])
+    count = 0
+    with pq.ParquetWriter(target, schema, compression='zstd') as writer:
+        for rows in iter_export_batches(datasets, columns):
+            arrays = [pa.array(values, type=schema.field(i).type) for i, values in enumerate(zip(*rows))]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            count += len(rows)
+    return count
+
+def iter_parquet(datasets, columns):
+    """
+    Builds a Parquet export in a spooled temporary file and streams it
+
+    Parquet keeps its metadata at the end of the file, so the export is written completely
+    before streaming starts. Small exports stay in memory; larger ones roll over to disk.
+
+    Args:
+        datasets (list): ScrapedData rows to export
+        columns (list): Columns to export
+
+    Yields:
+        bytes: Pieces of the Parquet file
+    """
+    with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_MEMORY) as spool:
+        count = write_parquet(datasets, columns, spool)
+        logger.info(f"Exported {count} rows to a {spool.tell()} byte Parquet file")
+        spool.seek(0)
+        while True:
+            piece = spool.read(EXPORT_STREAM_CHUNK_SIZE)
+            if not piece:
+                return
+            yield piece
@@ -0,0 +1,272 @@
+import os
+import time
+import asyncio
+import socket
+import logging
+import ipaddress
+from urllib.parse import urljoin, urlsplit
+import urllib3
+import trafilatura
+from trafilatura.utils import decode_file
+from app import db
+from models import ScrapedData, FetchRecord
+from singleflight import normalize_url
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# User agent sent when pages are downloaded
+USER_AGENT = os.environ.get("SCRAPER_USER_AGENT", "Mozilla/5.0 (compatible; avito-analyzer/1.0)")
+
+# Seconds to wait for a connection and between received bytes
+FETCH_CONNECT_TIMEOUT = float(os.environ.get("FETCH_CONNECT_TIMEOUT", 5))
+FETCH_READ_TIMEOUT = float(os.environ.get("FETCH_READ_TIMEOUT", 30))
+
+# Connections kept open per host, shared by all threads of the process
+FETCH_POOL_SIZE = int(os.environ.get("FETCH_POOL_SIZE", 10))
+
+# Maximum number of redirects followed for one page
+FETCH_MAX_REDIRECTS = 5
+
+# Whether re-scrapes send the validators of the previous download of a URL
+FETCH_REVALIDATE = os.environ.get("FETCH_REVALIDATE", "1") != "0"
+
+# gzip and deflate always; br if the brotli package is installed, zstd if zstandard is
+_HEADERS = dict(urllib3.util.make_headers(accept_encoding=True), **{
+    'User-Agent': USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.8'
+})
+
+_pool = urllib3.PoolManager(
+    num_pools=50,
+    maxsize=FETCH_POOL_SIZE,
+    block=False,
+    timeout=urllib3.Timeout(connect=FETCH_CONNECT_TIMEOUT, read=FETCH_READ_TIMEOUT),
+    retries=urllib3.Retry(total=2, redirect=False, backoff_factor=0.5, status_forcelist=(429, 502, 503, 504))
+)
+
+class NotModified(Exception):
+    """
+    Raised when a page has not changed since the download whose scrape is data_id
+    """
+
+    def __init__(self, validators, page):
+        super().__init__(f"Page not modified since scrape {validators.data_id}")
+        self.validators = validators
+        self.page = page
+
+    @property
+    def data_id(self):
+        return self.validators.data_id
+
+class Validators:
+    """
+    Cache validators of the last successful download of a URL and the scrape built from it
+    """
+
+    def __init__(self, etag, last_modified, data_id):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.data_id = data_id
+
+    def headers(self):
+        """Conditional request headers for these validators"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+class Page:
+    """
+    Result of one page download
+
+    Attributes:
+        url (str): Final URL after redirects
+        status (int): HTTP status of the final response
+        html (str): Decoded page, None unless the status is 200
+        etag (str): ETag response header
+        last_modified (str): Last-Modified response header
+        content_encoding (str): Encoding the body was transferred with, e.g. 'gzip' or 'br'
+        bytes_transferred (int): Body bytes received over the network for all responses,
+            including redirects
+        bytes_decoded (int): Size of the decoded body
+        elapsed (float): Seconds spent downloading
+    """
+
+    def __init__(self, url, status, html=None, etag=None, last_modified=None, content_encoding=None,
+                 bytes_transferred=0, bytes_decoded=0, elapsed=0.0):
+        self.url = url
+        self.status = status
+        self.html = html
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_encoding = content_encoding
+        self.bytes_transferred = bytes_transferred
+        self.bytes_decoded = bytes_decoded
+        self.elapsed = elapsed
+
+def ssrf_protection_enabled():
+    """
+    Whether downloads of non-public addresses are blocked, following trafilatura's
+    SSRF_PROTECTION setting
+    """
+    return trafilatura.settings.DEFAULT_CONFIG.getboolean("DEFAULT", "SSRF_PROTECTION", fallback=True)
+
+def _public_host(url):
+    """Returns the host of url, which the caller resolves and passes to _check_addresses"""
+    host = urlsplit(url).hostname
+    if not host:
+        raise ValueError(f"URL has no host: {url}")
+    return host
+
+def _check_addresses(host, addresses):
+    """Raises OSError if any getaddrinfo result for host is not a public address"""
+    for address in addresses:
+        ip = ipaddress.ip_address(address[4][0].split('%')[0])
+        ip = getattr(ip, 'ipv4_mapped', None) or ip
+        if not ip.is_global:
+            raise OSError(f"Connection to non-public address blocked: {host}")
+
+def check_public_host(url):
+    """
+    Raises OSError if the host of url resolves to a private, loopback or link-local address
+    and SSRF protection is on
+    """
+    if not ssrf_protection_enabled():
+        return
+    host = _public_host(url)
+    _check_addresses(host, socket.getaddrinfo(host, None, type=socket.SOCK_STREAM))
+
+async def check_public_host_async(url):
+    """
+    Like check_public_host, but resolves the host without blocking the running event loop
+    """
+    if not ssrf_protection_enabled():
+        return
+    host = _public_host(url)
+    _check_addresses(host, await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM))
+
+def fetch_page(url, validators=None):
+    """
+    Downloads a page over the shared connection pool
+
+    Responses are requested compressed and decoded while read; the download stops at
+    trafilatura's MAX_FILE_SIZE. With validators the request is conditional, and a page
+    that did not change comes back with status 304 and no body.
+
+    Args:
+        url (str): URL of the page
+        validators (Validators, optional): Validators of the previous download
+
+    Returns:
+        Page: Download result; html is None unless the final status is 200
+
+    Raises:
+        OSError: If a redirect leads to a non-public address or the download fails
+    """
+    max_size = trafilatura.settings.DEFAULT_CONFIG.getint("DEFAULT", "MAX_FILE_SIZE")
+    headers = dict(_HEADERS, **(validators.headers() if validators else {}))
+    started = time.perf_counter()
+    transferred = 0
+
+    for _ in range(FETCH_MAX_REDIRECTS + 1):
+        check_public_host(url)
+        response = _pool.request('GET', url, headers=headers, redirect=False, preload_content=False)
+        try:
+            if response.status in (301, 302, 303, 307, 308) and response.headers.get('Location'):
+                response.drain_conn()
+                transferred += response.tell()
+                url = urljoin(url, response.headers['Location'])
+                continue
+
+            body = bytearray()
+            if response.status == 200:
+                for chunk in response.stream(2**17):
+                    body += chunk
+                    if len(body) > max_size:
+                        raise OSError(f"Page is larger than {max_size} bytes: {url}")
+            else:
+                response.drain_conn()
+            transferred += response.tell()
+        finally:
+            response.release_conn()
+
+        return Page(
+            url=url,
+            status=response.status,
+            html=decode_file(bytes(body)) if response.status == 200 and body else None,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+            content_encoding=response.headers.get('Content-Encoding'),
+            bytes_transferred=transferred,
+            bytes_decoded=len(body),
+            elapsed=time.perf_counter() - started
+        )
+
+    raise OSError(f"Too many redirects: {url}")
+
+def get_validators(url):
+    """
+    Returns the validators of the last download of url whose scrape still exists
+
+    Args:
+        url (str): Page URL, normalized like scrape coalescing keys
+
+    Returns:
+        Validators: Validators, or None if the URL should be downloaded unconditionally
+    """
+    if not FETCH_REVALIDATE:
+        return None
+    record = (FetchRecord.query
+              .join(ScrapedData, ScrapedData.id == FetchRecord.data_id)
+              .filter(FetchRecord.url_key == normalize_url(url), FetchRecord.status_code == 200,
+                      db.or_(FetchRecord.etag.isnot(None), FetchRecord.last_modified.isnot(None)))
+              .order_by(FetchRecord.id.desc())
+              .first())
+    if record is None:
+        return None
+    return Validators(record.etag, record.last_modified, record.data_id)
+
+def record_fetch(url, page, data_id):
+    """
+    Adds the record of a page download to the session without committing
+
+    Args:
+        url (str): Requested URL
+        page (Page): Download result
+        data_id (int): Scrape built from the download, or reused by a 304 response
+    """
+    db.session.add(FetchRecord(
+        url_key=normalize_url(url),
+        status_code=page.status,
+        etag=page.etag,
+        last_modified=page.last_modified,
+        content_encoding=page.content_encoding,
+        bytes_transferred=page.bytes_transferred,
+        bytes_decoded=page.bytes_decoded,
+        elapsed=round(page.elapsed, 3),
+        data_id=data_id
+    ))
+
+def get_fetch_stats():
+    """
+    Returns totals over all recorded page downloads
+
+    Returns:
+        dict: fetches, not_modified (304 responses), bytes_transferred and bytes_decoded
+    """
+    fetches, not_modified, transferred, decoded = db.session.query(
+        db.func.count(FetchRecord.id),
+        db.func.coalesce(db.func.sum(db.case((FetchRecord.status_code == 304, 1), else_=0)), 0),
+        db.func.coalesce(db.func.sum(FetchRecord.bytes_transferred), 0),
+        db.func.coalesce(db.func.sum(FetchRecord.bytes_decoded), 0)
+    ).one()
+    return {
+        'fetches': fetches,
+        'not_modified': not_modified,
+        'bytes_transferred': transferred,
+        'bytes_decoded': decoded
+    }
@@ -0,0 +1,241 @@
+import os
+import json
+import logging
+from collections import deque
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Dictionary shipped with the project, can be replaced with GAZETTEER_PATH
+DEFAULT_GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'gazetteer.json')
+
+# Maximum length of a street name following a street type
+MAX_STREET_LENGTH = 60
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton matching many patterns in a single linear pass over the text
+
+    Patterns are matched case-insensitively. Each pattern carries an arbitrary payload
+    that is returned with its matches.
+    """
+
+    def __init__(self, patterns):
+        """
+        Args:
+            patterns (iterable): (pattern, payload) pairs
+        """
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+
+        for pattern, payload in patterns:
+            pattern = pattern.lower()
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.outputs.append([])
+                state = next_state
+            self.outputs[state].append((len(pattern), payload))
+
+        # Breadth-first pass to compute failure links and merge outputs along them
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+
+    def iter_matches(self, text):
+        """
+        Yields every pattern occurrence in text
+
+        Args:
+            text (str): Text to scan
+
+        Yields:
+            tuple: (start, end, payload) with end exclusive
+        """
+        goto = self.goto
+        fail = self.fail
+        outputs = self.outputs
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # A few characters lowercase to several; keep positions aligned with the original text
+            lowered = ''.join(char.lower()[:1] for char in text)
+
+        state = 0
+        for position, char in enumerate(lowered):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, payload in outputs[state]:
+                yield position - length + 1, position + 1, payload
+
+def _is_boundary(text, start, end):
+    """
+    Checks that a match is not part of a longer word
+    """
+    if start > 0 and text[start].isalnum() and text[start - 1].isalnum():
+        return False
+    if end < len(text) and text[end - 1].isalnum() and text[end].isalnum():
+        return False
+    return True
+
+class Gazetteer:
+    """
+    Dictionary of cities, districts and street types used to extract locations from text
+
+    All names are compiled into one Aho-Corasick automaton, so the cost of a scan grows with
+    the length of the text rather than with the size of the dictionary.
+    """
+
+    def __init__(self, entries):
+        """
+        Args:
+            entries (list): Dictionaries with keys kind ('city', 'district' or 'street_type'),
+                name (normalized name), aliases (list of spellings) and, for districts,
+                an optional city
+        """
+        self.entries = entries
+        patterns = []
+        for entry in entries:
+            for alias in set([entry['name']] + list(entry.get('aliases', []))):
+                patterns.append((alias, entry))
+        self.automaton = AhoCorasick(patterns)
+        logger.info(f"Built gazetteer with {len(entries)} entries and {len(patterns)} patterns")
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Creates a gazetteer from a dictionary with 'cities', 'districts' and 'street_types' lists
+        """
+        entries = []
+        for kind, key in (('city', 'cities'), ('district', 'districts'), ('street_type', 'street_types')):
+            for item in data.get(key, []):
+                entries.append({
+                    'kind': kind,
+                    'name': item['name'],
+                    'aliases': item.get('aliases', []),
+                    'city': item.get('city')
+                })
+        return cls(entries)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a gazetteer from a JSON file
+
+        Args:
+            path (str): Path to the JSON dictionary
+
+        Returns:
+            Gazetteer: Loaded gazetteer
+        """
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def find(self, text):
+        """
+        Finds dictionary names in text, keeping the longest leftmost non-overlapping matches
+
+        Args:
+            text (str): Text to scan
+
+        Returns:
+            list: (start, end, entry) tuples in text order
+        """
+        candidates = [
+            (start, end, entry)
+            for start, end, entry in self.automaton.iter_matches(text)
+            if _is_boundary(text, start, end)
+        ]
+        candidates.sort(key=lambda match: (match[0], match[0] - match[1]))
+
+        matches = []
+        last_end = 0
+        for start, end, entry in candidates:
+            if start >= last_end:
+                matches.append((start, end, entry))
+                last_end = end
+        return matches
+
+    def extract_location(self, text):
+        """
+        Extracts normalized location components from text
+
+        The first city, district and street found are used. The location string spans from the
+        first matched component to the end of its line, like an address line on the page.
+
+        Args:
+            text (str): Text around a listing
+
+        Returns:
+            dict: Location with keys location (str or None), city, district and street
+        """
+        result = {'location': None, 'city': None, 'district': None, 'street': None}
+        first_start = None
+
+        for start, end, entry in self.find(text):
+            kind = entry['kind']
+            if kind == 'city' and result['city'] is None:
+                result['city'] = entry['name']
+            elif kind == 'district' and result['district'] is None:
+                result['district'] = entry['name']
+                if result['city'] is None and entry.get('city'):
+                    result['city'] = entry['city']
+            elif kind == 'street_type' and result['street'] is None:
+                line_end = text.find('\n', end)
+                if line_end == -1:
+                    line_end = len(text)
+                street_name = text[end:min(line_end, end + MAX_STREET_LENGTH)].split(',')[0].strip(' .')
+                if street_name:
+                    result['street'] = f"{entry['name']} {street_name}"
+                else:
+                    # Street type written after the name, as in "Ленинградское шоссе"
+                    segment_start = max(text.rfind(',', 0, start), text.rfind('\n', 0, start)) + 1
+                    street_name = text[max(segment_start, start - MAX_STREET_LENGTH):start].strip(' .')
+                    if not street_name:
+                        continue
+                    result['street'] = f"{street_name} {entry['name']}"
+            else:
+                continue
+
+            if first_start is None:
+                first_start = start
+
+        if first_start is not None:
+            line_end = text.find('\n', first_start)
+            if line_end == -1:
+                line_end = len(text)
+            result['location'] = text[first_start:line_end].strip()
+
+        return result
+
+_default_gazetteer = None
+
+def get_gazetteer():
+    """
+    Returns the process-wide gazetteer, loading it on first use
+
+    The dictionary is read from GAZETTEER_PATH if set, otherwise from data/gazetteer.json.
+
+    Returns:
+        Gazetteer: Loaded gazetteer
+    """
+    global _default_gazetteer
+    if _default_gazetteer is None:
+        _default_gazetteer = Gazetteer.load(os.environ.get("GAZETTEER_PATH", DEFAULT_GAZETTEER_PATH))
+    return _default_gazetteer
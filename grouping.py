@@ -0,0 +1,277 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+from models import ScrapedData
+from storage import iter_listing_records
+from listing import Listing, listing_columns
+from search import extract_city
+from analyzer import format_axis_label
+from cache import BoundedCache
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Listing attributes that listings can be grouped by
+GROUP_KEYS = ('rooms', 'floor_band', 'city', 'district')
+
+# Metrics compared across groups; price_per_sqm is derived from price and area
+GROUP_METRICS = ('price_per_sqm', 'price', 'area')
+
+# Floor bands in display order
+FLOOR_BANDS = ('first', 'middle', 'last')
+
+# Cities and districts beyond this many groups are merged into one OTHER_GROUP
+GROUPS_MAX = int(os.environ.get("GROUPS_MAX", 20))
+OTHER_GROUP = 'other'
+
+# Per-group statistics, in the order they are returned
+GROUP_STATISTICS = ('count', 'mean', 'std', 'min', 'p25', 'median', 'p75', 'max')
+
+def floor_bands(floor, total_floors):
+    """
+    Classifies floors as the first, a middle or the last floor of the building
+
+    Args:
+        floor (numpy.ndarray): Floors, NaN where unknown
+        total_floors (numpy.ndarray): Floors in the building, NaN where unknown
+
+    Returns:
+        numpy.ndarray: Index into FLOOR_BANDS, -1 where the band is unknown or the floor
+            is above the top floor
+    """
+    bands = np.full(len(floor), -1, dtype=np.int64)
+    bands[floor == 1] = 0
+    upper = (floor > 1) & (floor <= total_floors)
+    bands[upper & (floor < total_floors)] = 1
+    bands[upper & (floor == total_floors)] = 2
+    return bands
+
+def _ranked_codes(names):
+    """
+    Factorizes city or district names into (codes, labels), codes indexing labels and -1
+    for missing names
+
+    Labels are ordered by number of listings; names past GROUPS_MAX are merged into OTHER_GROUP.
+    """
+    codes, uniques = pd.factorize(names)
+    if not len(uniques):
+        return codes, []
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    order = sorted(range(len(uniques)), key=lambda i: (-counts[i], uniques[i]))
+    ranks = np.empty(len(uniques), dtype=np.int64)
+    ranks[order] = np.arange(len(uniques))
+    labels = [uniques[i] for i in order]
+    if len(labels) > GROUPS_MAX:
+        ranks = np.minimum(ranks, GROUPS_MAX - 1)
+        labels = labels[:GROUPS_MAX - 1] + [OTHER_GROUP]
+    return np.where(codes >= 0, ranks[np.maximum(codes, 0)], -1), labels
+
+def group_columns(listings):
+    """
+    Converts listings into the column arrays used for grouping
+
+    Group keys are factorized here once, so grouping only combines integer codes.
+
+    Args:
+        listings (iterable): Listing records or dictionaries
+
+    Returns:
+        dict: Array of every metric with NaN for missing values; 'codes' and 'labels' map
+            every group key to its codes (-1 where missing) and the labels they index;
+            'sorted' maps every metric to the listing positions in ascending order of its values
+    """
+    listings = [Listing.coerce(listing) for listing in listings]
+    columns = listing_columns(listings, ('price', 'area', 'rooms', 'floor', 'total_floors'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columns['price_per_sqm'] = np.where((columns['area'] > 0) & (columns['price'] > 0),
+                                            columns['price'] / columns['area'], np.nan)
+
+    rooms_codes, rooms = pd.factorize(columns.pop('rooms'), sort=True)
+    columns['codes'] = {
+        'rooms': rooms_codes,
+        'floor_band': floor_bands(columns.pop('floor'), columns.pop('total_floors'))
+    }
+    columns['labels'] = {'rooms': [str(int(value)) for value in rooms], 'floor_band': list(FLOOR_BANDS)}
+    for key, names in (('city', [listing.city or extract_city(listing.location) for listing in listings]),
+                       ('district', [listing.district for listing in listings])):
+        columns['codes'][key], columns['labels'][key] = _ranked_codes(np.array(names, dtype=object))
+
+    # Sorted once here, so that grouping only has to sort the small group codes
+    columns['sorted'] = {metric: np.argsort(columns[metric]) for metric in GROUP_METRICS}
+    return columns
+
+def _group_quantiles(values, starts, counts, q):
+    """
+    Computes a quantile of every group of values sorted within contiguous groups
+
+    Interpolates linearly between the nearest values, like pandas and numpy by default.
+    """
+    position = q * (counts - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, counts - 1)
+    fraction = position - lower
+    below = values[starts + lower]
+    return below + fraction * (values[starts + upper] - below)
+
+def group_histograms(values, starts, counts, bins, lower, upper):
+    """
+    Counts the values of every group into the same equal-width bins
+
+    Values are sorted within every group, so each bin edge is located by binary search in
+    the group's range like in compute_histogram. Bins are half-open except the last one,
+    which includes its right edge; values outside [lower, upper] are not counted.
+
+    Returns:
+        tuple: (counts array of shape (groups, bins), bin edges)
+    """
+    edges = np.linspace(lower, upper, bins + 1)
+    hist = np.empty((len(starts), bins), dtype=np.int64)
+    for group, (start, count) in enumerate(zip(starts, counts)):
+        segment = values[start:start + count]
+        positions = np.searchsorted(segment, edges, side='left')
+        positions[-1] = np.searchsorted(segment, upper, side='right')
+        hist[group] = np.diff(positions)
+    return hist, edges
+
+def _group_starts(counts):
+    return np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+
+def group_listings(columns, by, metric='price_per_sqm', bins=20, range_min=None, range_max=None,
+                   drop_outliers=True):
+    """
+    Computes statistics and histograms of a metric for every group of listings
+
+    Listings already sorted by the metric are sorted by group with a stable radix sort, which
+    leaves every group a contiguous range of sorted values. Outlier fences (the IQR rule of
+    remove_outliers), quartiles and histogram edges of all groups are then found by index
+    arithmetic and binary search in those ranges, and sums by one reduction over all groups,
+    instead of masking the listings once per group.
+
+    Args:
+        columns (dict): Column arrays from group_columns
+        by (list): One or more of GROUP_KEYS; several keys group by their combinations
+        metric (str, optional): One of GROUP_METRICS
+        bins (int, optional): Number of histogram bins, shared by all groups
+        range_min (float, optional): Left edge of the first bin, defaults to the smallest value
+        range_max (float, optional): Right edge of the last bin, defaults to the largest value
+        drop_outliers (bool, optional): Whether to remove outliers within every group
+
+    Returns:
+        dict: Chart.js-ready table with group labels, one list per statistic aligned with the
+            labels, removed outliers per group and histogram datasets per group
+    """
+    values = columns[metric]
+    valid = ~np.isnan(values)
+    groups = np.zeros(len(values), dtype=np.int64)
+    combinations = [()]
+    for key in by:
+        codes, labels = columns['codes'][key], columns['labels'][key]
+        valid &= codes >= 0
+        groups = groups * max(len(labels), 1) + codes
+        combinations = [combination + (label,) for combination in combinations for label in labels]
+
+    order = columns['sorted'][metric]
+    order = order[valid[order]]
+    groups = groups[order]
+    # numpy sorts 16-bit integers with a stable radix sort in linear time
+    code_type = np.int16 if len(combinations) <= np.iinfo(np.int16).max else np.int64
+    values = values[order[np.argsort(groups.astype(code_type), kind='stable')]]
+
+    combination_counts = np.bincount(groups, minlength=len(combinations))
+    present = np.flatnonzero(combination_counts)
+    labels = [' / '.join(combinations[code]) for code in present]
+    counts = combination_counts[present]
+    starts = _group_starts(counts)
+
+    outliers = np.zeros(len(present), dtype=np.int64)
+    if drop_outliers and len(present):
+        q1 = _group_quantiles(values, starts, counts, 0.25)
+        q3 = _group_quantiles(values, starts, counts, 0.75)
+        iqr = q3 - q1
+        # The values a group keeps are one contiguous range of its sorted values
+        kept = [(start + np.searchsorted(values[start:start + count], low, side='left'),
+                 start + np.searchsorted(values[start:start + count], high, side='right'))
+                for start, count, low, high in zip(starts, counts, q1 - 1.5 * iqr, q3 + 1.5 * iqr)]
+        values = np.concatenate([values[first:last] for first, last in kept])
+        kept_counts = np.array([last - first for first, last in kept], dtype=np.int64)
+        outliers = counts - kept_counts
+        counts = kept_counts
+        starts = _group_starts(counts)
+
+    statistics = {name: [] for name in GROUP_STATISTICS}
+    histogram = {'bin_edges': [], 'labels': [], 'datasets': []}
+    if len(present):
+        means = np.add.reduceat(values, starts) / counts
+        squares = np.add.reduceat((values - np.repeat(means, counts)) ** 2, starts)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stds = np.sqrt(squares / (counts - 1))
+        columns_by_name = {
+            'count': counts,
+            'mean': means,
+            'std': stds,
+            'min': values[starts],
+            'p25': _group_quantiles(values, starts, counts, 0.25),
+            'median': _group_quantiles(values, starts, counts, 0.5),
+            'p75': _group_quantiles(values, starts, counts, 0.75),
+            'max': values[starts + counts - 1]
+        }
+        statistics = {
+            name: [int(value) for value in column] if name == 'count'
+            else [round(float(value), 2) if np.isfinite(value) else None for value in column]
+            for name, column in columns_by_name.items()
+        }
+
+        lower = float(values.min()) if range_min is None else float(range_min)
+        upper = float(values.max()) if range_max is None else float(range_max)
+        if upper < lower:
+            raise ValueError("Range maximum must not be less than range minimum")
+        if upper == lower:
+            lower, upper = lower - 0.5, upper + 0.5
+        hist, edges = group_histograms(values, starts, counts, bins, lower, upper)
+
+        include_rub = metric in ('price', 'price_per_sqm')
+        histogram = {
+            'bin_edges': edges.tolist(),
+            'labels': [format_axis_label((edges[i] + edges[i+1])/2, include_rub) for i in range(bins)],
+            'datasets': [{'label': label, 'data': row.tolist()} for label, row in zip(labels, hist)]
+        }
+
+    return {
+        'group_by': list(by),
+        'metric': metric,
+        'listing_count': len(columns[metric]),
+        'grouped_count': int(valid.sum()),
+        'labels': labels,
+        'statistics': statistics,
+        'outliers': outliers.tolist(),
+        'histogram': histogram
+    }
+
+# Group columns per data_id; scraped data never changes after insert
+_columns_cache = BoundedCache(maxsize=int(os.environ.get("GROUP_COLUMNS_CACHE_SIZE", 16)))
+
+def get_group_columns(data_id):
+    """
+    Returns the group columns of a scraped dataset, extracting and caching them on first use
+
+    Args:
+        data_id (int): ID of the scraped data
+
+    Returns:
+        dict: Column arrays from group_columns, or None if the data does not exist
+    """
+    def load():
+        scraped_data = ScrapedData.query.get(data_id)
+        if not scraped_data:
+            return None
+        return group_columns(iter_listing_records(scraped_data))
+
+    return _columns_cache.get_or_create(data_id, load)
+
+def evict_group_columns(data_id):
+    """
+    Removes the cached group columns of a scraped dataset
+    """
+    _columns_cache.pop(data_id)
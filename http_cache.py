@@ -0,0 +1,190 @@
+import os
+import json
+import logging
+from flask import Response, request
+from app import db
+from models import ScrapedData, AnalysisResult, ListingBatch
+from storage import load_scraped_data
+from cache import BoundedCache
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Number of serialized API responses kept in memory
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 256))
+
+# Responses larger than this many bytes are built on every request instead of being cached
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 2 * 1024 * 1024))
+
+# Maintenance can rewrite stored rows (dropping analysis images, moving descriptions out of
+# inline data), so clients revalidate; unchanged rows are answered with 304
+STORED_CACHE_CONTROL = 'public, no-cache'
+
+_responses = BoundedCache(maxsize=RESPONSE_CACHE_SIZE)
+
+def _row_etag(model, kind, row_id, variant=None):
+    """
+    Builds the entity tag of a stored row from its ID, creation time and content version
+
+    The creation time is part of the tag, so a row that reuses the ID of a deleted one
+    (SQLite reuses the highest IDs) never matches the tag of its predecessor. Maintenance that
+    rewrites a row (dropping analysis images, moving descriptions out of inline data) bumps
+    its content_version. The heavy JSON columns are not read.
+
+    Returns:
+        str: Unquoted entity tag, or None if the row does not exist
+    """
+    row = (db.session.query(model.created_at, model.content_version)
+           .filter(model.id == row_id)
+           .first())
+    if row is None:
+        return None
+    created_at, version = row
+    tag = f"{kind}-{row_id}-{int(created_at.timestamp() * 1_000_000)}-v{version}"
+    return f"{tag}-{variant}" if variant else tag
+
+def not_modified(etag, cache_control):
+    """
+    Returns an empty 304 response carrying the entity tag and caching headers
+    """
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+def _json_object(fields, raw_fields):
+    """
+    Serializes fields to a JSON object and appends raw_fields, whose values are JSON text
+    that is inserted without being parsed
+    """
+    parts = [json.dumps(fields)[:-1]]
+    for key, raw in raw_fields.items():
+        parts.append(f', {json.dumps(key)}: {raw}')
+    parts.append('}')
+    return ''.join(parts).encode('utf-8')
+
+def _analysis_body(analysis_id):
+    analysis = (AnalysisResult.query
+                .options(db.undefer(AnalysisResult.visualization_data))
+                .filter_by(id=analysis_id)
+                .first())
+    return _json_object({
+        'id': analysis.id,
+        'data_id': analysis.data_id,
+        'parameter': analysis.parameter,
+        'title': analysis.title,
+        'bins': analysis.bins,
+        'created_at': analysis.created_at.isoformat()
+    }, {
+        'statistics': analysis.statistics,
+        'visualization_data': analysis.visualization_data
+    })
+
+def _data_text(scraped_data):
+    """
+    Returns the structured data of a ScrapedData row as JSON text
+
+    Listing batches are joined as stored; only the small data column of batched rows is parsed.
+    """
+    data_json = json.loads(scraped_data.data)
+    if 'listing_batches' not in data_json:
+        return scraped_data.data
+
+    batches = (db.session.query(ListingBatch.listings)
+               .filter(ListingBatch.data_id == scraped_data.id, ListingBatch.seq < data_json['listing_batches'])
+               .order_by(ListingBatch.seq))
+    # Strip the brackets of every stored list and join the items into one list
+    items = [listings.strip()[1:-1] for listings, in batches]
+    listings = ', '.join(item for item in items if item.strip())
+    return f'{{"listings": [{listings}], "pagination": {json.dumps(data_json.get("pagination"))}}}'
+
+def _data_body(data_id, include_descriptions):
+    scraped_data = ScrapedData.query.options(db.undefer(ScrapedData.data)).filter_by(id=data_id).first()
+    fields = {
+        'id': scraped_data.id,
+        'url': scraped_data.url,
+        'created_at': scraped_data.created_at.isoformat()
+    }
+    if include_descriptions:
+        # Descriptions are merged into the listings, which needs the parsed data
+        data_text = json.dumps(load_scraped_data(scraped_data, include_descriptions=True))
+    else:
+        data_text = _data_text(scraped_data)
+    return _json_object(fields, {'data': data_text})
+
+def _stored_response(model, kind, row_id, build, variant=None):
+    """
+    Answers a request for a stored row
+
+    Only the ID, creation time and content version are read to build the entity tag. A matching
+    If-None-Match header is answered with 304; otherwise the body comes from the response
+    cache or is built once by build().
+
+    Returns:
+        Response: JSON or 304 response, or None if the row does not exist
+    """
+    etag = _row_etag(model, kind, row_id, variant)
+    if etag is None:
+        return None
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag, STORED_CACHE_CONTROL)
+
+    body = _responses.get(etag)
+    if body is None:
+        body = build()
+        if len(body) <= RESPONSE_CACHE_MAX_BYTES:
+            _responses.set(etag, body)
+
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = STORED_CACHE_CONTROL
+    return response
+
+def analysis_response(analysis_id):
+    """
+    Returns the API response of a stored analysis
+
+    Statistics and visualization data are inserted into the response as stored, without
+    being parsed and serialized again.
+
+    Args:
+        analysis_id (int): ID of the analysis
+
+    Returns:
+        Response: JSON or 304 response, or None if the analysis does not exist
+    """
+    return _stored_response(AnalysisResult, 'analysis', analysis_id,
+                               lambda: _analysis_body(analysis_id))
+
+def data_response(data_id, include_descriptions=False):
+    """
+    Returns the API response of a scraped dataset
+
+    Without descriptions the stored listing batches are joined into the response as text.
+
+    Args:
+        data_id (int): ID of the scraped data
+        include_descriptions (bool, optional): Whether to merge descriptions back into the listings
+
+    Returns:
+        Response: JSON or 304 response, or None if the data does not exist
+    """
+    return _stored_response(ScrapedData, 'data', data_id,
+                               lambda: _data_body(data_id, include_descriptions),
+                               'descriptions' if include_descriptions else None)
+
+def analysis_etag(analysis_id):
+    """
+    Returns the entity tag of a stored analysis, or None if it does not exist
+    """
+    return _row_etag(AnalysisResult, 'analysis', analysis_id)
+
+def evict_responses():
+    """
+    Empties the response cache
+
+    Called after maintenance rewrites stored rows (image compaction, description migration);
+    their entity tags change as well, so this only releases the stale bodies early.
+    """
+    _responses.clear()
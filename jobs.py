@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime, timedelta
+from app import app, db
+from models import ScrapeJobRecord
+from write_queue import run_write
+from cache import BoundedCache
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Stages after which a scrape job emits no more events
+TERMINAL_STAGES = ('done', 'error')
+
+# Seconds between reads of a job that runs in another worker process
+SCRAPE_JOB_POLL_INTERVAL = 1.0
+
+# Hours a finished job stays readable by other worker processes
+SCRAPE_JOBS_MAX_AGE_HOURS = float(os.environ.get("SCRAPE_JOBS_MAX_AGE_HOURS", 24))
+
+class ScrapeJob:
+    """
+    Progress of one scrape running in a background thread
+
+    The scraper reports progress by calling emit. Every event is a snapshot of the whole job
+    state (stage, pages fetched, listings extracted, active fallback), so a client that
+    connects late or reconnects only needs the events after the last one it saw.
+    """
+
+    def __init__(self, url):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.events = []
+        self.state = {
+            'stage': 'queued',
+            'pages_fetched': 0,
+            'listings_extracted': 0,
+            'listings_stored': 0,
+            'fallback': None
+        }
+        self._condition = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.state['stage'] in TERMINAL_STAGES
+
+    @property
+    def result(self):
+        """Last event of a finished job, None while the job runs"""
+        return self.events[-1] if self.finished else None
+
+    def emit(self, stage, **fields):
+        """
+        Records a progress event and wakes up waiting readers
+
+        Args:
+            stage (str): Stage that is now running, e.g. 'download' or 'storing'
+            **fields: State fields to update, such as pages_fetched, listings_extracted,
+                listings_stored, fallback, data_id or error
+        """
+        with self._condition:
+            self.state['stage'] = stage
+            self.state.update(fields)
+            self.events.append(dict(self.state, job_id=self.id))
+            self._condition.notify_all()
+        logger.debug(f"Scrape job {self.id}: {stage} {fields}")
+
+    def wait_events(self, start, timeout=None):
+        """
+        Returns the events from index start on, waiting for new ones if there are none yet
+
+        Args:
+            start (int): Index of the first event to return
+            timeout (float, optional): Maximum number of seconds to wait
+
+        Returns:
+            list: Events, empty if none arrived within timeout
+        """
+        with self._condition:
+            if start >= len(self.events) and not self.finished:
+                self._condition.wait(timeout)
+            return self.events[start:]
+
+class StoredScrapeJob:
+    """
+    Read-only view of a scrape job running or finished in another worker process
+
+    The running process records the job when it starts and when it finishes, so this view
+    shows the initial state until the final event arrives; intermediate progress is only
+    streamed by the process running the job. It offers the reading interface of ScrapeJob.
+    """
+
+    def __init__(self, record):
+        self.id = record.job_id
+        self.url = record.url
+        self._load(record)
+
+    def _load(self, record):
+        self.state = json.loads(record.state)
+        self._finished = record.finished
+
+    @property
+    def finished(self):
+        return self._finished
+
+    @property
+    def result(self):
+        return dict(self.state, job_id=self.id) if self.finished else None
+
+    def wait_events(self, start, timeout=None):
+        """
+        Returns the current state as the only event, polling the database until the job
+        finishes or timeout passes unless the reader has not seen any event yet
+
+        Readers receive the initial state when they first connect and the final state once
+        the job finishes, which ends the stream.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.finished or start == 0:
+                return [dict(self.state, job_id=self.id)]
+            if deadline is not None and time.monotonic() >= deadline:
+                return []
+            time.sleep(SCRAPE_JOB_POLL_INTERVAL)
+            db.session.expire_all()
+            record = ScrapeJobRecord.query.filter_by(job_id=self.id).first()
+            if record is None:
+                return []
+            self._load(record)
+
+def _save_job(job, now):
+    """Records the current state of a job for other worker processes"""
+    record = ScrapeJobRecord.query.filter_by(job_id=job.id).first()
+    if record is None:
+        # Jobs are recorded when they start, which is when old records are removed
+        (ScrapeJobRecord.query
+         .filter(ScrapeJobRecord.updated_at < now - timedelta(hours=SCRAPE_JOBS_MAX_AGE_HOURS))
+         .delete(synchronize_session=False))
+        record = ScrapeJobRecord(job_id=job.id, url=job.url)
+        db.session.add(record)
+    record.state = json.dumps(job.state)
+    record.finished = job.finished
+    record.updated_at = now
+
+def _record_job(job):
+    try:
+        run_write(_save_job, job, datetime.utcnow())
+    except Exception as e:
+        logger.warning(f"Could not record scrape job {job.id}: {str(e)}")
+
+# Recent jobs by ID, so progress can still be read shortly after a job finishes
+_jobs = BoundedCache(maxsize=int(os.environ.get("SCRAPE_JOBS_MAX", 256)))
+
+# Running jobs by (url, api_key), so a re-submitted scrape joins the running one
+_running = {}
+_running_lock = threading.Lock()
+
+def start_scrape_job(url, api_key, run):
+    """
+    Starts a scrape in a background thread, or returns the running job for the same URL
+
+    Args:
+        url (str): URL to scrape
+        api_key (str): Firecrawl API key, part of the de-duplication key
+        run (callable): Function called in the thread with the job; it must emit a
+            terminal stage ('done' or 'error') when it returns
+
+    Returns:
+        tuple: (job, created) where created is False if an existing job was returned
+    """
+    key = (url, api_key or None)
+    with _running_lock:
+        job = _running.get(key)
+        if job is not None and not job.finished:
+            return job, False
+        job = ScrapeJob(url)
+        _running[key] = job
+        _jobs.set(job.id, job)
+    _record_job(job)
+
+    def target():
+        try:
+            run(job)
+        except Exception as e:
+            logger.error(f"Scrape job {job.id} failed: {str(e)}")
+        finally:
+            if not job.finished:
+                job.emit('error', error='Scrape stopped unexpectedly')
+            with app.app_context():
+                _record_job(job)
+            with _running_lock:
+                if _running.get(key) is job:
+                    del _running[key]
+
+    threading.Thread(target=target, name=f"scrape-{job.id[:8]}", daemon=True).start()
+    return job, True
+
+def get_scrape_job(job_id):
+    """
+    Returns a recent scrape job by ID, or None if it is unknown or was evicted
+
+    Jobs started by other worker processes are returned as a StoredScrapeJob.
+    """
+    job = _jobs.get(job_id)
+    if job is not None:
+        return job
+    record = ScrapeJobRecord.query.filter_by(job_id=job_id).first()
+    return StoredScrapeJob(record) if record is not None else None
@@ -0,0 +1,208 @@
+import re
+import sys
+import numpy as np
+
+# Numeric fields that can be extracted as columns
+NUMERIC_FIELDS = ('price', 'area', 'rooms', 'floor', 'total_floors', 'seller_rating', 'views')
+
+_NUMBER_RE = re.compile(r'\d+(?:[,.]\d+)?')
+_FLOOR_RE = re.compile(r'(\d+)\s*(?:/\s*(\d+))?')
+
+def _to_float(value):
+    """
+    Converts a JSON value such as 60, "60", "60 м²" or "5 200 000 ₽" to float
+    """
+    if type(value) is float:
+        return None if value != value else value
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return None if value != value else float(value)
+    text = str(value)
+    if not re.search(r'\d\s+\d{3}', text):
+        match = _NUMBER_RE.search(text)
+        return float(match.group(0).replace(',', '.')) if match else None
+    # Prices are written with thousands separators
+    match = re.search(r'\d[\d\s]*', text)
+    return float(re.sub(r'\s', '', match.group(0)))
+
+def _to_int(value):
+    if type(value) is int:
+        return value
+    number = _to_float(value)
+    return None if number is None else int(number)
+
+def _to_floor(value):
+    """
+    Converts a floor value such as "5/9" or 5 to (floor, total_floors)
+    """
+    if value is None:
+        return None, None
+    if isinstance(value, (int, float)):
+        return (None, None) if value != value else (int(value), None)
+    match = _FLOOR_RE.search(str(value))
+    if not match:
+        return None, None
+    return int(match.group(1)), int(match.group(2)) if match.group(2) else None
+
+def _to_str(value):
+    return None if value is None else str(value)
+
+class Listing:
+    """
+    Compact record of one real estate listing
+
+    Listings are kept in slotted objects with typed fields instead of dictionaries, which
+    saves the per-dictionary hash table on every listing. Conversion to and from the JSON
+    dictionary format happens only when listings are stored, loaded or returned by the API.
+    """
+
+    __slots__ = ('title', 'price', 'location', 'city', 'district', 'street', 'area', 'rooms',
+                 'floor', 'total_floors', 'description', 'seller_rating', 'views')
+
+    def __init__(self, title, price, location=None, city=None, district=None, street=None,
+                 area=None, rooms=None, floor=None, total_floors=None, description=None,
+                 seller_rating=None, views=None):
+        """
+        Args:
+            title (str): Listing title
+            price (int): Price in rubles
+            location (str, optional): Address line as shown on the page
+            city (str, optional): Normalized city name
+            district (str, optional): Normalized district name
+            street (str, optional): Normalized street
+            area (float, optional): Area in square meters
+            rooms (int, optional): Number of rooms
+            floor (int, optional): Floor of the apartment
+            total_floors (int, optional): Number of floors in the building
+            description (str, optional): Listing description
+            seller_rating (float, optional): Seller rating
+            views (int, optional): Number of views
+        """
+        self.title = title
+        self.price = price
+        self.location = location
+        self.city = city
+        self.district = district
+        self.street = street
+        self.area = area
+        self.rooms = rooms
+        self.floor = floor
+        self.total_floors = total_floors
+        self.description = description
+        self.seller_rating = seller_rating
+        self.views = views
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Creates a listing from its JSON dictionary, parsing numbers written as strings
+
+        Args:
+            data (dict): Listing dictionary, as stored or returned by Firecrawl
+
+        Returns:
+            Listing: Typed listing
+        """
+        floor, total_floors = _to_floor(data.get('floor'))
+        if data.get('total_floors') is not None:
+            total_floors = _to_int(data['total_floors'])
+        # City and district names repeat across listings, so one copy of each is shared
+        city = _to_str(data.get('city'))
+        district = _to_str(data.get('district'))
+        return cls(
+            title=_to_str(data.get('title')),
+            price=_to_int(data.get('price')),
+            location=_to_str(data.get('location')),
+            city=sys.intern(city) if city else city,
+            district=sys.intern(district) if district else district,
+            street=_to_str(data.get('street')),
+            area=_to_float(data.get('area')),
+            rooms=_to_int(data.get('rooms')),
+            floor=floor,
+            total_floors=total_floors,
+            description=_to_str(data.get('description')),
+            seller_rating=_to_float(data.get('seller_rating')),
+            views=_to_int(data.get('views'))
+        )
+
+    @classmethod
+    def coerce(cls, listing):
+        """
+        Returns listing as a Listing, converting it from a dictionary if needed
+        """
+        return listing if isinstance(listing, cls) else cls.from_dict(listing)
+
+    @property
+    def floor_label(self):
+        """Floor in the "floor/total" format used in titles and stored JSON"""
+        if self.floor is None:
+            return None
+        if self.total_floors is None:
+            return str(self.floor)
+        return f"{self.floor}/{self.total_floors}"
+
+    def to_dict(self, include_description=True):
+        """
+        Converts the listing to its JSON dictionary
+
+        Args:
+            include_description (bool, optional): Whether to include the description key
+
+        Returns:
+            dict: Listing dictionary in the stored format, with floor as "floor/total"
+        """
+        data = {
+            'title': self.title,
+            'price': self.price,
+            'location': self.location,
+            'city': self.city,
+            'district': self.district,
+            'street': self.street,
+            'area': self.area,
+            'rooms': self.rooms,
+            'floor': self.floor_label,
+            'seller_rating': self.seller_rating,
+            'views': self.views
+        }
+        if include_description:
+            data['description'] = self.description
+        return data
+
+    def __eq__(self, other):
+        if not isinstance(other, Listing):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def __repr__(self):
+        return f"Listing(title={self.title!r}, price={self.price!r}, area={self.area!r}, rooms={self.rooms!r})"
+
+def listing_column(listings, field):
+    """
+    Extracts one numeric field of listings into an array in a single pass
+
+    Args:
+        listings (iterable): Listing records or dictionaries, consumed lazily
+        field (str): Numeric field to extract
+
+    Returns:
+        numpy.ndarray: Float array with NaN for missing values
+    """
+    if field not in NUMERIC_FIELDS:
+        raise ValueError(f"Unknown numeric listing field: {field}")
+    values = (getattr(Listing.coerce(listing), field) for listing in listings)
+    return np.fromiter((np.nan if value is None else value for value in values), dtype=float)
+
+def listing_columns(listings, fields=None):
+    """
+    Converts listings into numeric column arrays
+
+    Args:
+        listings (iterable): Listing records or dictionaries
+        fields (list, optional): Numeric fields to extract, all NUMERIC_FIELDS by default
+
+    Returns:
+        dict: Field -> float numpy array, with NaN for missing values
+    """
+    listings = [Listing.coerce(listing) for listing in listings]
+    return {field: listing_column(listings, field) for field in fields or NUMERIC_FIELDS}
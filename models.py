@@ -5,12 +5,27 @@ class ScrapedData(db.Model):
     """Model for storing scraped data from Avito"""
     id = db.Column(db.Integer, primary_key=True)
     url = db.Column(db.String(512), nullable=False)
-    data = db.Column(db.Text, nullable=False)  # JSON string of scraped data
+    data = db.deferred(db.Column(db.Text, nullable=False))  # JSON string of scraped data, loaded on access
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    content_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped when maintenance rewrites data
+    
+    # Index for keyset pagination over the scrape history
+    __table_args__ = (db.Index('ix_scraped_data_created_at_id', 'created_at', 'id'),)
     
     # Relationship to analysis results
     analyses = db.relationship('AnalysisResult', backref='scraped_data', lazy=True)
     
+    # Listings stored in fixed-size batches (data then holds only pagination and the batch count)
+    batches = db.relationship('ListingBatch', backref='scraped_data', lazy=True,
+                              order_by='ListingBatch.seq')
+    
+    # Compressed listing descriptions, stored apart from the listing records
+    descriptions = db.relationship('ListingDescriptions', backref='scraped_data', lazy=True,
+                                   order_by='ListingDescriptions.start')
+    
+    # Summary statistics computed at ingest time
+    summary = db.relationship('ScrapeSummary', backref='scraped_data', lazy=True, uselist=False)
+    
     def __repr__(self):
         return f'<ScrapedData {self.id}>'
 
@@ -22,8 +37,128 @@ class AnalysisResult(db.Model):
     title = db.Column(db.String(256))
     bins = db.Column(db.Integer, default=30)
     statistics = db.Column(db.Text, nullable=False)  # JSON string of statistics
-    visualization_data = db.Column(db.Text, nullable=False)  # JSON string of visualization data
+    visualization_data = db.deferred(db.Column(db.Text, nullable=False))  # JSON string of visualization data, loaded on access
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    content_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped when maintenance rewrites visualization_data
+    
+    # Index for keyset pagination over the analyses of a scrape
+    __table_args__ = (db.Index('ix_analysis_result_data_id_created_at_id', 'data_id', 'created_at', 'id'),)
     
     def __repr__(self):
         return f'<AnalysisResult {self.id} - {self.parameter}>'
+
+class ListingBatch(db.Model):
+    """Model for storing a fixed-size batch of listings of a scrape"""
+    id = db.Column(db.Integer, primary_key=True)
+    data_id = db.Column(db.Integer, db.ForeignKey('scraped_data.id'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)  # Position of the batch within the scrape
+    count = db.Column(db.Integer, nullable=False)  # Number of listings in the batch
+    listings = db.Column(db.Text, nullable=False)  # JSON list of listings without descriptions
+    
+    __table_args__ = (db.UniqueConstraint('data_id', 'seq'),)
+    
+    def __repr__(self):
+        return f'<ListingBatch {self.data_id}:{self.seq}>'
+
+class ListingDescriptions(db.Model):
+    """Model for storing a compressed chunk of listing descriptions"""
+    id = db.Column(db.Integer, primary_key=True)
+    data_id = db.Column(db.Integer, db.ForeignKey('scraped_data.id'), nullable=False, index=True)
+    start = db.Column(db.Integer, nullable=False)  # Index of the first listing in this chunk
+    count = db.Column(db.Integer, nullable=False)  # Number of descriptions in this chunk
+    codec = db.Column(db.String(16), nullable=False)  # Compression codec: zstd or zlib
+    payload = db.Column(db.LargeBinary, nullable=False)  # Compressed JSON list of descriptions
+    raw_size = db.Column(db.Integer, nullable=False)  # Size of the uncompressed JSON in bytes
+    
+    def __repr__(self):
+        return f'<ListingDescriptions {self.data_id}:{self.start}+{self.count}>'
+
+class ScrapeSummary(db.Model):
+    """Model for storing summary statistics computed when data is scraped"""
+    id = db.Column(db.Integer, primary_key=True)
+    data_id = db.Column(db.Integer, db.ForeignKey('scraped_data.id'), nullable=False, unique=True)
+    listing_count = db.Column(db.Integer, nullable=False)
+    statistics = db.Column(db.Text, nullable=False)  # JSON string of per-parameter statistics
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ScrapeSummary {self.data_id} - {self.listing_count} listings>'
+
+class ScrapeFlight(db.Model):
+    """Model coordinating scrapes of the same URL across worker processes"""
+    id = db.Column(db.Integer, primary_key=True)
+    url_key = db.Column(db.String(512), nullable=False, unique=True)  # Normalized URL
+    status = db.Column(db.String(16), nullable=False)  # running, done or error
+    owner = db.Column(db.String(128))  # host:pid:thread running the scrape
+    data_id = db.Column(db.Integer)  # ID of the scraped data once done; retention may delete it
+    error = db.Column(db.Text)
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime)
+    joined = db.Column(db.Integer, nullable=False, default=0)  # Callers that waited for a running scrape
+    reused = db.Column(db.Integer, nullable=False, default=0)  # Callers served a fresh result outright
+    
+    def __repr__(self):
+        return f'<ScrapeFlight {self.url_key} - {self.status}>'
+
+class ScrapeJobRecord(db.Model):
+    """Model sharing the state of a background scrape job with other worker processes"""
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(32), nullable=False, unique=True)
+    url = db.Column(db.Text, nullable=False)
+    state = db.Column(db.Text, nullable=False)  # JSON snapshot at start and once the job finished
+    finished = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<ScrapeJobRecord {self.job_id} - {self.url}>'
+
+class MaintenanceRun(db.Model):
+    """Model recording when a periodic maintenance task last ran, shared by worker processes"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False, unique=True)  # Task name, e.g. retention
+    last_run_at = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f'<MaintenanceRun {self.name} - {self.last_run_at}>'
+
+class FetchRecord(db.Model):
+    """Model for storing one page download with its cache validators and transfer size"""
+    id = db.Column(db.Integer, primary_key=True)
+    url_key = db.Column(db.String(512), nullable=False)  # Normalized URL
+    status_code = db.Column(db.Integer, nullable=False)  # 200, or 304 if the page did not change
+    etag = db.Column(db.String(256))
+    last_modified = db.Column(db.String(64))
+    content_encoding = db.Column(db.String(32))
+    bytes_transferred = db.Column(db.Integer, nullable=False)  # Body bytes received over the network
+    bytes_decoded = db.Column(db.Integer, nullable=False)  # Body bytes after decompression
+    elapsed = db.Column(db.Float)
+    data_id = db.Column(db.Integer)  # Scrape built from the download, or reused on 304
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Index for finding the validators of the last download of a URL
+    __table_args__ = (db.Index('ix_fetch_record_url_key_id', 'url_key', 'id'),)
+    
+    def __repr__(self):
+        return f'<FetchRecord {self.url_key} - {self.status_code}>'
+
+class SavedSearch(db.Model):
+    """Model for an Avito search that is re-scraped on a schedule"""
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(512), nullable=False)
+    name = db.Column(db.String(128))
+    interval_minutes = db.Column(db.Float, nullable=False)  # Average time between runs; jitter is added
+    enabled = db.Column(db.Boolean, nullable=False, default=True)
+    next_run_at = db.Column(db.DateTime, nullable=False)
+    last_run_at = db.Column(db.DateTime)  # Start of the last run
+    last_finished_at = db.Column(db.DateTime)
+    last_status = db.Column(db.String(16))  # success or error
+    last_data_id = db.Column(db.Integer)
+    last_error = db.Column(db.Text)
+    running_since = db.Column(db.DateTime)  # Set while a scheduler runs the search
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Index for finding due searches
+    __table_args__ = (db.Index('ix_saved_search_enabled_next_run_at', 'enabled', 'next_run_at'),)
+    
+    def __repr__(self):
+        return f'<SavedSearch {self.id} - {self.url}>'
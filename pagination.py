@@ -0,0 +1,79 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+from app import db
+
+# Page size limits of paginated API endpoints
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(created_at, row_id):
+    """
+    Encodes the position after a row as an opaque cursor string
+
+    Args:
+        created_at (datetime): Creation time of the last row of a page
+        row_id (int): ID of the last row of a page
+
+    Returns:
+        str: URL-safe cursor
+    """
+    raw = json.dumps([created_at.isoformat() if created_at else None, row_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor created by encode_cursor
+
+    Args:
+        cursor (str): Cursor from a previous page
+
+    Returns:
+        tuple: (created_at, row_id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw.decode('utf-8'))
+        return (datetime.fromisoformat(created_at) if created_at else None), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def keyset_page(query, model, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Returns one page of a query ordered by (created_at, id), newest first
+
+    Instead of OFFSET, the page starts right after the (created_at, id) of the last row of
+    the previous page. With an index on (created_at, id) every page is an index range scan,
+    so deep pages cost the same as the first one.
+
+    Args:
+        query: SQLAlchemy query over model
+        model: Model class with created_at and id columns
+        cursor (str, optional): Cursor from the previous page, None for the first page
+        limit (int, optional): Number of rows per page
+
+    Returns:
+        tuple: (rows, next_cursor) where next_cursor is None on the last page
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # The first condition bounds the index range scan, the second skips the rows up to
+        # and including the cursor among rows with the same timestamp
+        query = query.filter(
+            model.created_at <= created_at,
+            db.or_(model.created_at < created_at, model.id < row_id)
+        )
+
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
@@ -0,0 +1,308 @@
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from app import db
+from models import (ScrapedData, AnalysisResult, ListingBatch, ListingDescriptions, ScrapeSummary, FetchRecord,
+                    MaintenanceRun)
+from singleflight import _INSERTS
+from analyzer import evict_sorted_values
+from search import evict_listing_index
+from comparables import evict_comparables_index
+from grouping import evict_group_columns
+from http_cache import evict_responses
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Number of scrapes or analyses deleted or compacted per transaction
+RETENTION_BATCH_SIZE = 500
+
+# Tables holding rows of a scraped dataset, deleted before the ScrapedData row itself
+_DEPENDENT_MODELS = (AnalysisResult, ListingBatch, ListingDescriptions, ScrapeSummary, FetchRecord)
+
+class RetentionPolicy:
+    """
+    Rules deciding which stored data is deleted or compacted
+
+    A scrape is deleted when it is older than max_age_days or when newer scrapes of the same
+    URL exceed keep_per_url; both rules are optional. Analyses older than image_max_age_days
+    keep their statistics and chart data but lose the rendered PNG image.
+    """
+
+    def __init__(self, max_age_days=None, keep_per_url=None, image_max_age_days=None):
+        """
+        Args:
+            max_age_days (float, optional): Delete scrapes older than this many days
+            keep_per_url (int, optional): Keep only this many newest scrapes of every URL
+            image_max_age_days (float, optional): Drop images of analyses older than this many days
+        """
+        self.max_age_days = max_age_days
+        self.keep_per_url = keep_per_url
+        self.image_max_age_days = image_max_age_days
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Creates a policy from the RETENTION_* settings of the application config
+        """
+        return cls(
+            max_age_days=config.get("RETENTION_MAX_AGE_DAYS"),
+            keep_per_url=config.get("RETENTION_KEEP_PER_URL"),
+            image_max_age_days=config.get("RETENTION_IMAGE_MAX_AGE_DAYS")
+        )
+
+    @property
+    def empty(self):
+        return self.max_age_days is None and self.keep_per_url is None and self.image_max_age_days is None
+
+def _expired_scrapes_query(policy, now):
+    """
+    Builds a query of the IDs of scrapes the policy deletes, or None if it deletes none
+    """
+    conditions = []
+    if policy.max_age_days is not None:
+        conditions.append(ScrapedData.created_at < now - timedelta(days=policy.max_age_days))
+    if policy.keep_per_url is not None:
+        # Position of every scrape among the scrapes of its URL, newest first
+        ranked = db.session.query(
+            ScrapedData.id.label('id'),
+            db.func.row_number().over(
+                partition_by=ScrapedData.url,
+                order_by=(ScrapedData.created_at.desc(), ScrapedData.id.desc())
+            ).label('position')
+        ).subquery()
+        conditions.append(ScrapedData.id.in_(
+            db.select(ranked.c.id).where(ranked.c.position > policy.keep_per_url)
+        ))
+    if not conditions:
+        return None
+    return db.session.query(ScrapedData.id).filter(db.or_(*conditions)).order_by(ScrapedData.id)
+
+def delete_scrapes(data_ids):
+    """
+    Deletes scraped datasets with their listings, descriptions, summaries, analyses and
+    download records
+
+    The caller commits the transaction.
+
+    Args:
+        data_ids (list): IDs of the scraped data to delete
+
+    Returns:
+        dict: Number of deleted rows per table name
+    """
+    deleted = {}
+    for model in _DEPENDENT_MODELS:
+        deleted[model.__tablename__] = (model.query
+                                        .filter(model.data_id.in_(data_ids))
+                                        .delete(synchronize_session=False))
+    deleted[ScrapedData.__tablename__] = (ScrapedData.query
+                                          .filter(ScrapedData.id.in_(data_ids))
+                                          .delete(synchronize_session=False))
+
+    # Only this process's caches are cleared. SQLite may give the highest deleted ID to the next
+    # scrape, so other processes can serve their cached data for it until it leaves their caches
+    for data_id in data_ids:
+        evict_listing_index(data_id)
+        evict_sorted_values(data_id)
+        evict_comparables_index(data_id)
+        evict_group_columns(data_id)
+    return deleted
+
+def drop_analysis_images(older_than, batch_size=RETENTION_BATCH_SIZE):
+    """
+    Removes rendered images from analyses, keeping their statistics and chart data
+
+    Args:
+        older_than (datetime): Compact analyses created before this time
+        batch_size (int, optional): Number of analyses per transaction
+
+    Returns:
+        int: Number of compacted analyses
+    """
+    compacted = 0
+    last_id = 0
+
+    while True:
+        rows = (AnalysisResult.query
+                .options(db.undefer(AnalysisResult.visualization_data))
+                .filter(AnalysisResult.id > last_id, AnalysisResult.created_at < older_than)
+                .order_by(AnalysisResult.id)
+                .limit(batch_size)
+                .all())
+        if not rows:
+            break
+
+        for row in rows:
+            last_id = row.id
+            visualization_data = json.loads(row.visualization_data)
+            if visualization_data.get('image_base64') is None:
+                continue
+            visualization_data['image_base64'] = None
+            row.visualization_data = json.dumps(visualization_data)
+            row.content_version += 1
+            compacted += 1
+
+        db.session.commit()
+
+    if compacted:
+        evict_responses()
+    return compacted
+
+def database_size():
+    """
+    Returns the size of the SQLite database file in bytes, or None for other databases
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return None
+    page_count = db.session.execute(db.text("PRAGMA page_count")).scalar()
+    page_size = db.session.execute(db.text("PRAGMA page_size")).scalar()
+    return page_count * page_size
+
+def reclaim_space():
+    """
+    Returns the free pages of the SQLite database to the file system
+
+    Databases created with auto_vacuum=INCREMENTAL release their free pages with
+    incremental_vacuum, which does not rewrite the file; other databases are rebuilt with
+    VACUUM, which needs free disk space for a temporary copy of the database.
+
+    Returns:
+        str: 'incremental' or 'full', or None if the database is not SQLite
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return None
+
+    db.session.commit()
+    # VACUUM cannot run inside a transaction
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            # The Python driver steps the pragma once, which frees a single page
+            while connection.exec_driver_sql("PRAGMA freelist_count").scalar():
+                connection.exec_driver_sql("PRAGMA incremental_vacuum")
+            return 'incremental'
+        connection.exec_driver_sql("VACUUM")
+        return 'full'
+
+def apply_retention(policy, batch_size=RETENTION_BATCH_SIZE, dry_run=False, vacuum=True):
+    """
+    Deletes and compacts stored data according to a retention policy
+
+    Expired scrapes are deleted batch by batch, each batch in its own transaction, so the
+    database stays usable while a large backlog is removed. Afterwards the freed pages are
+    returned to the file system.
+
+    Args:
+        policy (RetentionPolicy): Rules to apply
+        batch_size (int, optional): Number of scrapes or analyses per transaction
+        dry_run (bool, optional): Only count the scrapes that would be deleted
+        vacuum (bool, optional): Reclaim free space after deleting
+
+    Returns:
+        dict: Retention report with keys:
+            - scrapes_deleted (int): Number of deleted ScrapedData rows
+            - rows_deleted (dict): Number of deleted rows per table
+            - images_dropped (int): Number of analyses whose image was removed
+            - vacuum (str): Vacuum mode used, None if skipped
+            - bytes_before (int): Database size before, None if not SQLite
+            - bytes_after (int): Database size after, None if not SQLite
+            - bytes_freed (int): Difference of the two sizes, None if not SQLite
+    """
+    now = datetime.utcnow()
+    report = {
+        'scrapes_deleted': 0,
+        'rows_deleted': {},
+        'images_dropped': 0,
+        'vacuum': None,
+        'bytes_before': database_size(),
+        'bytes_after': None,
+        'bytes_freed': None
+    }
+
+    expired = _expired_scrapes_query(policy, now)
+    if dry_run:
+        report['scrapes_deleted'] = expired.count() if expired is not None else 0
+        return report
+
+    if expired is not None:
+        while True:
+            data_ids = [row.id for row in expired.limit(batch_size).all()]
+            if not data_ids:
+                break
+            for table, count in delete_scrapes(data_ids).items():
+                report['rows_deleted'][table] = report['rows_deleted'].get(table, 0) + count
+            report['scrapes_deleted'] += len(data_ids)
+            db.session.commit()
+            logger.info(f"Retention deleted {report['scrapes_deleted']} scrapes so far")
+
+    if policy.image_max_age_days is not None:
+        report['images_dropped'] = drop_analysis_images(now - timedelta(days=policy.image_max_age_days), batch_size)
+
+    if vacuum and (report['scrapes_deleted'] or report['images_dropped']):
+        report['vacuum'] = reclaim_space()
+
+    report['bytes_after'] = database_size()
+    if report['bytes_before'] is not None:
+        report['bytes_freed'] = report['bytes_before'] - report['bytes_after']
+    return report
+
+def _claim_run(name, now, interval):
+    """
+    Records a run of a periodic task unless another process ran it within half an interval
+
+    Returns:
+        bool: Whether the claim succeeded
+    """
+    table = MaintenanceRun.__table__
+    insert = _INSERTS.get(db.engine.dialect.name)
+    if insert is not None:
+        inserted = db.session.execute(
+            insert(table).values(name=name, last_run_at=now).on_conflict_do_nothing(index_elements=['name'])
+        ).rowcount
+        if inserted:
+            return True
+
+    return db.session.execute(
+        table.update()
+        .where(table.c.name == name, table.c.last_run_at <= now - interval / 2)
+        .values(last_run_at=now)
+    ).rowcount == 1
+
+def start_retention_schedule(app, interval_hours):
+    """
+    Applies the configured retention policy in a background thread every interval_hours
+
+    The first run happens one interval after start, so short-lived processes such as CLI
+    commands never run it. Every worker process starts a schedule, but a run is skipped when
+    another process claimed one within the last half interval, so the policy is applied about
+    once per interval however many workers serve the application.
+
+    Args:
+        app (Flask): Application providing the config and database
+        interval_hours (float): Hours between runs
+
+    Returns:
+        threading.Event: Event that stops the schedule when set
+    """
+    stopped = threading.Event()
+
+    def loop():
+        interval = timedelta(hours=interval_hours)
+        while not stopped.wait(interval.total_seconds()):
+            with app.app_context():
+                try:
+                    claimed = _claim_run('retention', datetime.utcnow(), interval)
+                    db.session.commit()
+                    if not claimed:
+                        logger.info("Skipping scheduled retention: another process ran it recently")
+                        continue
+                    report = apply_retention(RetentionPolicy.from_config(app.config))
+                    logger.info(f"Scheduled retention: {report}")
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Scheduled retention failed: {str(e)}")
+
+    threading.Thread(target=loop, name="retention", daemon=True).start()
+    return stopped
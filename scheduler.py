@@ -0,0 +1,371 @@
+import os
+import random
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from app import db
+from models import SavedSearch
+from scraper import scrape_avito_data
+from write_queue import run_write
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for due searches
+SCHEDULER_POLL_SECONDS = float(os.environ.get("SCHEDULER_POLL_SECONDS", 5))
+
+# Maximum number of scheduled scrapes running at the same time in one process
+SCHEDULER_MAX_CONCURRENCY = int(os.environ.get("SCHEDULER_MAX_CONCURRENCY", 4))
+
+# Maximum number of scheduled scrapes of the same host running at the same time in one process
+SCHEDULER_PER_HOST = int(os.environ.get("SCHEDULER_PER_HOST", 2))
+
+# Share of the interval by which every run is moved randomly earlier or later
+SCHEDULER_JITTER = float(os.environ.get("SCHEDULER_JITTER", 0.1))
+
+# Seconds after which a run that never finished is considered dead and the search runs again
+SCHEDULER_RUN_TIMEOUT = float(os.environ.get("SCHEDULER_RUN_TIMEOUT", 1800))
+
+# Shortest allowed interval between runs of a saved search
+SCHEDULER_MIN_INTERVAL_MINUTES = 1
+
+def next_run_time(interval_minutes, scheduled_at, now):
+    """
+    Returns when a search runs next
+
+    The next run follows the previous scheduled time rather than the end of the run, so runs
+    do not drift. Every run is moved by up to SCHEDULER_JITTER of the interval, which spreads
+    searches created together over time. A search that fell behind, e.g. while no scheduler
+    was running, is scheduled one interval from now instead of running repeatedly to catch up.
+
+    Args:
+        interval_minutes (float): Average minutes between runs
+        scheduled_at (datetime): Time the previous run was due
+        now (datetime): Current time
+
+    Returns:
+        datetime: Next due time
+    """
+    interval = interval_minutes * 60
+    jitter = random.uniform(-SCHEDULER_JITTER, SCHEDULER_JITTER) * interval
+    next_run = scheduled_at + timedelta(seconds=interval + jitter)
+    if next_run <= now:
+        next_run = now + timedelta(seconds=interval + jitter)
+    return next_run
+
+def create_saved_search(url, interval_minutes, name=None):
+    """
+    Adds a saved search to the session without committing
+
+    The first run is due within the jitter window of one interval, so searches created
+    together do not all run at once.
+
+    Args:
+        url (str): URL of the Avito search
+        interval_minutes (float): Average minutes between runs
+        name (str, optional): Display name
+
+    Returns:
+        SavedSearch: New search
+    """
+    now = datetime.utcnow()
+    search = SavedSearch(
+        url=url,
+        name=name,
+        interval_minutes=interval_minutes,
+        enabled=True,
+        next_run_at=now + timedelta(seconds=random.uniform(0, SCHEDULER_JITTER) * interval_minutes * 60)
+    )
+    db.session.add(search)
+    return search
+
+def saved_search_to_dict(search):
+    """
+    Converts a saved search to its API representation
+    """
+    def isoformat(value):
+        return value.isoformat() if value else None
+
+    return {
+        'id': search.id,
+        'url': search.url,
+        'name': search.name,
+        'interval_minutes': search.interval_minutes,
+        'enabled': search.enabled,
+        'next_run_at': isoformat(search.next_run_at),
+        'last_run_at': isoformat(search.last_run_at),
+        'last_finished_at': isoformat(search.last_finished_at),
+        'last_status': search.last_status,
+        'last_data_id': search.last_data_id,
+        'last_error': search.last_error,
+        'running': search.running_since is not None,
+        'created_at': isoformat(search.created_at)
+    }
+
+def _due_filter(now):
+    return db.and_(SavedSearch.enabled.is_(True), SavedSearch.next_run_at <= now)
+
+def _running_filter(now):
+    """Searches with a run in progress that has not timed out"""
+    return SavedSearch.running_since >= now - timedelta(seconds=SCHEDULER_RUN_TIMEOUT)
+
+def _claim(search_id, now, next_run_at):
+    """
+    Marks a due search as running and schedules its next run, unless another scheduler
+    started it first
+
+    Returns:
+        bool: Whether the claim succeeded
+    """
+    table = SavedSearch.__table__
+    return db.session.execute(
+        table.update()
+        .where(
+            table.c.id == search_id,
+            _due_filter(now),
+            db.or_(table.c.running_since.is_(None), ~_running_filter(now))
+        )
+        .values(running_since=now, next_run_at=next_run_at)
+    ).rowcount == 1
+
+def _finish(search_id, started_at, result):
+    """Records the result of a run"""
+    search = db.session.get(SavedSearch, search_id)
+    if search is None:
+        return
+    now = datetime.utcnow()
+    search.running_since = None
+    search.last_run_at = started_at
+    search.last_finished_at = now
+    search.last_status = 'success' if result.get('success') else 'error'
+    search.last_data_id = result.get('data_id', search.last_data_id)
+    search.last_error = result.get('error')
+    # A run that outlasted the interval skipped the runs due meanwhile
+    if search.next_run_at <= now:
+        search.next_run_at = next_run_time(search.interval_minutes, search.next_run_at, now)
+
+class Scheduler:
+    """
+    Runs scrape_avito_data for due saved searches from an asyncio event loop
+
+    Every poll the loop claims due searches through their running_since column and moves
+    their next_run_at on, so several worker processes can run schedulers on one database
+    without running a search twice. A search that comes due again while its previous run is
+    still in flight is skipped. Claimed runs wait for a slot
+    of the global limit and of their host's limit; the scrapes themselves run in a thread
+    pool because scrape_avito_data blocks.
+    """
+
+    def __init__(self, flask_app, max_concurrency=SCHEDULER_MAX_CONCURRENCY, per_host=SCHEDULER_PER_HOST,
+                 poll_seconds=SCHEDULER_POLL_SECONDS):
+        """
+        Args:
+            flask_app (Flask): Application providing the database
+            max_concurrency (int, optional): Maximum number of scrapes running at the same time
+            per_host (int, optional): Maximum number of scrapes of one host running at the same time
+            poll_seconds (float, optional): Seconds between checks for due searches
+        """
+        self.app = flask_app
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self.poll_seconds = poll_seconds
+        self.started = 0
+        self.runs = 0
+        self.failures = 0
+        self.skipped_in_flight = 0
+        self.lag_last = None
+        self.lag_max = 0.0
+        self.lag_total = 0.0
+        self._claimed = 0
+        self._active = 0
+        self._skipped = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        # Scrapes block on the network, bookkeeping queries run on their own thread
+        self._scrapers = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="scheduled-scrape")
+        self._bookkeeper = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scheduler-db")
+
+    def _in_context(self, function, *args):
+        with self.app.app_context():
+            try:
+                return function(*args)
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def _claim_due(self, limit):
+        """
+        Claims up to limit due searches
+
+        Returns:
+            list: (search_id, url, scheduled_at) of the claimed searches
+        """
+        now = datetime.utcnow()
+        due = (db.session.query(SavedSearch.id, SavedSearch.url, SavedSearch.interval_minutes,
+                                SavedSearch.next_run_at, SavedSearch.running_since)
+               .filter(_due_filter(now))
+               .order_by(SavedSearch.next_run_at)
+               .all())
+
+        claimed = []
+        skipped = set()
+        for search_id, url, interval_minutes, scheduled_at, running_since in due:
+            if running_since is not None and running_since >= now - timedelta(seconds=SCHEDULER_RUN_TIMEOUT):
+                # The previous run is still in flight; count every skipped due time once
+                skipped.add((search_id, scheduled_at))
+                continue
+            if len(claimed) < limit and run_write(_claim, search_id, now,
+                                                  next_run_time(interval_minutes, scheduled_at, now)):
+                claimed.append((search_id, url, scheduled_at))
+
+        with self._lock:
+            self.skipped_in_flight += len(skipped - self._skipped)
+            self._skipped = skipped
+        return claimed
+
+    def _scrape(self, search_id, url, scheduled_at):
+        """Runs one scheduled scrape in a worker thread and records its result"""
+        started_at = datetime.utcnow()
+        lag = (started_at - scheduled_at).total_seconds()
+        with self._lock:
+            self._active += 1
+            self.started += 1
+            self.lag_last = lag
+            self.lag_max = max(self.lag_max, lag)
+            self.lag_total += lag
+
+        result = {"success": False, "error": "Scheduled scrape stopped unexpectedly"}
+        try:
+            result = self._in_context(scrape_avito_data, url)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        finally:
+            try:
+                self._in_context(run_write, _finish, search_id, started_at, result)
+            except Exception as e:
+                logger.error(f"Error recording scheduled scrape of search {search_id}: {str(e)}")
+            with self._lock:
+                self._active -= 1
+                self.runs += 1
+                if not result.get('success'):
+                    self.failures += 1
+        logger.info(f"Scheduled scrape of search {search_id} finished: {result}")
+
+    async def _run_search(self, global_slots, host_slots, search_id, url, scheduled_at):
+        host = urlsplit(url).hostname or ''
+        if host not in host_slots:
+            host_slots[host] = asyncio.Semaphore(self.per_host)
+        loop = asyncio.get_running_loop()
+        try:
+            # A search waiting for its busy host must not hold a global slot other hosts could use
+            async with host_slots[host], global_slots:
+                await loop.run_in_executor(self._scrapers, self._scrape, search_id, url, scheduled_at)
+        finally:
+            with self._lock:
+                self._claimed -= 1
+
+    async def run(self):
+        """Polls for due searches until stop() is called"""
+        loop = asyncio.get_running_loop()
+        global_slots = asyncio.Semaphore(self.max_concurrency)
+        host_slots = {}
+        tasks = set()
+
+        while not self._stopped.is_set():
+            # Claim only what can start soon, so other processes can take the rest
+            with self._lock:
+                free = self.max_concurrency - self._claimed
+            if free > 0:
+                try:
+                    claimed = await loop.run_in_executor(self._bookkeeper, self._in_context, self._claim_due, free)
+                except Exception as e:
+                    logger.error(f"Error claiming due searches: {str(e)}")
+                    claimed = []
+                for search_id, url, scheduled_at in claimed:
+                    with self._lock:
+                        self._claimed += 1
+                    task = asyncio.create_task(self._run_search(global_slots, host_slots, search_id, url, scheduled_at))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            await asyncio.sleep(self.poll_seconds)
+
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self):
+        """Stops claiming searches; runs in progress finish"""
+        self._stopped.set()
+
+    def metrics(self):
+        """
+        Returns counters of this scheduler and the due searches in the database
+
+        Returns:
+            dict: Metrics with keys:
+                - active (int): Scheduled scrapes running in this process
+                - waiting (int): Claimed runs waiting for a global or per-host slot
+                - due (int): Searches due in the database that no scheduler has started
+                - in_flight (int): Searches running in any process
+                - oldest_due_seconds (float): How long the most overdue unstarted search has been due
+                - runs (int): Finished runs in this process
+                - failures (int): Runs that ended with an error
+                - skipped_in_flight (int): Runs that came due while the previous run was in flight
+                - lag_seconds (dict): last, mean and max delay between due time and start of a run
+        """
+        now = datetime.utcnow()
+        not_running = db.or_(SavedSearch.running_since.is_(None), ~_running_filter(now))
+        due, oldest = (db.session.query(db.func.count(SavedSearch.id), db.func.min(SavedSearch.next_run_at))
+                       .filter(_due_filter(now), not_running)
+                       .one())
+        in_flight = db.session.query(db.func.count(SavedSearch.id)).filter(_running_filter(now)).scalar()
+
+        with self._lock:
+            return {
+                'active': self._active,
+                'waiting': self._claimed - self._active,
+                'due': due,
+                'in_flight': in_flight,
+                'oldest_due_seconds': round((now - oldest).total_seconds(), 3) if oldest else 0.0,
+                'runs': self.runs,
+                'failures': self.failures,
+                'skipped_in_flight': self.skipped_in_flight,
+                'lag_seconds': {
+                    'last': round(self.lag_last, 3) if self.lag_last is not None else None,
+                    'mean': round(self.lag_total / self.started, 3) if self.started else None,
+                    'max': round(self.lag_max, 3)
+                }
+            }
+
+_scheduler = None
+
+def start_scheduler(flask_app, **options):
+    """
+    Starts the saved search scheduler of this process in a background thread
+
+    Args:
+        flask_app (Flask): Application providing the database
+        **options: Arguments of Scheduler
+
+    Returns:
+        Scheduler: The running scheduler
+    """
+    global _scheduler
+    _scheduler = Scheduler(flask_app, **options)
+    threading.Thread(target=asyncio.run, args=(_scheduler.run(),), name="scheduler", daemon=True).start()
+    logger.info("Saved search scheduler started")
+    return _scheduler
+
+def get_scheduler_metrics():
+    """
+    Returns the metrics of this process's scheduler
+
+    Returns:
+        dict: Scheduler metrics with key enabled, which is False if no scheduler runs here
+    """
+    if _scheduler is None:
+        return {'enabled': False}
+    return dict(_scheduler.metrics(), enabled=True)
@@ -1,56 +1,74 @@
 import os
+import re
 import json
+import time
 import logging
+from urllib.parse import urljoin
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
 from datetime import datetime
 import trafilatura
-from app import db
-from models import ScrapedData
+from app import app, db
+from storage import store_listings, load_summary
+from write_queue import run_write
+from singleflight import run_single_flight, SCRAPE_WAIT_INTERVAL
+from fetcher import (fetch_page, get_validators, record_fetch, check_public_host_async, NotModified, Page,
+                     USER_AGENT)
+from gazetteer import get_gazetteer
+from listing import Listing
 
 import requests
 import aiohttp
 import asyncio
 
+# Firecrawl scrape endpoint; can point at a stub server for load tests
+FIRECRAWL_API_URL = os.environ.get("FIRECRAWL_API_URL", "https://api.firecrawl.dev/api/v1/scrape")
+
 # Firecrawl API client implementation (direct HTTP calls)
 class FirecrawlApp:
     def __init__(self, apiKey):
         self.apiKey = apiKey
-        self.base_url = "https://api.firecrawl.dev/api/v1/scrape"
+        self.base_url = FIRECRAWL_API_URL
         self.headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {apiKey}"
         }
     
-    async def scrapeUrl(self, url, params):
+    async def scrapeUrl(self, url, params, session=None):
         """
         Scrape a URL using the Firecrawl API
         
         Args:
             url (str): URL to scrape
             params (dict): Additional parameters for scraping
+            session (aiohttp.ClientSession, optional): Shared session to reuse pooled connections
             
         Returns:
             dict: Scraped data or None if error
         """
+        if session is None:
+            async with aiohttp.ClientSession() as session:
+                return await self.scrapeUrl(url, params, session)
+        
         try:
             payload = {
                 "url": url,
                 **params
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.base_url, 
-                    headers=self.headers,
-                    json=payload
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        logger.info("Firecrawl API request successful")
-                        return result
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Firecrawl API request failed with status {response.status}: {error_text}")
-                        return None
+            async with session.post(
+                self.base_url, 
+                headers=self.headers,
+                json=payload
+            ) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    logger.info("Firecrawl API request successful")
+                    return result
+                else:
+                    error_text = await response.text()
+                    logger.error(f"Firecrawl API request failed with status {response.status}: {error_text}")
+                    return None
         except Exception as e:
             logger.error(f"Error making Firecrawl API request: {str(e)}")
             return None
@@ -85,6 +103,67 @@ class FirecrawlApp:
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Import lxml if possible (installed together with trafilatura)
+try:
+    from lxml import html as lxml_html
+    from lxml import etree
+except ImportError:
+    lxml_html = None
+
+# Whether to read listing cards from the page HTML before falling back to text extraction
+HTML_EXTRACTION_ENABLED = os.environ.get("AVITO_HTML_EXTRACTION", "1") != "0"
+
+# Precompiled selectors for Avito listing cards
+if lxml_html is not None:
+    CARD_XPATH = etree.XPath('//*[@data-marker="item"]')
+    TITLE_XPATH = etree.XPath('.//*[@data-marker="item-title"] | .//*[@itemprop="name"]')
+    PRICE_CONTENT_XPATH = etree.XPath('.//*[@itemprop="price"]/@content')
+    PRICE_TEXT_XPATH = etree.XPath('.//*[@data-marker="item-price"]')
+    ADDRESS_XPATH = etree.XPath('.//*[@data-marker="item-address"] | .//*[@itemprop="address"]')
+    DESCRIPTION_XPATH = etree.XPath('.//*[@data-marker="item-specific-params"] | .//*[@itemprop="description"]')
+    NEXT_PAGE_XPATH = etree.XPath('//a[@data-marker="pagination-button/nextPage"]/@href')
+
+# Maximum number of redirects followed by the async scraper
+ASYNC_MAX_REDIRECTS = 5
+
+# Precompiled patterns for fields inside a listing card title
+PRICE_DIGITS_RE = re.compile(r'\d[\d\s]*')
+ROOMS_RE = re.compile(r'(\d+)[\s-]*(?:комн|к\.)')
+AREA_RE = re.compile(r'(\d+(?:[.,]\d+)?)\s*(?:м²|кв\.м|m²)')
+FLOOR_RE = re.compile(r'(\d+)/(\d+)\s*эт')
+
+def fetch_page_html(url):
+    """
+    Download a web page over the shared connection pool
+    
+    Args:
+        url (str): URL of the website to scrape
+        
+    Returns:
+        str: Page HTML or None if the download failed
+    """
+    try:
+        return fetch_page(url).html
+    except Exception as e:
+        logger.error(f"Error downloading page: {str(e)}")
+        return None
+
+def extract_text_content(html):
+    """
+    Extract the main text content from page HTML using trafilatura
+    
+    Args:
+        html (str): Page HTML
+        
+    Returns:
+        str: Extracted text content
+    """
+    try:
+        return trafilatura.extract(html)
+    except Exception as e:
+        logger.error(f"Error extracting content with trafilatura: {str(e)}")
+        return None
+
 def get_website_text_content(url):
     """
     Extract text content from a website using trafilatura
@@ -95,31 +174,133 @@ def get_website_text_content(url):
     Returns:
         str: Extracted text content
     """
-    try:
-        # Send a request to the website
-        downloaded = trafilatura.fetch_url(url)
-        if downloaded is None:
-            return None
+    downloaded = fetch_page_html(url)
+    if downloaded is None:
+        return None
+    return extract_text_content(downloaded)
+
+def _card_text(card, xpath):
+    """
+    Returns the whitespace-normalized text of the first element matched by xpath in a card
+    """
+    elements = xpath(card)
+    if not elements:
+        return None
+    text = ' '.join(elements[0].text_content().split())
+    return text or None
+
+def extract_avito_listings_from_html(html):
+    """
+    Parse Avito listings directly from page HTML
+    
+    The page is parsed once with lxml and every listing card is read with precompiled
+    XPath selectors, so fields are always taken from the card they belong to.
+    
+    Args:
+        html (str): Page HTML from Avito website
         
-        # Extract text content
-        text = trafilatura.extract(downloaded)
-        return text
+    Returns:
+        dict: Structured data with listings, or None if lxml is not available,
+            the page cannot be parsed or no listing cards are found
+    """
+    if not html or lxml_html is None:
+        return None
+    
+    try:
+        document = lxml_html.fromstring(html)
     except Exception as e:
-        logger.error(f"Error extracting content with trafilatura: {str(e)}")
+        logger.warning(f"Failed to parse page HTML: {str(e)}")
+        return None
+    
+    cards = CARD_XPATH(document)
+    if not cards:
+        logger.info("No listing cards found in page HTML")
         return None
+    
+    logger.info(f"Found {len(cards)} listing cards in page HTML")
+    listings = list(iter_avito_listings_from_cards(cards))
+    
+    if not listings:
+        logger.warning("Listing cards found but no listings could be read from them")
+        return None
+    
+    next_page = NEXT_PAGE_XPATH(document)
+    logger.info(f"Successfully extracted {len(listings)} listings from page HTML")
+    
+    return {
+        "listings": listings,
+        "pagination": {
+            "next_page": next_page[0] if next_page else None,
+            "total_pages": None
+        }
+    }
+
+def iter_avito_listings_from_cards(cards):
+    """
+    Read listings from parsed Avito listing cards, yielding them one at a time
+    
+    Args:
+        cards (list): lxml elements of listing cards
         
-def extract_avito_listings_from_text(text):
+    Yields:
+        Listing: Listing record
     """
-    Parse Avito listings from text content
+    gazetteer = get_gazetteer()
+    seen = set()
+    
+    for i, card in enumerate(cards):
+        try:
+            title = _card_text(card, TITLE_XPATH)
+            if not title:
+                continue
+            
+            # Price from microdata when present, otherwise from the displayed text
+            price_values = PRICE_CONTENT_XPATH(card)
+            price_text = price_values[0] if price_values else _card_text(card, PRICE_TEXT_XPATH)
+            price_match = PRICE_DIGITS_RE.search(price_text or '')
+            price = int(re.sub(r'\s', '', price_match.group(0))) if price_match else 0
+            
+            rooms_match = ROOMS_RE.search(title)
+            area_match = AREA_RE.search(title)
+            floor_match = FLOOR_RE.search(title)
+            
+            address = _card_text(card, ADDRESS_XPATH)
+            location_info = gazetteer.extract_location(address or '')
+            
+            listing = Listing(
+                title=title,
+                price=price,
+                location=address or location_info['location'] or "Адрес не указан",
+                city=location_info['city'],
+                district=location_info['district'],
+                street=location_info['street'],
+                area=float(area_match.group(1).replace(',', '.')) if area_match else None,
+                rooms=int(rooms_match.group(1)) if rooms_match else None,
+                floor=int(floor_match.group(1)) if floor_match else None,
+                total_floors=int(floor_match.group(2)) if floor_match else None,
+                description=_card_text(card, DESCRIPTION_XPATH)
+            )
+            
+            key = (listing.title, listing.price, listing.location)
+            if listing.price > 0 and key not in seen:
+                seen.add(key)
+                yield listing
+        except Exception as e:
+            logger.warning(f"Error processing listing card {i+1}: {str(e)}")
+            continue
+        
+def iter_avito_listings_from_text(text):
+    """
+    Parse Avito listings from text content, yielding them one at a time
     
     Args:
         text (str): Text content from Avito website
         
-    Returns:
-        dict: Structured data with listings
+    Yields:
+        Listing: Listing record
     """
     if not text:
-        return None
+        return
     
     import re
     import logging
@@ -127,8 +308,12 @@ def extract_avito_listings_from_text(text):
     logger = logging.getLogger(__name__)
     logger.info(f"Extracting listings from text of length: {len(text)}")
     
-    # Advanced pattern extraction for Avito property listings
-    listings = []
+    # Advanced pattern extraction for Avito property listings.
+    # Only the keys needed for de-duplication are kept, not the listings themselves.
+    yielded = 0
+    seen_titles = set()
+    seen_rooms = set()
+    gazetteer = get_gazetteer()
     
     try:
         # Pattern-based approach for Avito's typical structure
@@ -202,43 +387,40 @@ def extract_avito_listings_from_text(text):
                         title_candidates = [l for l in lines if 'квартира' in l.lower() or 'комн' in l.lower()]
                         title = title_candidates[0].strip() if title_candidates else "Квартира"
                     
-                    # Extract location - look for known city names and address patterns
-                    location_pattern = r'(?:Москва|Санкт-Петербург|Новосибирск|Екатеринбург|Казань|Ростов|Краснодар)(?:[^,\n]*(?:,|ул\.|проспект|пр-т)[^,\n]*)'
-                    location_match = re.search(location_pattern, listing_text)
-                    
-                    if location_match:
-                        location = location_match.group(0)
-                    else:
-                        # Fallback - look for address patterns
-                        address_pattern = r'(?:ул\.|улица|проспект|пр-т|бульвар|переулок|проезд|шоссе)[\s\w\-\.,]+'
-                        addr_match = re.search(address_pattern, listing_text)
-                        location = addr_match.group(0) if addr_match else "Адрес не указан"
+                    # Extract location - city, district and street found in one gazetteer pass
+                    location_info = gazetteer.extract_location(listing_text)
+                    location = location_info['location'] or "Адрес не указан"
                     
                     # Create listing object
-                    listing = {
-                        "title": title.strip(),
-                        "price": price,
-                        "location": location.strip(),
-                        "area": area,
-                        "rooms": rooms,
-                        "floor": floor,
-                        "description": listing_text,
-                        "seller_rating": None,
-                        "views": None
-                    }
+                    listing = Listing(
+                        title=title.strip(),
+                        price=price,
+                        location=location.strip(),
+                        city=location_info['city'],
+                        district=location_info['district'],
+                        street=location_info['street'],
+                        area=area,
+                        rooms=rooms,
+                        floor=int(floor_match.group(1)) if floor_match else None,
+                        total_floors=int(floor_match.group(2)) if floor_match else None,
+                        description=listing_text
+                    )
                     
                     # Only add unique listings with required data
-                    if (listing["title"] and listing["price"] > 0 and 
-                        listing["location"] and 
-                        not any(l["price"] == listing["price"] and l["title"] == listing["title"] for l in listings)):
-                        listings.append(listing)
+                    if (listing.title and listing.price > 0 and 
+                        listing.location and 
+                        (listing.price, listing.title) not in seen_titles):
+                        seen_titles.add((listing.price, listing.title))
+                        seen_rooms.add((listing.price, listing.rooms))
+                        yielded += 1
+                        yield listing
                         
                 except Exception as e:
                     logger.warning(f"Error processing listing {i+1}: {str(e)}")
                     continue
         
         # 2. If we didn't find enough listings, try an alternative approach using section splitting
-        if len(listings) < 3:
+        if yielded < 3:
             logger.info("Few listings found, trying alternative extraction method")
             
             # Try to find listings based on room-apartment patterns
@@ -290,265 +472,769 @@ def extract_avito_listings_from_text(text):
                         if area_match and floor_match:
                             title = f"{title}, {area_match.group(0)}, {floor_match.group(0)}"
                         
-                        # Extract location (simplified approach)
-                        location = "Адрес не указан"
-                        for line in listing_text.split('\n'):
-                            loc_indicators = ["Москва", "Санкт-Петербург", "ул.", "проспект", "пр-т"]
-                            if any(indicator in line for indicator in loc_indicators):
-                                location = line.strip()
-                                break
+                        # Extract location with the gazetteer
+                        location_info = gazetteer.extract_location(listing_text)
+                        location = location_info['location'] or "Адрес не указан"
                         
                         # Create listing object
-                        listing = {
-                            "title": title.strip(),
-                            "price": price,
-                            "location": location.strip(),
-                            "area": area,
-                            "rooms": rooms,
-                            "floor": floor,
-                            "description": listing_text,
-                            "seller_rating": None,
-                            "views": None
-                        }
+                        listing = Listing(
+                            title=title.strip(),
+                            price=price,
+                            location=location.strip(),
+                            city=location_info['city'],
+                            district=location_info['district'],
+                            street=location_info['street'],
+                            area=area,
+                            rooms=rooms,
+                            floor=int(floor_match.group(1)) if floor_match else None,
+                            total_floors=int(floor_match.group(2)) if floor_match else None,
+                            description=listing_text
+                        )
                         
                         # Only add unique listings with required data
-                        if (listing["price"] > 0 and 
-                            not any(l["price"] == listing["price"] and l["rooms"] == listing["rooms"] for l in listings)):
-                            listings.append(listing)
+                        if (listing.price > 0 and 
+                            (listing.price, listing.rooms) not in seen_rooms):
+                            seen_rooms.add((listing.price, listing.rooms))
+                            yielded += 1
+                            yield listing
                             
                     except Exception as e:
                         logger.warning(f"Error in alt method for listing {i+1}: {str(e)}")
                         continue
         
-        # Create structured data format
-        structured_data = {
-            "listings": listings,
-            "pagination": {
-                "next_page": None,
-                "total_pages": None
+    except Exception as e:
+        logger.error(f"Error extracting listings from text: {str(e)}")
+
+def extract_avito_listings_from_text(text):
+    """
+    Parse Avito listings from text content
+    
+    Args:
+        text (str): Text content from Avito website
+        
+    Returns:
+        dict: Structured data with listings
+    """
+    if not text:
+        return None
+    
+    listings = list(iter_avito_listings_from_text(text))
+    
+    # Create structured data format
+    structured_data = {
+        "listings": listings,
+        "pagination": {
+            "next_page": None,
+            "total_pages": None
+        }
+    }
+    
+    # Log extraction results
+    if listings:
+        logger.info(f"Successfully extracted {len(listings)} listings")
+        for i, listing in enumerate(listings[:3]):
+            logger.info(f"Sample {i+1}: {listing.title} - {listing.price}₽")
+            
+        if len(listings) > 3:
+            logger.info(f"And {len(listings)-3} more listings...")
+    else:
+        logger.warning("No listings extracted from text")
+    
+    return structured_data
+
+
+# Extraction schema sent to the Firecrawl API
+FIRECRAWL_LISTING_SCHEMA = {
+    "listings": {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "title": {"type": "string"},
+                "price": {"type": "number"},
+                "location": {"type": "string"},
+                "area": {"type": "number"},
+                "rooms": {"type": "number"},
+                "floor": {"type": "string"},
+                "description": {"type": "string"},
+                "seller_rating": {"type": "number"},
+                "views": {"type": "number"}
+            },
+            "required": ["title", "price", "location"]
+        }
+    },
+    "pagination": {
+        "type": "object",
+        "properties": {
+            "next_page": {"type": "string"},
+            "total_pages": {"type": "number"}
+        }
+    }
+}
+
+# Scraping parameters sent to the Firecrawl API
+FIRECRAWL_PARAMS = {
+    "pageOptions": {
+        "onlyMainContent": False,
+    },
+    "extractorOptions": {
+        "extractionSchema": FIRECRAWL_LISTING_SCHEMA
+    },
+    "timeout": 50000,  # 50 seconds timeout
+}
+
+def _resolve_api_key(api_key):
+    """
+    Returns the user-provided Firecrawl API key or the one from the environment
+    """
+    if api_key:
+        logger.info("Using user-provided API key")
+        return api_key
+    api_key = os.environ.get("FIRECRAWL_API_KEY")
+    if api_key:
+        logger.info("Using API key from environment variables")
+    return api_key
+
+def _is_firecrawl_result(scraped_data):
+    return bool(scraped_data) and isinstance(scraped_data, dict) and 'listings' in scraped_data
+
+def _no_progress(stage, **fields):
+    """
+    Progress callback used when the caller does not track progress
+    """
+
+def extract_avito_data_from_page(html, progress=_no_progress):
+    """
+    Extracts structured listing data from a downloaded Avito page
+    
+    Listing cards are read from the HTML first; the trafilatura text content is used
+    when no cards could be read.
+    
+    Args:
+        html (str): Page HTML
+        progress (callable, optional): Called as progress(stage, **fields) when a stage starts or ends
+        
+    Returns:
+        tuple: (structured_data, source) where source is 'html' or 'trafilatura',
+            or (None, None) if nothing could be extracted
+    """
+    # Read listing cards straight from the HTML first
+    if html and HTML_EXTRACTION_ENABLED:
+        progress('extract_html')
+        structured_data = extract_avito_listings_from_html(html)
+        if structured_data:
+            logger.info(f"Extracted {len(structured_data['listings'])} listings from page HTML")
+            progress('extract_html', listings_extracted=len(structured_data['listings']))
+            return structured_data, "html"
+        logger.info("HTML extraction failed, falling back to text extraction")
+    
+    # Fall back to the text content of the webpage when no listing cards could be read
+    if html:
+        progress('extract_text', fallback='text')
+    text_content = extract_text_content(html) if html else None
+    if not text_content:
+        logger.error("Failed to extract content with trafilatura")
+        return None, None
+    
+    # Extract listings from the text content
+    structured_data = extract_avito_listings_from_text(text_content)
+    if structured_data and 'listings' in structured_data:
+        logger.info(f"Extracted {len(structured_data['listings'])} listings using trafilatura")
+        progress('extract_text', listings_extracted=len(structured_data['listings']))
+        return structured_data, "trafilatura"
+    
+    logger.error("Failed to extract structured data from content")
+    return None, None
+
+def demo_data():
+    """
+    Returns demo listing data used when no real data could be scraped
+    """
+    logger.warning("Using demo data as fallback")
+    return {
+        "listings": [
+            {
+                "title": "2-комн. квартира, 60 м², 5/9 эт.",
+                "price": 5200000,
+                "location": "Москва, ул. Примерная, 123",
+                "area": 60,
+                "rooms": 2,
+                "floor": "5/9",
+                "description": "Просторная квартира в хорошем состоянии",
+                "seller_rating": 4.8,
+                "views": 245
+            },
+            {
+                "title": "1-комн. квартира, 42 м², 3/12 эт.",
+                "price": 3800000,
+                "location": "Москва, ул. Образцовая, 45",
+                "area": 42,
+                "rooms": 1,
+                "floor": "3/12",
+                "description": "Уютная квартира после ремонта",
+                "seller_rating": 4.5,
+                "views": 178
             }
+        ],
+        "pagination": {
+            "next_page": "page_2",
+            "total_pages": 10
         }
+    }
+
+def fetch_avito_data(url, api_key=None, progress=_no_progress, validators=None):
+    """
+    Retrieves structured listing data for an Avito URL without storing it
+    
+    Tries the Firecrawl API first, then the page download, and finally falls back to demo data.
+    
+    Args:
+        url (str): URL of the Avito real estate listing page
+        api_key (str, optional): Firecrawl API key provided by user
+        progress (callable, optional): Called as progress(stage, **fields) when a stage starts or ends
+        validators (fetcher.Validators, optional): Validators of the previous download of the
+            page, which make the download conditional
         
-        # Log extraction results
-        if listings:
-            logger.info(f"Successfully extracted {len(listings)} listings")
-            for i, listing in enumerate(listings[:3]):
-                logger.info(f"Sample {i+1}: {listing['title']} - {listing['price']}₽")
+    Returns:
+        tuple: (structured_data, source) where source is one of
+            'firecrawl', 'html', 'trafilatura' or 'demo'. When listings were extracted from a
+            downloaded page, structured_data['fetch'] holds the fetcher.Page of the download.
+    
+    Raises:
+        NotModified: If the page did not change since the download validators belong to
+    """
+    logger.info(f"Starting scraping for URL: {url}")
+    
+    # If no API key provided in function parameter, try to get from environment variables
+    api_key = _resolve_api_key(api_key)
+    
+    # Define structured data container and the method that produced it
+    structured_data = None
+    source = None
+    
+    # Try to use Firecrawl if API key is available
+    if api_key:
+        try:
+            logger.info("Attempting to use Firecrawl API")
+            
+            # Initialize Firecrawl with API key
+            firecrawl = FirecrawlApp(apiKey=api_key)
+            
+            # Try synchronous method first for simplicity
+            try:
+                logger.info("Using Firecrawl API with synchronous method")
+                progress('firecrawl')
+                scraped_data = firecrawl.scrapeUrlSync(url, FIRECRAWL_PARAMS)
                 
-            if len(listings) > 3:
-                logger.info(f"And {len(listings)-3} more listings...")
-        else:
-            logger.warning("No listings extracted from text")
+                if _is_firecrawl_result(scraped_data):
+                    structured_data = scraped_data
+                    source = "firecrawl"
+                    progress('firecrawl', pages_fetched=1, listings_extracted=len(scraped_data.get('listings', [])))
+                    logger.info(f"Successfully retrieved {len(scraped_data.get('listings', []))} listings using Firecrawl API")
+                else:
+                    logger.warning("Firecrawl API returned invalid data format")
+                    
+                    # Try async method as fallback
+                    try:
+                        logger.info("Trying asynchronous method as fallback")
+                        progress('firecrawl', fallback='firecrawl_async')
+                        
+                        # Run the async API call on its own event loop
+                        loop = asyncio.new_event_loop()
+                        asyncio.set_event_loop(loop)
+                        scraped_data = loop.run_until_complete(firecrawl.scrapeUrl(url, FIRECRAWL_PARAMS))
+                        loop.close()
+                        
+                        if _is_firecrawl_result(scraped_data):
+                            structured_data = scraped_data
+                            source = "firecrawl"
+                            progress('firecrawl', pages_fetched=1, listings_extracted=len(scraped_data.get('listings', [])))
+                            logger.info(f"Successfully retrieved {len(scraped_data.get('listings', []))} listings using Firecrawl API async")
+                        else:
+                            logger.warning("Firecrawl API async returned invalid data format, falling back to trafilatura")
+                    
+                    except Exception as e:
+                        logger.error(f"Failed to use Firecrawl API async: {str(e)}")
+                        logger.warning("Falling back to trafilatura method due to Firecrawl async error")
+            
+            except Exception as e:
+                logger.error(f"Failed to use Firecrawl API sync: {str(e)}")
+                logger.warning("Falling back to trafilatura method due to Firecrawl sync error")
+        except Exception as e:
+            logger.error(f"Error using Firecrawl API: {str(e)}")
+            # We'll fall back to trafilatura
+    else:
+        logger.warning("Firecrawl API key not found, using fallback scraping method.")
+    
+    # Download the page as a fallback method or primary method if Firecrawl not available
+    if not structured_data:
+        logger.info("Downloading the page to scrape content")
+        progress('download', fallback='trafilatura' if api_key else None)
+        page = None
+        try:
+            page = fetch_page(url, validators)
+            progress('download', pages_fetched=1, bytes_transferred=page.bytes_transferred)
+        except Exception as e:
+            logger.error(f"Error downloading page: {str(e)}")
+        
+        # The previous scrape of an unchanged page is still current, so nothing is extracted
+        if page is not None and page.status == 304 and validators:
+            raise NotModified(validators, page)
         
-        return structured_data
+        structured_data, source = extract_avito_data_from_page(page.html if page else None, progress)
+        if structured_data:
+            structured_data['fetch'] = page
+    
+    # If both methods failed, use demo data
+    if not structured_data or not structured_data.get('listings'):
+        structured_data, source = demo_data(), "demo"
+        progress('demo', fallback='demo', listings_extracted=len(structured_data['listings']))
+    
+    return structured_data, source
+
+async def fetch_page_async(url, session, validators=None):
+    """
+    Download a web page without blocking the event loop
     
+    Redirects are followed one by one so that, like trafilatura downloads, every hop is
+    checked against non-public addresses unless SSRF protection is switched off in the
+    trafilatura configuration. With validators the request is conditional, as in fetch_page.
+    
+    Args:
+        url (str): URL of the website to scrape
+        session (aiohttp.ClientSession): Session whose connection pool is used
+        validators (fetcher.Validators, optional): Validators of the previous download
+        
+    Returns:
+        fetcher.Page: Download result, with html None unless the final status is 200, or
+            None if the download failed. Without a Content-Length header the transferred
+            size is taken as the decoded size.
+    """
+    headers = dict({"User-Agent": USER_AGENT}, **(validators.headers() if validators else {}))
+    started = time.perf_counter()
+    transferred = 0
+    try:
+        for _ in range(ASYNC_MAX_REDIRECTS + 1):
+            await check_public_host_async(url)
+            async with session.get(url, headers=headers, allow_redirects=False) as response:
+                location = response.headers.get("Location")
+                if response.status in (301, 302, 303, 307, 308) and location:
+                    transferred += int(response.headers.get("Content-Length", 0))
+                    url = urljoin(url, location)
+                    continue
+                if response.status not in (200, 304):
+                    logger.error(f"Page download failed with status {response.status}: {url}")
+                body = await response.read()
+                return Page(
+                    url=url,
+                    status=response.status,
+                    html=await response.text() if response.status == 200 and body else None,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                    content_encoding=response.headers.get("Content-Encoding"),
+                    bytes_transferred=transferred + int(response.headers.get("Content-Length", len(body))),
+                    bytes_decoded=len(body),
+                    elapsed=time.perf_counter() - started
+                )
+        logger.error(f"Too many redirects: {url}")
+        return None
     except Exception as e:
-        logger.error(f"Error extracting listings from text: {str(e)}")
-        return {
-            "listings": [],
-            "pagination": {
-                "next_page": None,
-                "total_pages": None
-            }
-        }
+        logger.error(f"Error downloading page: {str(e)}")
+        return None
 
-def scrape_avito_data(url, api_key=None):
+async def fetch_avito_data_async(url, api_key=None, session=None, validators=None):
+    """
+    Async version of fetch_avito_data for use inside an event loop
+    
+    Network calls go through aiohttp and page parsing runs in the default executor, so
+    many URLs can be fetched concurrently on one event loop.
+    
+    Args:
+        url (str): URL of the Avito real estate listing page
+        api_key (str, optional): Firecrawl API key provided by user
+        session (aiohttp.ClientSession, optional): Shared session; a temporary one is used if not given
+        validators (fetcher.Validators, optional): Validators of the previous download of the
+            page, which make the download conditional
+        
+    Returns:
+        tuple: (structured_data, source) as returned by fetch_avito_data, including the
+            download in structured_data['fetch']
+    
+    Raises:
+        NotModified: If the page did not change since the download validators belong to
+    """
+    if session is None:
+        async with aiohttp.ClientSession() as session:
+            return await fetch_avito_data_async(url, api_key, session, validators)
+    
+    logger.info(f"Starting async scraping for URL: {url}")
+    api_key = _resolve_api_key(api_key)
+    loop = asyncio.get_running_loop()
+    
+    if api_key:
+        scraped_data = await FirecrawlApp(apiKey=api_key).scrapeUrl(url, FIRECRAWL_PARAMS, session=session)
+        if _is_firecrawl_result(scraped_data) and scraped_data.get('listings'):
+            logger.info(f"Successfully retrieved {len(scraped_data['listings'])} listings using Firecrawl API async")
+            return scraped_data, "firecrawl"
+        logger.warning("Firecrawl API async returned invalid data format, falling back to page download")
+    else:
+        logger.warning("Firecrawl API key not found, using fallback scraping method.")
+    
+    page = await fetch_page_async(url, session, validators)
+    # The previous scrape of an unchanged page is still current, so nothing is extracted
+    if page is not None and page.status == 304 and validators:
+        raise NotModified(validators, page)
+    if page is not None and page.html:
+        structured_data, source = await loop.run_in_executor(None, extract_avito_data_from_page, page.html)
+        if structured_data and structured_data.get('listings'):
+            structured_data['fetch'] = page
+            return structured_data, source
+    
+    return demo_data(), "demo"
+
+def scrape_avito_data(url, api_key=None, progress=_no_progress, fetch=None):
     """
     Scrapes real estate data from Avito using either Firecrawl API or trafilatura as fallback
     
+    Concurrent calls for the same URL, also from other worker processes, are coalesced: one
+    of them scrapes and the others wait for its data_id. A call within SCRAPE_FRESHNESS_SECONDS
+    after a scrape of the URL finished reuses that scrape (see singleflight.py).
+    
+    Progress is reported through the progress callback: the running stage ('waiting',
+    'firecrawl', 'download', 'extract_html', 'extract_text', 'demo', 'storing'), pages fetched,
+    listings extracted and stored so far and the active fallback. The last call has stage
+    'done' (with data_id and listing_count) or 'error' (with error).
+    
     Args:
         url (str): URL of the Avito real estate listing page
         api_key (str, optional): Firecrawl API key provided by user
+        progress (callable, optional): Called as progress(stage, **fields)
+        fetch (callable, optional): Replaces fetch_avito_data, called with the same arguments
+            (url, api_key, progress, validators), e.g. to download on an event loop
         
     Returns:
         dict: Result of the scraping operation with keys:
             - success (bool): Whether the scraping was successful
             - data_id (int, optional): ID of the stored data if successful
             - error (str, optional): Error message if unsuccessful
+            - deduplicated (str, optional): 'in_flight' or 'fresh' if the result of another
+              call was returned
     """
+    progress('started')
     try:
-        logger.info(f"Starting scraping for URL: {url}")
-        
-        # If no API key provided in function parameter, try to get from environment variables
-        if not api_key:
-            api_key = os.environ.get("FIRECRAWL_API_KEY")
-            if api_key:
-                logger.info("Using API key from environment variables")
-        else:
-            logger.info("Using user-provided API key")
-        
-        # Define structured data container
-        structured_data = None
-        
-        # Try to use Firecrawl if API key is available
-        if api_key:
-            try:
-                logger.info("Attempting to use Firecrawl API")
-                
-                # Define the schema for property listings
-                listing_schema = {
-                    "listings": {
-                        "type": "array",
-                        "items": {
-                            "type": "object",
-                            "properties": {
-                                "title": {"type": "string"},
-                                "price": {"type": "number"},
-                                "location": {"type": "string"},
-                                "area": {"type": "number"},
-                                "rooms": {"type": "number"},
-                                "floor": {"type": "string"},
-                                "description": {"type": "string"},
-                                "seller_rating": {"type": "number"},
-                                "views": {"type": "number"}
-                            },
-                            "required": ["title", "price", "location"]
-                        }
-                    },
-                    "pagination": {
-                        "type": "object",
-                        "properties": {
-                            "next_page": {"type": "string"},
-                            "total_pages": {"type": "number"}
-                        }
-                    }
-                }
-                
-                # Initialize Firecrawl with API key
-                firecrawl = FirecrawlApp(apiKey=api_key)
-                
-                # Configure scraping parameters
-                params = {
-                    "pageOptions": {
-                        "onlyMainContent": False,
-                    },
-                    "extractorOptions": {
-                        "extractionSchema": listing_schema
-                    },
-                    "timeout": 50000,  # 50 seconds timeout
-                }
-                
-                # Try synchronous method first for simplicity
-                try:
-                    logger.info("Using Firecrawl API with synchronous method")
-                    scraped_data = firecrawl.scrapeUrlSync(url, params)
-                    
-                    if scraped_data and isinstance(scraped_data, dict) and 'listings' in scraped_data:
-                        structured_data = scraped_data
-                        logger.info(f"Successfully retrieved {len(scraped_data.get('listings', []))} listings using Firecrawl API")
-                    else:
-                        logger.warning("Firecrawl API returned invalid data format")
-                        
-                        # Try async method as fallback
-                        try:
-                            logger.info("Trying asynchronous method as fallback")
-                            import asyncio
-                            
-                            # Define an async function to run the API call
-                            async def run_firecrawl():
-                                try:
-                                    result = await firecrawl.scrapeUrl(url, params)
-                                    return result
-                                except Exception as e:
-                                    logger.error(f"Error in Firecrawl API call: {str(e)}")
-                                    return None
-                            
-                            # Run the async function
-                            loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(loop)
-                            scraped_data = loop.run_until_complete(run_firecrawl())
-                            loop.close()
-                            
-                            if scraped_data and isinstance(scraped_data, dict) and 'listings' in scraped_data:
-                                structured_data = scraped_data
-                                logger.info(f"Successfully retrieved {len(scraped_data.get('listings', []))} listings using Firecrawl API async")
-                            else:
-                                logger.warning("Firecrawl API async returned invalid data format, falling back to trafilatura")
-                        
-                        except Exception as e:
-                            logger.error(f"Failed to use Firecrawl API async: {str(e)}")
-                            logger.warning("Falling back to trafilatura method due to Firecrawl async error")
-                
-                except Exception as e:
-                    logger.error(f"Failed to use Firecrawl API sync: {str(e)}")
-                    logger.warning("Falling back to trafilatura method due to Firecrawl sync error")
-            except Exception as e:
-                logger.error(f"Error using Firecrawl API: {str(e)}")
-                # We'll fall back to trafilatura
-        else:
-            logger.warning("Firecrawl API key not found, using fallback scraping method.")
+        return run_single_flight(url, lambda: _scrape_and_store(url, api_key, progress, fetch), progress)
+    except Exception as e:
+        logger.error(f"Error coordinating scrape of {url}: {str(e)}")
+        db.session.rollback()
+        progress('error', error=str(e))
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+def _scrape_and_store(url, api_key, progress, fetch=None):
+    """
+    Fetches and stores one URL for scrape_avito_data
+    """
+    try:
+        structured_data, source = (fetch or fetch_avito_data)(url, api_key, progress, get_validators(url))
         
-        # Use trafilatura as a fallback method or primary method if Firecrawl not available
-        if not structured_data:
-            logger.info("Using trafilatura to scrape content")
-            # Get the text content from the webpage
-            text_content = get_website_text_content(url)
-            
-            if text_content:
-                # Extract listings from the text content
-                structured_data = extract_avito_listings_from_text(text_content)
-                if structured_data and 'listings' in structured_data:
-                    logger.info(f"Extracted {len(structured_data['listings'])} listings using trafilatura")
-                else:
-                    logger.error("Failed to extract structured data from content")
-                    structured_data = None
-            else:
-                logger.error("Failed to extract content with trafilatura")
+        # Save scraped data to database
+        progress('storing')
+        data_id = run_write(_store_scrape, url, structured_data, progress)
         
-        # If both methods failed, use demo data
-        if not structured_data or not structured_data.get('listings'):
-            logger.warning("Using demo data as fallback")
-            
-            # Demo data for testing functionality
-            structured_data = {
-                "listings": [
-                    {
-                        "title": "2-комн. квартира, 60 м², 5/9 эт.",
-                        "price": 5200000,
-                        "location": "Москва, ул. Примерная, 123",
-                        "area": 60,
-                        "rooms": 2,
-                        "floor": "5/9",
-                        "description": "Просторная квартира в хорошем состоянии",
-                        "seller_rating": 4.8,
-                        "views": 245
-                    },
-                    {
-                        "title": "1-комн. квартира, 42 м², 3/12 эт.",
-                        "price": 3800000,
-                        "location": "Москва, ул. Образцовая, 45",
-                        "area": 42,
-                        "rooms": 1,
-                        "floor": "3/12",
-                        "description": "Уютная квартира после ремонта",
-                        "seller_rating": 4.5,
-                        "views": 178
-                    }
-                ],
-                "pagination": {
-                    "next_page": "page_2",
-                    "total_pages": 10
-                }
-            }
+        logger.info(f"Scraping completed successfully. Data ID: {data_id}")
+        progress('done', data_id=data_id, listing_count=len(structured_data['listings']), source=source)
         
-        # Save scraped data to database
-        new_data = ScrapedData(
-            url=url,
-            data=json.dumps(structured_data)
-        )
-        db.session.add(new_data)
-        db.session.commit()
+        return {
+            "success": True,
+            "data_id": data_id
+        }
         
-        logger.info(f"Scraping completed successfully. Data ID: {new_data.id}")
+    except NotModified as e:
+        # The page did not change since its last scrape, which stays the current one
+        run_write(record_fetch, url, e.page, e.data_id)
+        summary = load_summary(e.data_id)
+        logger.info(f"Page not modified, reusing Data ID: {e.data_id}")
+        progress('done', data_id=e.data_id, listing_count=summary['listing_count'] if summary else 0,
+                 source='not_modified')
         
         return {
             "success": True,
-            "data_id": new_data.id
+            "data_id": e.data_id,
+            "not_modified": True
         }
         
     except Exception as e:
         logger.error(f"Error during scraping: {str(e)}")
+        db.session.rollback()
+        progress('error', error=str(e))
         return {
             "success": False,
             "error": str(e)
         }
+
+def _store_scrape(url, structured_data, progress=_no_progress):
+    """
+    Stores scraped listings together with the record of the page download they came from
+    
+    Returns:
+        int: ID of the stored data
+    """
+    row = store_listings(
+        url, structured_data['listings'], structured_data.get('pagination'),
+        on_batch=lambda stored: progress('storing', listings_stored=stored)
+    )
+    if structured_data.get('fetch') is not None:
+        record_fetch(url, structured_data['fetch'], row.id)
+    return row.id
+
+def scrape_avito_data_summary(url, api_key=None, fetch=None):
+    """
+    Runs scrape_avito_data for one URL and summarizes the outcome as scrape_avito_data_bulk
+    reports it; must be called inside an app context
+    
+    Args:
+        url (str): URL of the Avito real estate listing page
+        api_key (str, optional): Firecrawl API key provided by user
+        fetch (callable, optional): Replacement of fetch_avito_data, see scrape_avito_data
+        
+    Returns:
+        dict: Summary in the format of the entries of scrape_avito_data_bulk
+    """
+    started = time.perf_counter()
+    outcome = {}
+    
+    def progress(stage, **fields):
+        if stage in ('done', 'error'):
+            outcome.update(fields)
+    
+    scraped = scrape_avito_data(url, api_key, progress, fetch)
+    result = {
+        "url": url,
+        "status": "success" if scraped['success'] else "error",
+        "source": outcome.get('source'),
+        "listing_count": outcome.get('listing_count', 0),
+        "data_id": scraped.get('data_id'),
+        "elapsed": round(time.perf_counter() - started, 3)
+    }
+    if not scraped['success']:
+        result["error"] = scraped['error']
+    if scraped.get('deduplicated'):
+        result["deduplicated"] = scraped['deduplicated']
+    return result
+
+def bulk_concurrency(payload, max_concurrency):
+    """
+    Returns the concurrency requested for a bulk scrape, capped at max_concurrency
+    
+    Args:
+        payload (dict): JSON body of the bulk request; concurrency is optional
+        max_concurrency (int): Configured limit, also the default
+        
+    Returns:
+        int: Number of URLs to scrape at the same time
+        
+    Raises:
+        ValueError: If concurrency is not a positive integer
+    """
+    concurrency = payload.get('concurrency', max_concurrency)
+    # JSON true and false arrive as bool, which is a subclass of int
+    if isinstance(concurrency, bool) or not isinstance(concurrency, int) or concurrency < 1:
+        raise ValueError('"concurrency" must be a positive integer')
+    return min(concurrency, max_concurrency)
+
+class _BulkWriter:
+    """
+    Collects the writes of a bulk scrape and commits them in batches
+
+    Workers submit writes, which wait until batch_size are queued, until the bulk scrape ends
+    or, while a worker waits for another caller's scrape of its URL (whose result may be one
+    of the queued writes), until the next flush. The queued writes then run in order as one run_write call, so they
+    share one transaction whether or not the write queue is on.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self._pending = []
+        self._lock = threading.Lock()
+        self._waiters = 0
+        self._flush_requested = threading.Event()
+
+    def submit(self, function, *args):
+        """
+        Queues a write, called like run_write
+
+        Returns:
+            concurrent.futures.Future: Result of function, set after its batch is committed
+        """
+        future = Future()
+        with self._lock:
+            self._pending.append((future, function, args))
+            if len(self._pending) >= self.batch_size or self._waiters:
+                self._flush_requested.set()
+        return future
+
+    def add_waiter(self):
+        """Flushes queued and later writes without waiting for a full batch until remove_waiter"""
+        with self._lock:
+            self._waiters += 1
+            self._flush_requested.set()
+
+    def remove_waiter(self):
+        with self._lock:
+            self._waiters -= 1
+
+    def wait(self, timeout):
+        """Waits up to timeout seconds for a flush request; returns whether one was made"""
+        return self._flush_requested.wait(timeout)
+
+    def flush(self):
+        """
+        Runs and commits the queued writes on the calling thread
+
+        If the batch fails, its writes are retried one by one, so one bad write does not fail
+        the others.
+        """
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self._flush_requested.clear()
+        if not batch:
+            return
+
+        try:
+            results = run_write(lambda: [function(*args) for _, function, args in batch])
+        except Exception as e:
+            logger.warning(f"Bulk scraping batch failed, retrying {len(batch)} writes one by one: {str(e)}")
+        else:
+            for (future, _, _), result in zip(batch, results):
+                future.set_result(result)
+            return
+
+        for future, function, args in batch:
+            try:
+                future.set_result(run_write(function, *args))
+            except Exception as e:
+                future.set_exception(e)
+
+def _bulk_scrape(url, api_key, writer):
+    """
+    Scrapes one URL of scrape_avito_data_bulk in a worker thread with its own app context
+
+    The scrape is coalesced with other scrapes of the URL like scrape_avito_data, but the
+    stored data and the result of the flight are added to the writer's batch.
+
+    Returns:
+        tuple: (summary, future) where future yields the ID of the stored data once its batch
+            is committed, or None if nothing was stored
+    """
+    started = time.perf_counter()
+    summary = {"url": url, "status": "success", "source": None, "listing_count": 0, "data_id": None}
+    stored = []
+    waiting = []
+
+    def progress(stage, **fields):
+        if stage == 'waiting':
+            writer.add_waiter()
+            waiting.append(True)
+        elif stage == 'done':
+            summary.update(source=fields.get('source'), listing_count=fields.get('listing_count', 0))
+
+    def scrape():
+        try:
+            structured_data, source = fetch_avito_data(url, api_key, validators=get_validators(url))
+        except NotModified as e:
+            writer.submit(record_fetch, url, e.page, e.data_id)
+            scraped = load_summary(e.data_id)
+            summary.update(source='not_modified', listing_count=scraped['listing_count'] if scraped else 0)
+            return {"success": True, "data_id": e.data_id, "not_modified": True}
+        except Exception as e:
+            logger.error(f"Error during bulk scraping of {url}: {str(e)}")
+            return {"success": False, "error": str(e)}
+
+        summary.update(source=source, listing_count=len(structured_data['listings']))
+        # The flight result is written after the data in the same batch and reads its ID then
+        result = {"success": True}
+
+        def store():
+            try:
+                result["data_id"] = _store_scrape(url, structured_data)
+            except Exception as e:
+                result.update(success=False, error=f"Database error: {str(e)}")
+                raise
+            return result["data_id"]
+
+        stored.append(writer.submit(store))
+        return result
+
+    with app.app_context():
+        try:
+            result = run_single_flight(url, scrape, progress, writer.submit)
+        except Exception as e:
+            logger.error(f"Error coordinating bulk scrape of {url}: {str(e)}")
+            db.session.rollback()
+            result = {"success": False, "error": str(e)}
+        finally:
+            if waiting:
+                writer.remove_waiter()
+
+    if not result['success']:
+        summary.update(status="error", error=result['error'])
+    summary["data_id"] = result.get('data_id')
+    if result.get('deduplicated'):
+        summary["deduplicated"] = result['deduplicated']
+    summary["elapsed"] = round(time.perf_counter() - started, 3)
+    return summary, stored[0] if stored else None
+
+def scrape_avito_data_bulk(urls, api_key=None, max_workers=4, batch_size=50):
+    """
+    Scrapes many Avito URLs with bounded concurrency and stores them in batched transactions
+    
+    Every URL is fetched in a thread pool of at most max_workers threads and coalesced with
+    other scrapes of the same URL, as scrape_avito_data does, including repeats within the
+    request. The stored data and the results recorded for coalescing are committed on the
+    calling thread, batch_size writes per transaction.
+    
+    Args:
+        urls (list): URLs of Avito real estate listing pages
+        api_key (str, optional): Firecrawl API key provided by user
+        max_workers (int, optional): Maximum number of URLs scraped at the same time
+        batch_size (int, optional): Number of writes per database transaction
+        
+    Returns:
+        list: One summary per URL, in input order, with keys:
+            - url (str): The requested URL
+            - status (str): 'success' or 'error'
+            - source (str): 'firecrawl', 'html', 'trafilatura' or 'demo' for the method the
+              listings were extracted with, 'not_modified' if the page did not change since its
+              last scrape, which is reused, or 'shared' if another scrape of the URL was reused
+            - listing_count (int): Number of extracted listings
+            - data_id (int): ID of the stored data, None on error
+            - elapsed (float): Seconds spent scraping the URL, without waiting for the commit
+            - error (str, optional): Error message if unsuccessful
+            - deduplicated (str, optional): 'in_flight' or 'fresh' if another scrape was reused
+    """
+    logger.info(f"Starting bulk scraping for {len(urls)} URLs with {max_workers} workers")
+    
+    writer = _BulkWriter(batch_size)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_bulk_scrape, url, api_key, writer) for url in urls]
+        while not all(future.done() for future in futures):
+            if writer.wait(SCRAPE_WAIT_INTERVAL):
+                writer.flush()
+        writer.flush()
+    
+    results = []
+    for future in futures:
+        summary, stored = future.result()
+        if stored is not None:
+            try:
+                summary["data_id"] = stored.result()
+            except Exception as e:
+                summary.update(status="error", data_id=None, error=f"Database error: {str(e)}")
+        results.append(summary)
+    
+    succeeded = sum(1 for r in results if r["status"] == "success")
+    logger.info(f"Bulk scraping completed: {succeeded} of {len(urls)} URLs succeeded")
+    
+    return results
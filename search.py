@@ -0,0 +1,197 @@
+import os
+import logging
+import numpy as np
+from models import ScrapedData
+from storage import iter_listing_records
+from listing import listing_columns
+from cache import BoundedCache
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Numeric fields that support range filters and sorting
+RANGE_FIELDS = ('price', 'area', 'floor')
+
+# Categorical fields that support facet filters and facet counts
+FACET_FIELDS = ('rooms', 'city')
+
+# Location placeholder used by the text extractor when no address is found
+UNKNOWN_LOCATION = "Адрес не указан"
+
+def extract_city(location):
+    """
+    Extracts the city from a location string such as "Москва, ул. Примерная, 123"
+
+    Args:
+        location (str): Location string of a listing
+
+    Returns:
+        str: City name or None if the location is unknown
+    """
+    if not location or not isinstance(location, str) or location == UNKNOWN_LOCATION:
+        return None
+    city = location.split(',')[0].strip()
+    return city or None
+
+class ListingIndex:
+    """
+    In-memory search index over the listings of one scraped dataset
+
+    Range fields are kept as value arrays sorted once with argsort, so a range filter is two
+    binary searches. Facet fields are kept as one boolean bitmap per distinct value, so facet
+    filters and facet counts are vectorized AND/OR operations over the listings.
+    """
+
+    def __init__(self, listings):
+        """
+        Args:
+            listings (list): Listing records, kept by the index and converted to dictionaries for hits
+        """
+        self.listings = listings
+        self.size = len(listings)
+
+        # For each range field: row positions sorted by value (missing values excluded) and the sorted values
+        self.sorted_positions = {}
+        self.sorted_values = {}
+        for field, values in listing_columns(listings, RANGE_FIELDS).items():
+            positions = np.flatnonzero(~np.isnan(values))
+            order = positions[np.argsort(values[positions], kind='stable')]
+            self.sorted_positions[field] = order
+            self.sorted_values[field] = values[order]
+
+        facet_columns = {
+            'rooms': [None if listing.rooms is None else str(listing.rooms) for listing in listings],
+            'city': [listing.city or extract_city(listing.location) for listing in listings]
+        }
+
+        # For each facet field: distinct value -> boolean bitmap of matching rows
+        self.bitmaps = {}
+        for field, values in facet_columns.items():
+            column = np.array(values, dtype=object)
+            self.bitmaps[field] = {
+                value: column == value
+                for value in set(values) if value is not None
+            }
+
+        logger.info(f"Built listing index over {self.size} listings")
+
+    def range_mask(self, field, lower=None, upper=None):
+        """
+        Returns a bitmap of rows whose field value lies in [lower, upper]
+        """
+        values = self.sorted_values[field]
+        start = 0 if lower is None else np.searchsorted(values, lower, side='left')
+        end = len(values) if upper is None else np.searchsorted(values, upper, side='right')
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.sorted_positions[field][start:end]] = True
+        return mask
+
+    def facet_mask(self, field, values):
+        """
+        Returns a bitmap of rows whose facet value is any of values
+        """
+        mask = np.zeros(self.size, dtype=bool)
+        for value in values:
+            bitmap = self.bitmaps[field].get(value)
+            if bitmap is not None:
+                mask |= bitmap
+        return mask
+
+    def search(self, ranges=None, facets=None, sort=None, descending=False, page=1, per_page=20):
+        """
+        Filters, sorts and paginates the listings
+
+        Facet counts are disjunctive: the counts of a facet field take every filter into
+        account except that field's own selection, so alternative values stay visible.
+
+        Args:
+            ranges (dict, optional): Field -> (lower, upper) bounds, either bound may be None
+            facets (dict, optional): Field -> list of accepted values
+            sort (str, optional): Range field to sort by; input order if not given
+            descending (bool, optional): Whether to sort in descending order
+            page (int, optional): 1-based page number
+            per_page (int, optional): Number of hits per page
+
+        Returns:
+            dict: Search result with keys total, page, per_page, hits and facets
+        """
+        ranges = ranges or {}
+        facets = facets or {}
+
+        base_mask = np.ones(self.size, dtype=bool)
+        for field, (lower, upper) in ranges.items():
+            if lower is not None or upper is not None:
+                base_mask &= self.range_mask(field, lower, upper)
+
+        facet_masks = {field: self.facet_mask(field, values) for field, values in facets.items() if values}
+
+        mask = base_mask.copy()
+        for facet_mask in facet_masks.values():
+            mask &= facet_mask
+
+        facet_counts = {}
+        for field in FACET_FIELDS:
+            context = base_mask.copy()
+            for other, facet_mask in facet_masks.items():
+                if other != field:
+                    context &= facet_mask
+            counts = {value: int(np.count_nonzero(bitmap & context)) for value, bitmap in self.bitmaps[field].items()}
+            facet_counts[field] = dict(sorted(
+                ((value, count) for value, count in counts.items() if count),
+                key=lambda item: (-item[1], item[0])
+            ))
+
+        if sort:
+            order = self.sorted_positions[sort]
+            ordered = order[mask[order]]
+            if descending:
+                ordered = ordered[::-1]
+            # Listings without a value for the sort field go last
+            missing = np.ones(self.size, dtype=bool)
+            missing[order] = False
+            positions = np.concatenate([ordered, np.flatnonzero(mask & missing)])
+        else:
+            positions = np.flatnonzero(mask)
+
+        start = (page - 1) * per_page
+        hits = []
+        for position in positions[start:start + per_page]:
+            hit = self.listings[position].to_dict(include_description=False)
+            hit['index'] = int(position)
+            hits.append(hit)
+
+        return {
+            'total': int(len(positions)),
+            'page': page,
+            'per_page': per_page,
+            'hits': hits,
+            'facets': facet_counts
+        }
+
+# Search indexes per data_id, built on first query
+_index_cache = BoundedCache(maxsize=int(os.environ.get("SEARCH_INDEX_CACHE_SIZE", 16)))
+
+def get_listing_index(data_id):
+    """
+    Returns the search index of a scraped dataset, building and caching it on first use
+
+    Args:
+        data_id (int): ID of the scraped data
+
+    Returns:
+        ListingIndex: Index over the dataset listings, or None if the data does not exist
+    """
+    def build():
+        scraped_data = ScrapedData.query.get(data_id)
+        if not scraped_data:
+            return None
+        return ListingIndex(list(iter_listing_records(scraped_data)))
+
+    return _index_cache.get_or_create(data_id, build)
+
+def evict_listing_index(data_id):
+    """
+    Removes the cached search index of a scraped dataset
+    """
+    _index_cache.pop(data_id)
@@ -0,0 +1,195 @@
+import os
+import time
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from sqlalchemy.dialects import sqlite, postgresql
+from app import db
+from models import ScrapedData, ScrapeFlight
+from storage import load_summary
+from write_queue import run_write
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Seconds during which a finished scrape of a URL is returned instead of scraping it again
+SCRAPE_FRESHNESS_SECONDS = float(os.environ.get("SCRAPE_FRESHNESS_SECONDS", 60))
+
+# Seconds after which a running scrape is considered dead and another caller takes over
+SCRAPE_LOCK_TIMEOUT = float(os.environ.get("SCRAPE_LOCK_TIMEOUT", 300))
+
+# Seconds between checks while waiting for a running scrape
+SCRAPE_WAIT_INTERVAL = 0.25
+
+# Dialects that can insert a row unless its unique key already exists
+_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+def normalize_url(url):
+    """
+    Returns the key under which scrapes of a URL are coalesced
+
+    Scheme and host are lowercased, the fragment and a trailing slash are dropped and query
+    parameters are sorted, so equivalent spellings of a search share one scrape.
+
+    Args:
+        url (str): URL as submitted
+
+    Returns:
+        str: Normalized URL
+    """
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ''))
+
+def _owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+def _claim(url_key, owner, now):
+    """
+    Makes owner the runner of the scrape of url_key, unless a live scrape or a fresh result exists
+
+    Returns:
+        bool: Whether the claim succeeded
+    """
+    table = ScrapeFlight.__table__
+    insert = _INSERTS.get(db.engine.dialect.name)
+    if insert is not None:
+        inserted = db.session.execute(
+            insert(table)
+            .values(url_key=url_key, status='running', owner=owner, started_at=now, joined=0, reused=0)
+            .on_conflict_do_nothing(index_elements=['url_key'])
+        ).rowcount
+        if inserted:
+            return True
+
+    # Take over a failed, stale, deleted or abandoned scrape
+    return db.session.execute(
+        table.update()
+        .where(
+            table.c.url_key == url_key,
+            db.or_(
+                table.c.status == 'error',
+                db.and_(table.c.status == 'done', table.c.finished_at < now - timedelta(seconds=SCRAPE_FRESHNESS_SECONDS)),
+                db.and_(table.c.status == 'done', ~db.exists().where(ScrapedData.id == table.c.data_id)),
+                db.and_(table.c.status == 'running', table.c.started_at < now - timedelta(seconds=SCRAPE_LOCK_TIMEOUT))
+            )
+        )
+        .values(status='running', owner=owner, started_at=now, finished_at=None, data_id=None, error=None)
+    ).rowcount == 1
+
+def _finish(url_key, owner, result):
+    """Records the result of a scrape, unless another caller has taken it over meanwhile"""
+    table = ScrapeFlight.__table__
+    db.session.execute(
+        table.update()
+        .where(table.c.url_key == url_key, table.c.owner == owner, table.c.status == 'running')
+        .values(
+            status='done' if result.get('success') else 'error',
+            data_id=result.get('data_id'),
+            error=result.get('error'),
+            finished_at=datetime.utcnow()
+        )
+    )
+
+def _count(url_key, counter):
+    """Increments the joined or reused counter of a URL"""
+    table = ScrapeFlight.__table__
+    db.session.execute(
+        table.update().where(table.c.url_key == url_key).values({counter: table.c[counter] + 1})
+    )
+
+def _read(url_key):
+    table = ScrapeFlight.__table__
+    return db.session.execute(db.select(table).where(table.c.url_key == url_key)).first()
+
+def _shared_result(flight, kind, progress):
+    """
+    Builds the result of a caller served by another caller's scrape
+    """
+    run_write(_count, flight.url_key, 'joined' if kind == 'in_flight' else 'reused')
+    if flight.status == 'error':
+        progress('error', error=flight.error)
+        return {"success": False, "error": flight.error, "deduplicated": kind}
+
+    summary = load_summary(flight.data_id)
+    progress('done', data_id=flight.data_id, listing_count=summary['listing_count'] if summary else 0,
+             source='shared')
+    return {"success": True, "data_id": flight.data_id, "deduplicated": kind}
+
+def run_single_flight(url, scrape, progress, write=run_write):
+    """
+    Runs scrape for url unless the same URL is being or was just scraped
+
+    Callers coordinate through ScrapeFlight rows, so this works across threads, worker
+    processes and hosts sharing the database. The first caller for a normalized URL runs the
+    scrape; callers arriving while it runs wait and receive its result; callers arriving
+    within SCRAPE_FRESHNESS_SECONDS after it finished receive that result immediately. A
+    scrape running longer than SCRAPE_LOCK_TIMEOUT is taken over by the next caller.
+
+    Args:
+        url (str): URL to scrape
+        scrape (callable): Function without arguments that scrapes and stores the URL and
+            returns a result dictionary as returned by scrape_avito_data
+        progress (callable): Progress callback, called with stage 'waiting' while the caller
+            waits and 'done' or 'error' when it receives another caller's result
+        write (callable, optional): Called like run_write to record the result of scrape;
+            bulk scrapes pass one that adds the write to their current batch
+
+    Returns:
+        dict: Result of scrape, or the shared result with key deduplicated set to 'in_flight'
+            (waited for a running scrape) or 'fresh' (reused a recent result)
+    """
+    url_key = normalize_url(url)
+    owner = _owner()
+    waited = False
+
+    while True:
+        now = datetime.utcnow()
+        flight = _read(url_key)
+
+        if flight is not None and flight.status != 'running':
+            fresh = flight.finished_at >= now - timedelta(seconds=SCRAPE_FRESHNESS_SECONDS)
+            # A waiting caller shares the outcome of the scrape it waited for, including errors
+            if waited and (flight.status == 'error' or db.session.get(ScrapedData, flight.data_id)):
+                return _shared_result(flight, 'in_flight', progress)
+            if flight.status == 'done' and fresh and db.session.get(ScrapedData, flight.data_id):
+                logger.info(f"Reusing scrape {flight.data_id} of {url_key}")
+                return _shared_result(flight, 'fresh', progress)
+
+        if flight is None or flight.status != 'running' \
+                or flight.started_at < now - timedelta(seconds=SCRAPE_LOCK_TIMEOUT):
+            if run_write(_claim, url_key, owner, now):
+                break
+            continue
+
+        if not waited:
+            logger.info(f"Waiting for the running scrape of {url_key}")
+            progress('waiting')
+            waited = True
+        time.sleep(SCRAPE_WAIT_INTERVAL)
+
+    result = {"success": False, "error": "Scrape stopped unexpectedly"}
+    try:
+        result = scrape()
+        return result
+    finally:
+        write(_finish, url_key, owner, result)
+
+def get_dedup_stats():
+    """
+    Returns how many scrape calls were served by another caller's scrape
+
+    Returns:
+        dict: Totals over all URLs with keys deduplicated, in_flight (waited for a running
+            scrape), fresh (reused a recent result) and urls (number of distinct URLs)
+    """
+    joined, reused, urls = db.session.query(
+        db.func.coalesce(db.func.sum(ScrapeFlight.joined), 0),
+        db.func.coalesce(db.func.sum(ScrapeFlight.reused), 0),
+        db.func.count(ScrapeFlight.id)
+    ).one()
+    return {'deduplicated': joined + reused, 'in_flight': joined, 'fresh': reused, 'urls': urls}
@@ -4,6 +4,100 @@ document.addEventListener('DOMContentLoaded', function() {
     const scrapingStatus = document.getElementById('scraping-status');
     const scrapeButton = document.getElementById('scrape-button');
     
+    const scrapingStage = document.getElementById('scraping-stage');
+    const scrapingProgress = document.getElementById('scraping-progress');
+    const scrapingDetails = document.getElementById('scraping-details');
+    const scrapeButtonHtml = scrapeButton ? scrapeButton.innerHTML : '';
+    
+    // Stage labels and approximate progress of a scrape job
+    const scrapeStages = {
+        'queued': ['Waiting to start...', 5],
+        'started': ['Starting scrape...', 10],
+        'waiting': ['Another request is scraping this page, waiting for its result...', 20],
+        'firecrawl': ['Fetching listings with Firecrawl API...', 30],
+        'download': ['Downloading the page...', 30],
+        'extract_html': ['Reading listings from the page...', 60],
+        'extract_text': ['Extracting listings from page text...', 60],
+        'demo': ['No listings found, using demo data...', 70],
+        'storing': ['Saving listings...', 85],
+        'done': ['Done', 100],
+        'error': ['Scraping failed', 100]
+    };
+    const fallbackLabels = {
+        'firecrawl_async': 'Firecrawl API (async retry)',
+        'trafilatura': 'page download (Firecrawl failed)',
+        'text': 'text extraction (no listing cards found)',
+        'demo': 'demo data'
+    };
+    
+    function showScrapeProgress(state) {
+        const stage = scrapeStages[state.stage] || [state.stage, 50];
+        if (scrapingStage) {
+            scrapingStage.textContent = state.stage === 'error' ? `${stage[0]}: ${state.error}` : stage[0];
+        }
+        if (scrapingProgress) {
+            scrapingProgress.style.width = `${stage[1]}%`;
+            scrapingProgress.classList.toggle('bg-danger', state.stage === 'error');
+        }
+        if (scrapingDetails) {
+            const details = [
+                `Pages fetched: ${state.pages_fetched || 0}`,
+                `Listings extracted: ${state.listings_extracted || 0}`
+            ];
+            if (state.listings_stored) {
+                details.push(`Saved: ${state.listings_stored}`);
+            }
+            if (state.fallback) {
+                details.push(`Fallback: ${fallbackLabels[state.fallback] || state.fallback}`);
+            }
+            scrapingDetails.textContent = details.join(' · ');
+        }
+    }
+    
+    function resetScrapeButton() {
+        if (scrapeButton) {
+            scrapeButton.disabled = false;
+            scrapeButton.innerHTML = scrapeButtonHtml;
+        }
+    }
+    
+    // Start a background scrape job and follow its progress through server-sent events
+    function startScrapeJob() {
+        fetch(scrapingForm.dataset.jobsUrl, { method: 'POST', body: new FormData(scrapingForm) })
+            .then(response => response.json().then(body => {
+                if (!response.ok) {
+                    throw new Error(body.error || `HTTP ${response.status}`);
+                }
+                return body;
+            }))
+            .then(job => {
+                showScrapeProgress(job.state);
+                const events = new EventSource(job.events_url);
+                events.onmessage = function(message) {
+                    const state = JSON.parse(message.data);
+                    showScrapeProgress(state);
+                    if (state.stage === 'done') {
+                        events.close();
+                        window.location.href = job.complete_url;
+                    } else if (state.stage === 'error') {
+                        events.close();
+                        resetScrapeButton();
+                    }
+                };
+                events.onerror = function() {
+                    // EventSource reconnects by itself unless the stream is gone for good
+                    if (events.readyState === EventSource.CLOSED) {
+                        showScrapeProgress({ stage: 'error', error: 'lost connection to the server' });
+                        resetScrapeButton();
+                    }
+                };
+            })
+            .catch(error => {
+                showScrapeProgress({ stage: 'error', error: error.message });
+                resetScrapeButton();
+            });
+    }
+    
     if (scrapingForm) {
         scrapingForm.addEventListener('submit', function(event) {
             // Show scraping status and disable button
@@ -14,6 +108,12 @@ document.addEventListener('DOMContentLoaded', function() {
                 scrapeButton.disabled = true;
                 scrapeButton.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Scraping...';
             }
+            
+            // Without EventSource support the form is submitted normally and blocks until done
+            if (window.EventSource && window.fetch && scrapingForm.dataset.jobsUrl) {
+                event.preventDefault();
+                startScrapeJob();
+            }
         });
     }
     
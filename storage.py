@@ -0,0 +1,453 @@
+import os
+import json
+import zlib
+import logging
+from itertools import islice
+from app import db
+from models import ScrapedData, ListingBatch, ListingDescriptions, ScrapeSummary
+from analyzer import SummaryAccumulator
+from listing import Listing
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Use zstd if the zstandard package is installed, zlib otherwise
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Number of descriptions compressed together in one ListingDescriptions row
+DESCRIPTION_CHUNK_SIZE = 500
+
+# Number of listings written together in one ListingBatch row
+LISTING_BATCH_SIZE = int(os.environ.get("LISTING_BATCH_SIZE", 500))
+
+def compress_texts(texts):
+    """
+    Compresses a list of strings into a single binary payload
+
+    Args:
+        texts (list): Strings (or None values) to compress
+
+    Returns:
+        tuple: (codec, payload, raw_size)
+    """
+    raw = json.dumps(texts, ensure_ascii=False).encode('utf-8')
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=3).compress(raw), len(raw)
+    return 'zlib', zlib.compress(raw, 6), len(raw)
+
+def decompress_texts(codec, payload):
+    """
+    Restores a list of strings compressed with compress_texts
+
+    Args:
+        codec (str): Codec the payload was compressed with
+        payload (bytes): Compressed payload
+
+    Returns:
+        list: Decompressed strings
+    """
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Descriptions are zstd-compressed but the zstandard package is not installed")
+        raw = zstandard.ZstdDecompressor().decompress(payload)
+    elif codec == 'zlib':
+        raw = zlib.decompress(payload)
+    else:
+        raise ValueError(f"Unknown compression codec: {codec}")
+    return json.loads(raw.decode('utf-8'))
+
+def split_descriptions(structured_data):
+    """
+    Separates listing descriptions from the rest of the structured data
+
+    Args:
+        structured_data (dict): Structured data with listings
+
+    Returns:
+        tuple: (hot_data, descriptions) where hot_data is a copy of structured_data whose
+            listings have no 'description' key, and descriptions is aligned with the listings
+    """
+    hot_listings = []
+    descriptions = []
+    for listing in structured_data.get('listings', []):
+        hot_listing = dict(listing)
+        descriptions.append(hot_listing.pop('description', None))
+        hot_listings.append(hot_listing)
+
+    hot_data = dict(structured_data)
+    hot_data['listings'] = hot_listings
+    return hot_data, descriptions
+
+def build_description_rows(descriptions, offset=0):
+    """
+    Compresses descriptions into chunked ListingDescriptions rows
+
+    Args:
+        descriptions (list): Descriptions aligned with the listings
+        offset (int, optional): Index of the listing the first description belongs to
+
+    Returns:
+        list: ListingDescriptions rows without data_id set
+    """
+    rows = []
+    if not any(descriptions):
+        return rows
+
+    for start in range(0, len(descriptions), DESCRIPTION_CHUNK_SIZE):
+        chunk = descriptions[start:start + DESCRIPTION_CHUNK_SIZE]
+        codec, payload, raw_size = compress_texts(chunk)
+        rows.append(ListingDescriptions(
+            start=offset + start,
+            count=len(chunk),
+            codec=codec,
+            payload=payload,
+            raw_size=raw_size
+        ))
+    return rows
+
+def build_summary(accumulator):
+    """
+    Wraps the statistics of a SummaryAccumulator in a ScrapeSummary row
+
+    Args:
+        accumulator (SummaryAccumulator): Accumulator that has seen every listing
+
+    Returns:
+        ScrapeSummary: New row without data_id set
+    """
+    summary = accumulator.result()
+    return ScrapeSummary(
+        listing_count=summary['listing_count'],
+        statistics=json.dumps(summary['statistics'])
+    )
+
+def _batched(iterable, size):
+    """
+    Yields lists of at most size items from iterable
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def store_listings(url, listings, pagination=None, batch_size=LISTING_BATCH_SIZE, on_batch=None):
+    """
+    Streams listings into storage in fixed-size batches
+
+    Listings are consumed from any iterable. Every batch is split into a ListingBatch row and
+    compressed descriptions, added to the summary statistics, flushed to the database and
+    released, so only one batch of listing records and JSON is held at a time. Memory use
+    still grows with the number of listings: the SummaryAccumulator keeps the float32 values
+    for exact quartiles, and the extractors return their listings as a list. Listing records
+    are converted to JSON dictionaries only here. The caller commits the transaction.
+
+    Args:
+        url (str): URL the data was scraped from
+        listings (iterable): Listing records or dictionaries
+        pagination (dict, optional): Pagination information of the scraped page
+        batch_size (int, optional): Number of listings per ListingBatch row
+        on_batch (callable, optional): Called with the number of listings stored so far after every batch
+
+    Returns:
+        ScrapedData: Flushed row with its id assigned
+    """
+    scraped_data = ScrapedData(url=url, data=json.dumps({'pagination': pagination, 'listing_batches': 0}))
+    db.session.add(scraped_data)
+    db.session.flush()
+
+    accumulator = SummaryAccumulator()
+    batch_count = 0
+    listing_count = 0
+
+    for batch in _batched(listings, batch_size):
+        records = [Listing.coerce(listing) for listing in batch]
+        hot_listings = [record.to_dict(include_description=False) for record in records]
+        descriptions = [record.description for record in records]
+
+        rows = [ListingBatch(
+            data_id=scraped_data.id,
+            seq=batch_count,
+            count=len(hot_listings),
+            listings=json.dumps(hot_listings)
+        )]
+        for row in build_description_rows(descriptions, offset=listing_count):
+            row.data_id = scraped_data.id
+            rows.append(row)
+
+        db.session.add_all(rows)
+        db.session.flush()
+        for row in rows:
+            db.session.expunge(row)
+
+        accumulator.add(records)
+        listing_count += len(records)
+        batch_count += 1
+        if on_batch is not None:
+            on_batch(listing_count)
+
+    scraped_data.data = json.dumps({'pagination': pagination, 'listing_batches': batch_count})
+    scraped_data.summary = build_summary(accumulator)
+    db.session.flush()
+
+    logger.info(f"Stored {listing_count} listings in {batch_count} batches for data ID {scraped_data.id}")
+    return scraped_data
+
+def iter_listing_batches(scraped_data):
+    """
+    Yields the listings of a scraped dataset batch by batch
+
+    Rows stored before batching existed carry all listings inline and are yielded as one batch.
+
+    Args:
+        scraped_data (ScrapedData): Row to read
+
+    Yields:
+        list: Listing dictionaries without descriptions (unless stored inline)
+    """
+    data_json = json.loads(scraped_data.data)
+    if 'listing_batches' not in data_json:
+        yield data_json.get('listings', [])
+        return
+
+    for seq in range(data_json['listing_batches']):
+        listings = (db.session.query(ListingBatch.listings)
+                    .filter_by(data_id=scraped_data.id, seq=seq)
+                    .scalar())
+        yield json.loads(listings) if listings else []
+
+def iter_listings(scraped_data):
+    """
+    Yields the listings of a scraped dataset one at a time, reading one batch at a time
+
+    Args:
+        scraped_data (ScrapedData): Row to read
+
+    Yields:
+        dict: Listing data
+    """
+    for batch in iter_listing_batches(scraped_data):
+        yield from batch
+
+def iter_listing_records(scraped_data):
+    """
+    Yields the listings of a scraped dataset as Listing records, reading one batch at a time
+
+    Args:
+        scraped_data (ScrapedData): Row to read
+
+    Yields:
+        Listing: Listing record without description (unless stored inline)
+    """
+    for listing in iter_listings(scraped_data):
+        yield Listing.from_dict(listing)
+
+def load_summary(data_id):
+    """
+    Loads the precomputed summary of a scraped dataset without reading its data column
+
+    Args:
+        data_id (int): ID of the scraped data
+
+    Returns:
+        dict: Summary with listing_count and statistics, or None if no summary is stored
+    """
+    summary = ScrapeSummary.query.filter_by(data_id=data_id).first()
+    if not summary:
+        return None
+    return {
+        'listing_count': summary.listing_count,
+        'statistics': json.loads(summary.statistics)
+    }
+
+def load_descriptions(data_id, offset=0, limit=None):
+    """
+    Loads and decompresses the descriptions of a scraped dataset
+
+    Only the chunks overlapping the requested range are read. Batches without any description
+    store no chunks, so listings outside every chunk get None, as in iter_descriptions.
+
+    Args:
+        data_id (int): ID of the scraped data
+        offset (int, optional): Index of the first listing to return descriptions for
+        limit (int, optional): Maximum number of descriptions to return
+
+    Returns:
+        list: Descriptions in listing order, None for listings without one
+    """
+    # Rows stored before batching have no batches, but their chunks cover every listing
+    total = (db.session.query(db.func.sum(ListingBatch.count))
+             .filter(ListingBatch.data_id == data_id)
+             .scalar()
+             or db.session.query(db.func.max(ListingDescriptions.start + ListingDescriptions.count))
+             .filter(ListingDescriptions.data_id == data_id)
+             .scalar()
+             or 0)
+    end = total if limit is None else min(total, offset + limit)
+    if offset >= end:
+        return []
+
+    chunks = ListingDescriptions.query.filter(
+        ListingDescriptions.data_id == data_id,
+        ListingDescriptions.start + ListingDescriptions.count > offset,
+        ListingDescriptions.start < end
+    )
+
+    descriptions = [None] * (end - offset)
+    for chunk in chunks.order_by(ListingDescriptions.start).all():
+        texts = decompress_texts(chunk.codec, chunk.payload)
+        first = max(chunk.start, offset)
+        last = min(chunk.start + len(texts), end)
+        descriptions[first - offset:last - offset] = texts[first - chunk.start:last - chunk.start]
+    return descriptions
+
+def iter_descriptions(data_id):
+    """
+    Yields the descriptions of a scraped dataset in listing order, one chunk in memory at a time
+
+    Listings without a stored description yield None. The generator never ends on its own,
+    so it can be zipped with the listings of the dataset.
+
+    Args:
+        data_id (int): ID of the scraped data
+
+    Yields:
+        str: Description or None
+    """
+    position = 0
+    last_start = -1
+    while True:
+        chunk = (ListingDescriptions.query
+                 .filter(ListingDescriptions.data_id == data_id, ListingDescriptions.start > last_start)
+                 .order_by(ListingDescriptions.start)
+                 .first())
+        if chunk is None:
+            break
+        for _ in range(chunk.start - position):
+            yield None
+        descriptions = decompress_texts(chunk.codec, chunk.payload)
+        yield from descriptions
+        position = chunk.start + len(descriptions)
+        last_start = chunk.start
+    while True:
+        yield None
+
+def load_scraped_data(scraped_data, include_descriptions=False):
+    """
+    Parses the stored structured data of a ScrapedData row
+
+    Args:
+        scraped_data (ScrapedData): Row to parse
+        include_descriptions (bool, optional): Whether to merge descriptions back into the listings
+
+    Returns:
+        dict: Structured data with listings
+    """
+    data_json = json.loads(scraped_data.data)
+    if 'listing_batches' in data_json:
+        data_json = {
+            'listings': list(iter_listings(scraped_data)),
+            'pagination': data_json.get('pagination')
+        }
+
+    if include_descriptions:
+        listings = data_json.get('listings', [])
+        # Rows stored before descriptions were split out still carry them inline
+        if listings and not any('description' in listing for listing in listings):
+            descriptions = load_descriptions(scraped_data.id)
+            for listing, description in zip(listings, descriptions):
+                listing['description'] = description
+
+    return data_json
+
+def migrate_descriptions(batch_size=100):
+    """
+    Moves inline descriptions of existing ScrapedData rows into compressed storage
+
+    Rows are processed and committed in batches; rows without inline descriptions are skipped,
+    so the migration can be re-run safely.
+
+    Args:
+        batch_size (int, optional): Number of rows per transaction
+
+    Returns:
+        dict: Migration report with keys:
+            - rows_migrated (int): Number of rewritten ScrapedData rows
+            - bytes_before (int): Size of the rewritten data columns before migration
+            - bytes_after (int): Size of the rewritten data columns plus compressed descriptions
+    """
+    report = {'rows_migrated': 0, 'bytes_before': 0, 'bytes_after': 0}
+    last_id = 0
+
+    while True:
+        rows = (ScrapedData.query
+                .options(db.undefer(ScrapedData.data))
+                .filter(ScrapedData.id > last_id)
+                .order_by(ScrapedData.id)
+                .limit(batch_size)
+                .all())
+        if not rows:
+            break
+
+        for row in rows:
+            last_id = row.id
+            data_json = json.loads(row.data)
+            listings = data_json.get('listings', [])
+            if not any('description' in listing for listing in listings):
+                continue
+
+            hot_data, descriptions = split_descriptions(data_json)
+            description_rows = build_description_rows(descriptions)
+
+            report['bytes_before'] += len(row.data.encode('utf-8'))
+            row.data = json.dumps(hot_data)
+            row.descriptions = description_rows
+            row.content_version += 1
+            report['bytes_after'] += len(row.data.encode('utf-8')) + sum(len(d.payload) for d in description_rows)
+            report['rows_migrated'] += 1
+
+        db.session.commit()
+        logger.info(f"Migrated descriptions up to ScrapedData ID {last_id}")
+
+    return report
+
+def backfill_summaries(batch_size=100):
+    """
+    Computes summaries for ScrapedData rows stored before summaries existed
+
+    Args:
+        batch_size (int, optional): Number of rows per transaction
+
+    Returns:
+        int: Number of summaries created
+    """
+    created = 0
+    last_id = 0
+
+    while True:
+        rows = (ScrapedData.query
+                .outerjoin(ScrapeSummary)
+                .filter(ScrapedData.id > last_id, ScrapeSummary.id.is_(None))
+                .order_by(ScrapedData.id)
+                .limit(batch_size)
+                .all())
+        if not rows:
+            break
+
+        for row in rows:
+            last_id = row.id
+            accumulator = SummaryAccumulator()
+            for batch in iter_listing_batches(row):
+                accumulator.add(batch)
+            row.summary = build_summary(accumulator)
+            created += 1
+
+        db.session.commit()
+        logger.info(f"Backfilled summaries up to ScrapedData ID {last_id}")
+
+    return created
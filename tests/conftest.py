@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads its configuration at import time, so the test database is set up first
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+os.environ.pop("SQLITE_PRODUCTION_MODE", None)
+os.environ.pop("SCHEDULER_ENABLED", None)
+
+from app import app as flask_app, db
+
+
+@pytest.fixture
+def app():
+    # Requests run without an outer app context, so every request tears down its session
+    # as it does under a real server
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+        db.session.remove()
+
+
+@pytest.fixture
+def make_listings():
+    """Returns a factory of listing dictionaries; descriptions is a function of the index or None"""
+    def make(count, descriptions=None):
+        return [{
+            'title': f"{i % 4 + 1}-к. квартира",
+            'price': 5000000 + 1000 * i,
+            'location': f"Москва, ул. Примерная, {i}",
+            'area': 40.0 + i % 30,
+            'rooms': i % 4 + 1,
+            'floor': f"{i % 9 + 1}/9",
+            'description': descriptions(i) if descriptions else None
+        } for i in range(count)]
+    return make
+
+
+@pytest.fixture
+def store(app):
+    """Stores listings as a committed scrape and returns its ID"""
+    from storage import store_listings
+
+    def store(listings, url="https://www.avito.ru/moskva/kvartiry", **kwargs):
+        with app.app_context():
+            scraped_data = store_listings(url, listings, **kwargs)
+            db.session.commit()
+            data_id = scraped_data.id
+            db.session.remove()
+        return data_id
+    return store
@@ -0,0 +1,51 @@
+import numpy as np
+from comparables import KDTree, FEATURE_SCALES, get_comparables_index
+
+
+def brute_force(points, point, k):
+    distances = np.sqrt(((points - point) ** 2).sum(axis=1))
+    order = np.argsort(distances, kind='stable')[:k]
+    return distances[order], order
+
+
+def test_kd_tree_matches_brute_force_nearest_neighbours():
+    rng = np.random.default_rng(3)
+    points = rng.normal(size=(2000, 3))
+    tree = KDTree(points, leaf_size=8)
+
+    for point in rng.normal(size=(30, 3)) * 1.5:
+        for k in (1, 7, 50):
+            distances, positions = tree.query(point, k)
+            expected_distances, expected_positions = brute_force(points, point, k)
+            np.testing.assert_allclose(distances, expected_distances)
+            assert list(positions) == list(expected_positions)
+
+
+def test_kd_tree_with_duplicate_points_and_large_k():
+    # Many identical points cannot be split and stay in one oversized leaf
+    points = np.array([[1.0, 1.0]] * 40 + [[float(i), 0.0] for i in range(10)])
+    tree = KDTree(points, leaf_size=4)
+
+    distances, positions = tree.query([1.0, 1.0], 45)
+    np.testing.assert_allclose(distances, brute_force(points, np.array([1.0, 1.0]), 45)[0])
+    assert set(positions[:40]) == set(range(40))
+
+    distances, positions = tree.query([0.0, 0.0], 100)
+    assert sorted(positions) == list(range(50))
+    assert len(KDTree(np.empty((0, 2))).query([0.0, 0.0], 3)[1]) == 0
+
+
+def test_comparables_index_matches_brute_force(app_context, store, make_listings):
+    listings = make_listings(300)
+    index = get_comparables_index(store(listings))
+    features = np.array([[listing['area'] / FEATURE_SCALES['area'],
+                          listing['rooms'] / FEATURE_SCALES['rooms']] for listing in listings])
+
+    comparables = index.query({'area': 52.0, 'rooms': 2}, 10, exclude=5)
+
+    point = np.array([52.0 / FEATURE_SCALES['area'], 2 / FEATURE_SCALES['rooms']])
+    distances = np.sqrt(((features - point) ** 2).sum(axis=1))
+    distances[5] = np.inf
+    expected = sorted(distances)[:10]
+    np.testing.assert_allclose([distance for distance, _ in comparables], expected)
+    assert all(np.isclose(distances[position], distance) for distance, position in comparables)
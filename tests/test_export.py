@@ -0,0 +1,43 @@
+import csv
+import io
+
+import pytest
+
+from export import pa
+
+
+def test_export_csv_streams_all_listings(client, store, make_listings):
+    data_id = store(make_listings(250), batch_size=100)
+
+    response = client.get(f'/api/data/{data_id}/export?format=csv&columns=data_id,price,floor')
+
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ['data_id', 'price', 'floor']
+    assert len(rows) == 251
+    assert rows[1] == [str(data_id), '5000000', '1']
+
+
+def test_export_several_datasets(client, store, make_listings):
+    first = store(make_listings(3))
+    second = store(make_listings(2))
+
+    response = client.get(f'/api/export?ids={second},{first}&columns=data_id')
+
+    assert response.status_code == 200
+    rows = response.get_data(as_text=True).split()
+    assert rows == ['data_id'] + [str(second)] * 2 + [str(first)] * 3
+
+
+@pytest.mark.skipif(pa is None, reason="pyarrow is not installed")
+def test_export_parquet(client, store, make_listings):
+    import pyarrow.parquet as pq
+
+    data_id = store(make_listings(120), batch_size=50)
+
+    response = client.get(f'/api/data/{data_id}/export?format=parquet&columns=price,rooms')
+
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.get_data()))
+    assert table.num_rows == 120
+    assert table.column_names == ['price', 'rooms']
@@ -0,0 +1,45 @@
+import random
+from gazetteer import AhoCorasick, get_gazetteer
+
+
+def names(matches):
+    return [(text, entry['name']) for text, entry in matches]
+
+
+def test_automaton_finds_every_occurrence_like_a_scan():
+    patterns = ["ab", "abc", "bca", "c", "aab", "ba"]
+    rng = random.Random(7)
+    automaton = AhoCorasick((pattern, pattern) for pattern in patterns)
+
+    for _ in range(50):
+        text = ''.join(rng.choice("abcAB") for _ in range(rng.randint(0, 40)))
+        expected = sorted((start, start + len(pattern), pattern)
+                          for pattern in patterns
+                          for start in range(len(text))
+                          if text.lower().startswith(pattern, start))
+        assert sorted(automaton.iter_matches(text)) == expected
+
+
+def test_gazetteer_matches_whole_words_only():
+    gazetteer = get_gazetteer()
+    text = "Москвариум рядом, до Казани 10 минут. КАЗАНЬ, ул. Баумана, 5"
+
+    found = [(text[start:end], entry) for start, end, entry in gazetteer.find(text)]
+
+    # "Москвариум" and "Казани" contain dictionary names but are other words
+    assert names(found) == [("КАЗАНЬ", "Казань"), ("ул.", "улица")]
+
+
+def test_gazetteer_prefers_longest_leftmost_alias():
+    gazetteer = get_gazetteer()
+    text = "г. Москва, Арбат, ул. Арбат 10"
+
+    found = [(text[start:end], entry) for start, end, entry in gazetteer.find(text)]
+
+    assert names(found) == [("г. Москва", "Москва"), ("Арбат", "Арбат"), ("ул.", "улица"), ("Арбат", "Арбат")]
+    assert gazetteer.extract_location(text) == {
+        'location': text,
+        'city': "Москва",
+        'district': "Арбат",
+        'street': "улица Арбат 10"
+    }
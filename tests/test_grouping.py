@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import analyzer
+from grouping import group_columns, group_listings
+
+
+def random_listings(count, seed=5):
+    rng = np.random.default_rng(seed)
+    listings = []
+    for i in range(count):
+        rooms = int(rng.integers(1, 5))
+        area = round(float(rng.normal(20 + 15 * rooms, 5)), 1)
+        total_floors = int(rng.integers(2, 20))
+        listings.append({
+            'title': f"{rooms}-к. квартира",
+            'price': float(round(area * rng.lognormal(12.3, 0.25), -3)),
+            'location': f"{('Москва', 'Казань', 'Сочи')[int(rng.choice(3, p=[0.6, 0.3, 0.1]))]}, ул. Примерная, {i}",
+            'area': area,
+            'rooms': rooms,
+            'floor': f"{int(rng.integers(1, total_floors + 1))}/{total_floors}"
+        })
+    # A few extreme prices that the IQR rule removes
+    for listing in listings[:6]:
+        listing['price'] *= 20
+    return listings
+
+
+def pandas_groups(listings, key, bins):
+    """Per-group outlier removal, statistics and histograms as the single-dataset analysis does them"""
+    frame = pd.DataFrame(listings)
+    frame['price_per_sqm'] = frame['price'] / frame['area']
+    frame['city'] = frame['location'].str.split(',').str[0]
+    cleaned = {str(label): analyzer.remove_outliers(group['price_per_sqm']) for label, group in frame.groupby(key)}
+    lower = min(data.min() for data in cleaned.values())
+    upper = max(data.max() for data in cleaned.values())
+
+    expected = {}
+    for label, data in cleaned.items():
+        stats = analyzer._basic_statistics(data)
+        stats['p25'], stats['p75'] = float(data.quantile(0.25)), float(data.quantile(0.75))
+        stats['histogram'] = np.histogram(data, bins=bins, range=(lower, upper))[0].tolist()
+        stats['outliers'] = int((frame[key].astype(str) == label).sum()) - len(data)
+        expected[label] = stats
+    return expected
+
+
+def test_group_listings_matches_pandas_per_group():
+    listings = random_listings(1500)
+    columns = group_columns(listings)
+
+    for key in ('rooms', 'city'):
+        result = group_listings(columns, [key], bins=12)
+        expected = pandas_groups(listings, key, 12)
+
+        assert sorted(result['labels']) == sorted(expected)
+        for i, label in enumerate(result['labels']):
+            stats = expected[label]
+            assert result['statistics']['count'][i] == stats['count']
+            assert result['outliers'][i] == stats['outliers']
+            assert result['histogram']['datasets'][i]['data'] == stats['histogram']
+            for name in ('mean', 'std', 'min', 'p25', 'median', 'p75', 'max'):
+                assert np.isclose(result['statistics'][name][i], stats[name], atol=0.01), (key, label, name)
+
+
+def test_group_listings_keeps_outliers_and_skips_missing_keys():
+    listings = random_listings(200)
+    listings[10]['rooms'] = None
+    columns = group_columns(listings)
+
+    result = group_listings(columns, ['rooms'], drop_outliers=False)
+
+    assert result['grouped_count'] == 199
+    assert sum(result['statistics']['count']) == 199
+    assert result['outliers'] == [0] * len(result['labels'])
@@ -0,0 +1,84 @@
+import json
+from datetime import datetime, timedelta
+from app import db
+from models import ScrapedData, AnalysisResult
+from retention import drop_analysis_images
+from storage import migrate_descriptions
+
+
+def add_row(app, row):
+    with app.app_context():
+        db.session.add(row)
+        db.session.commit()
+        row_id = row.id
+        db.session.remove()
+    return row_id
+
+
+def test_analysis_etag_changes_when_image_is_dropped(app, client, store, make_listings):
+    data_id = store(make_listings(5))
+    analysis_id = add_row(app, AnalysisResult(
+        data_id=data_id, parameter='price', title='Цена', bins=10,
+        statistics=json.dumps({'count': 5}),
+        visualization_data=json.dumps({'image_base64': 'aW1hZ2U=' * 100, 'chart_data': {}}),
+        created_at=datetime.utcnow() - timedelta(days=30)
+    ))
+
+    response = client.get(f'/api/analysis/{analysis_id}')
+    etag = response.headers['ETag']
+    assert 'immutable' not in response.headers['Cache-Control']
+    assert client.get(f'/api/analysis/{analysis_id}', headers={'If-None-Match': etag}).status_code == 304
+
+    with app.app_context():
+        assert drop_analysis_images(datetime.utcnow()) == 1
+
+    response = client.get(f'/api/analysis/{analysis_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['visualization_data']['image_base64'] is None
+
+
+def test_data_etag_changes_when_descriptions_are_migrated(app, client, make_listings):
+    listings = make_listings(3, lambda i: f"описание {i}")
+    data_id = add_row(app, ScrapedData(url="https://www.avito.ru/legacy",
+                                       data=json.dumps({'listings': listings, 'pagination': None})))
+
+    response = client.get(f'/api/data/{data_id}')
+    etag = response.headers['ETag']
+    assert response.get_json()['data']['listings'][0]['description'] == "описание 0"
+
+    with app.app_context():
+        assert migrate_descriptions()['rows_migrated'] >= 1
+
+    response = client.get(f'/api/data/{data_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'description' not in response.get_json()['data']['listings'][0]
+    assert client.get(f'/api/data/{data_id}', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_revalidation_reads_no_json_columns(app, client, store, make_listings):
+    data_id = store(make_listings(5))
+    analysis_id = add_row(app, AnalysisResult(
+        data_id=data_id, parameter='price', title='Цена', bins=10,
+        statistics=json.dumps({'count': 5}),
+        visualization_data=json.dumps({'image_base64': None, 'chart_data': {}})
+    ))
+    etags = {path: client.get(path).headers['ETag']
+             for path in (f'/api/data/{data_id}', f'/api/analysis/{analysis_id}')}
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    db.event.listen(engine, 'before_cursor_execute', record)
+    try:
+        for path, etag in etags.items():
+            assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+    finally:
+        db.event.remove(engine, 'before_cursor_execute', record)
+
+    assert statements
+    assert not [statement for statement in statements
+                if 'visualization_data' in statement or 'scraped_data.data' in statement]
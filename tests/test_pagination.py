@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from models import ScrapedData
+from pagination import keyset_page, encode_cursor, decode_cursor
+
+
+def add_scrapes(prefix, created_at):
+    rows = [ScrapedData(url=f"{prefix}{i}", data='{}', created_at=timestamp) for i, timestamp in enumerate(created_at)]
+    db.session.add_all(rows)
+    db.session.commit()
+    return rows
+
+
+def all_pages(query, limit):
+    seen, cursor = [], None
+    while True:
+        rows, cursor = keyset_page(query, ScrapedData, cursor, limit)
+        seen.append([row.id for row in rows])
+        if cursor is None:
+            return seen
+
+
+def test_keyset_pages_cover_every_row_once_with_identical_timestamps(app_context):
+    now = datetime(2026, 1, 1, 12, 0, 0, 123456)
+    # Seven rows share one timestamp, so pages must split ties by ID
+    timestamps = [now] * 7 + [now - timedelta(minutes=i) for i in range(1, 6)]
+    rows = add_scrapes("https://www.avito.ru/keyset-ties-", timestamps)
+    query = ScrapedData.query.filter(ScrapedData.url.startswith("https://www.avito.ru/keyset-ties-"))
+
+    pages = all_pages(query, 3)
+
+    expected = [row.id for row in sorted(rows, key=lambda row: (row.created_at, row.id), reverse=True)]
+    assert [row_id for page in pages for row_id in page] == expected
+    assert [len(page) for page in pages] == [3, 3, 3, 3]
+
+
+def test_keyset_page_of_an_empty_result(app_context):
+    query = ScrapedData.query.filter(ScrapedData.url == "https://www.avito.ru/keyset-none")
+
+    assert keyset_page(query, ScrapedData) == ([], None)
+    assert keyset_page(query, ScrapedData, encode_cursor(datetime(2026, 1, 1), 10)) == ([], None)
+
+
+def test_cursor_round_trip_and_malformed_cursors():
+    created_at = datetime(2026, 3, 4, 5, 6, 7, 890123)
+
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+    assert decode_cursor(encode_cursor(None, 7)) == (None, 7)
+    for cursor in ("not-a-cursor", encode_cursor(created_at, 1)[:-3], "W10"):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
@@ -0,0 +1,16 @@
+from datetime import datetime, timedelta
+from app import db
+from retention import _claim_run
+
+
+def test_retention_runs_once_per_interval_across_processes(app_context):
+    interval = timedelta(hours=1)
+    now = datetime.utcnow()
+
+    # Workers waking at about the same time: only the first one runs the policy
+    assert _claim_run('retention-test', now, interval)
+    assert not _claim_run('retention-test', now + timedelta(minutes=5), interval)
+    db.session.commit()
+
+    assert _claim_run('retention-test', now + interval, interval)
+    db.session.commit()
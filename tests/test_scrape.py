@@ -0,0 +1,217 @@
+import json
+from app import db
+from models import ScrapedData, ListingBatch
+import scraper
+import jobs
+from cache import BoundedCache
+
+
+def fake_fetch(make_listings):
+    def fetch(url, api_key=None, progress=None, validators=None):
+        return {'listings': make_listings(3), 'pagination': None}, 'trafilatura'
+    return fetch
+
+
+def test_bulk_scrape_stores_every_url(app_context, monkeypatch, make_listings):
+    monkeypatch.setattr(scraper, 'fetch_avito_data', fake_fetch(make_listings))
+    urls = [f"https://www.avito.ru/bulk-{i}" for i in range(3)]
+
+    results = scraper.scrape_avito_data_bulk(urls, max_workers=2)
+
+    assert [result['status'] for result in results] == ['success'] * 3
+    assert [result['listing_count'] for result in results] == [3] * 3
+    stored = {row.id: row.url for row in ScrapedData.query.filter(ScrapedData.url.in_(urls))}
+    assert {results[i]['data_id']: url for i, url in enumerate(urls)} == stored
+    assert ListingBatch.query.filter(ListingBatch.data_id.in_(stored)).count() == 3
+
+
+def test_bulk_scrape_commits_in_batches(app_context, monkeypatch, make_listings):
+    monkeypatch.setattr(scraper, 'fetch_avito_data', fake_fetch(make_listings))
+    batches = []
+    run_write = scraper.run_write
+
+    def counting_run_write(function, *args):
+        batches.append(function)
+        return run_write(function, *args)
+    monkeypatch.setattr(scraper, 'run_write', counting_run_write)
+    urls = [f"https://www.avito.ru/batched-{i}" for i in range(6)]
+
+    results = scraper.scrape_avito_data_bulk(urls, max_workers=2, batch_size=4)
+
+    assert [result['status'] for result in results] == ['success'] * 6
+    assert ScrapedData.query.filter(ScrapedData.url.in_(urls)).count() == 6
+    # Each URL writes its data and its flight result; batches may grow past batch_size
+    assert 1 <= len(batches) <= 3
+
+
+def test_bulk_scrape_reports_storage_errors(app_context, monkeypatch, make_listings):
+    monkeypatch.setattr(scraper, 'fetch_avito_data', fake_fetch(make_listings))
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(scraper, 'store_listings', fail)
+
+    results = scraper.scrape_avito_data_bulk(["https://www.avito.ru/bulk-error"])
+
+    assert results[0]['status'] == 'error'
+    assert results[0]['data_id'] is None
+    assert 'disk full' in results[0]['error']
+
+
+def test_bulk_scrape_coalesces_repeated_urls(app_context, monkeypatch, make_listings):
+    calls = []
+
+    def fetch(url, api_key=None, progress=None, validators=None):
+        calls.append(url)
+        return {'listings': make_listings(2), 'pagination': None}, 'trafilatura'
+    monkeypatch.setattr(scraper, 'fetch_avito_data', fetch)
+    url = "https://www.avito.ru/bulk-repeated"
+
+    results = scraper.scrape_avito_data_bulk([url, url, url + "/"], max_workers=3)
+
+    assert calls == [url]
+    assert len({result['data_id'] for result in results}) == 1
+    assert sorted(result.get('deduplicated', 'scraped') for result in results).count('scraped') == 1
+    assert ScrapedData.query.filter(ScrapedData.url.startswith(url)).count() == 1
+
+
+def test_async_scrape_bulk_coalesces_repeated_urls(monkeypatch, make_listings):
+    import asyncio
+    from aiohttp.test_utils import TestClient, TestServer
+    import async_app
+
+    calls = []
+
+    async def fetch(url, api_key=None, session=None, validators=None):
+        calls.append(url)
+        await asyncio.sleep(0.05)
+        return {'listings': make_listings(2), 'pagination': None}, 'trafilatura'
+    monkeypatch.setattr(async_app, 'fetch_avito_data_async', fetch)
+    url = "https://www.avito.ru/async-repeated"
+
+    async def run():
+        async with TestClient(TestServer(async_app.create_async_app())) as client:
+            response = await client.post('/api/scrape/bulk', json={'urls': [url, url], 'concurrency': 2})
+            return response.status, await response.json()
+
+    status, body = asyncio.run(run())
+
+    assert status == 200
+    assert body['succeeded'] == 2
+    assert calls == [url]
+    assert body['results'][0]['data_id'] == body['results'][1]['data_id']
+
+
+def test_async_scrape_bulk_caps_concurrency(app, monkeypatch, make_listings):
+    import asyncio
+    from aiohttp.test_utils import TestClient, TestServer
+    import async_app
+
+    running = []
+    peak = []
+
+    async def fetch(url, api_key=None, session=None, validators=None):
+        running.append(url)
+        peak.append(len(running))
+        await asyncio.sleep(0.02)
+        running.remove(url)
+        return {'listings': make_listings(1), 'pagination': None}, 'trafilatura'
+    monkeypatch.setattr(async_app, 'fetch_avito_data_async', fetch)
+    monkeypatch.setitem(app.config, "SCRAPE_BULK_CONCURRENCY", 2)
+    urls = [f"https://www.avito.ru/async-capped-{i}" for i in range(6)]
+
+    async def run():
+        async with TestClient(TestServer(async_app.create_async_app())) as client:
+            response = await client.post('/api/scrape/bulk', json={'urls': urls, 'concurrency': 50})
+            return response.status, await response.json()
+
+    status, body = asyncio.run(run())
+
+    assert status == 200
+    assert body['succeeded'] == 6
+    assert max(peak) == 2
+
+
+def test_async_scrape_records_fetches_and_revalidates(app, monkeypatch):
+    import os
+    import asyncio
+    from aiohttp import web
+    from aiohttp.test_utils import TestClient, TestServer
+    from trafilatura.settings import DEFAULT_CONFIG
+    import async_app
+    import singleflight
+    from models import FetchRecord
+
+    fixture = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "benchmarks", "fixtures", "avito_search_moskva.html")
+    with open(fixture, encoding="utf-8") as f:
+        html = f.read()
+
+    async def page(request):
+        if request.headers.get('If-None-Match') == '"v1"':
+            return web.Response(status=304, headers={'ETag': '"v1"'})
+        return web.Response(text=html, content_type="text/html", headers={'ETag': '"v1"'})
+
+    pages = web.Application()
+    pages.router.add_get("/{tail:.*}", page)
+    monkeypatch.setattr(singleflight, 'SCRAPE_FRESHNESS_SECONDS', 0)
+    monkeypatch.setitem(DEFAULT_CONFIG["DEFAULT"], "SSRF_PROTECTION", "off")
+
+    async def run():
+        async with TestServer(pages) as server, \
+                TestClient(TestServer(async_app.create_async_app())) as client:
+            url = str(server.make_url("/moskva/kvartiry/async-revalidate"))
+            bodies = []
+            for _ in range(2):
+                response = await client.post('/api/scrape', json={'url': url})
+                bodies.append(await response.json())
+            return url, bodies
+
+    url, (first, second) = asyncio.run(run())
+
+    assert first['success'] and second['success']
+    assert first['source'] == 'html'
+    assert second['source'] == 'not_modified'
+    assert second['data_id'] == first['data_id']
+    with app.app_context():
+        records = FetchRecord.query.filter_by(url_key=singleflight.normalize_url(url)).order_by(FetchRecord.id).all()
+        assert [(record.status_code, record.etag, record.data_id) for record in records] == \
+            [(200, '"v1"', first['data_id']), (304, '"v1"', first['data_id'])]
+        assert records[0].bytes_decoded > 0
+
+
+def test_scrape_job_events_are_served_by_other_workers(client, monkeypatch, make_listings):
+    monkeypatch.setattr(scraper, 'fetch_avito_data', fake_fetch(make_listings))
+    monkeypatch.setattr(jobs, 'SCRAPE_JOB_POLL_INTERVAL', 0.05)
+
+    response = client.post('/api/scrape/jobs', json={'url': "https://www.avito.ru/job-elsewhere"})
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    # Another worker process knows the job only from the database
+    monkeypatch.setattr(jobs, '_jobs', BoundedCache())
+
+    response = client.get(f'/api/scrape/jobs/{job_id}/events')
+    events = [json.loads(line[len('data: '):]) for line in response.get_data(as_text=True).splitlines()
+              if line.startswith('data: ')]
+
+    assert events[-1]['stage'] == 'done'
+    assert events[-1]['listing_count'] == 3
+
+    client.get(f'/scrape/jobs/{job_id}/complete')
+    with client.session_transaction() as session:
+        assert session['data_id'] == events[-1]['data_id']
+
+
+def test_bulk_routes_reject_invalid_concurrency(client):
+    import asyncio
+    from aiohttp.test_utils import TestClient, TestServer
+    import async_app
+
+    for concurrency in (True, 0, "2", 1.5):
+        payload = {'urls': ["https://www.avito.ru/bulk-invalid"], 'concurrency': concurrency}
+        assert client.post('/api/scrape/bulk', json=payload).status_code == 400
+
+        async def run():
+            async with TestClient(TestServer(async_app.create_async_app())) as async_client:
+                return (await async_client.post('/api/scrape/bulk', json=payload)).status
+        assert asyncio.run(run()) == 400
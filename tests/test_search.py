@@ -0,0 +1,41 @@
+from collections import Counter
+from search import get_listing_index
+
+
+def with_cities(listings):
+    for i, listing in enumerate(listings):
+        listing['location'] = f"{('Москва', 'Казань', 'Сочи')[i % 3]}, ул. Примерная, {i}"
+    return listings
+
+
+def listing_rooms(listing):
+    return str(listing['rooms'])
+
+
+def test_search_filters_ranges_and_facets_like_a_scan(app_context, store, make_listings):
+    listings = with_cities(make_listings(200))
+    index = get_listing_index(store(listings))
+
+    result = index.search(ranges={'price': (5020000, 5150000), 'area': (45, None)},
+                          facets={'rooms': ['1', '2']}, sort='price', descending=True, per_page=500)
+
+    in_range = [i for i, listing in enumerate(listings)
+                if 5020000 <= listing['price'] <= 5150000 and listing['area'] >= 45]
+    expected = [i for i in in_range if listing_rooms(listings[i]) in ('1', '2')]
+    assert [hit['index'] for hit in result['hits']] == sorted(expected, key=lambda i: -listings[i]['price'])
+    assert result['total'] == len(expected)
+
+    # Facet counts of a field ignore that field's own selection
+    assert result['facets']['rooms'] == dict(Counter(listing_rooms(listings[i]) for i in in_range))
+    assert result['facets']['city'] == dict(Counter(listings[i]['location'].split(',')[0] for i in expected))
+
+
+def test_search_range_bounds_are_inclusive_and_pages_follow(app_context, store, make_listings):
+    listings = make_listings(50)
+    index = get_listing_index(store(listings))
+
+    result = index.search(ranges={'price': (5010000, 5019000)}, sort='price', page=2, per_page=4)
+
+    assert result['total'] == 10
+    assert [hit['price'] for hit in result['hits']] == [5014000, 5015000, 5016000, 5017000]
+
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from scheduler import Scheduler
+
+
+def create_search(client, url="https://www.avito.ru/moskva/kvartiry/searches"):
+    response = client.post('/api/searches', json={'url': url, 'interval_minutes': 60})
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def test_update_saved_search_toggles_enabled(client):
+    search_id = create_search(client)
+
+    response = client.patch(f'/api/searches/{search_id}', json={'enabled': False})
+    assert response.status_code == 200
+    assert response.get_json()['enabled'] is False
+
+    response = client.patch(f'/api/searches/{search_id}', json={'enabled': True})
+    assert response.get_json()['enabled'] is True
+
+
+def test_update_saved_search_rejects_non_boolean_enabled(client):
+    search_id = create_search(client)
+
+    for value in ("false", 0, None):
+        response = client.patch(f'/api/searches/{search_id}', json={'enabled': value})
+        assert response.status_code == 400
+
+    searches = client.get('/api/searches').get_json()['searches']
+    assert [search['enabled'] for search in searches if search['id'] == search_id] == [True]
+
+
+def test_scheduler_waits_for_host_slot_before_global_slot(app, monkeypatch):
+    scheduler = Scheduler(app, max_concurrency=2, per_host=1)
+    started = []
+    release = threading.Event()
+
+    def scrape(search_id, url, scheduled_at):
+        started.append(search_id)
+        release.wait(5)
+    monkeypatch.setattr(scheduler, '_scrape', scrape)
+    urls = ["https://a.example/1", "https://a.example/2", "https://b.example/1"]
+    scheduler._claimed = len(urls)
+
+    async def run():
+        global_slots, host_slots = asyncio.Semaphore(2), {}
+        tasks = [asyncio.create_task(scheduler._run_search(global_slots, host_slots, i, url, None))
+                 for i, url in enumerate(urls)]
+        for _ in range(200):
+            if len(started) == 2:
+                break
+            await asyncio.sleep(0.01)
+        running = sorted(started)
+        release.set()
+        await asyncio.gather(*tasks)
+        return running
+
+    # The second search of host a waits for its host, leaving the other global slot to host b
+    assert asyncio.run(run()) == [0, 2]
+    scheduler._scrapers.shutdown()
+
+
+def test_saved_search_rejects_non_finite_interval_and_non_string_name(client):
+    for interval in ("nan", "inf", float('inf')):
+        response = client.post('/api/searches', json={'url': "https://www.avito.ru/moskva/kvartiry",
+                                                      'interval_minutes': interval})
+        assert response.status_code == 400
+
+    search_id = create_search(client)
+    for payload in ({'interval_minutes': "nan"}, {'interval_minutes': "-inf"}, {'name': {"x": [1]}}):
+        response = client.patch(f'/api/searches/{search_id}', json=payload)
+        assert response.status_code == 400
+
+
+def test_update_saved_search_reschedules_on_interval_change(client):
+    search_id = create_search(client)
+    response = client.patch(f'/api/searches/{search_id}', json={'interval_minutes': 60 * 24 * 30})
+    assert response.status_code == 200
+    search = response.get_json()
+
+    # The first run was due within an hour; the new interval moves it to about a month away
+    next_run_at = datetime.fromisoformat(search['next_run_at'])
+    assert next_run_at - datetime.utcnow() > timedelta(days=20)
@@ -0,0 +1,58 @@
+from app import db
+from models import ScrapedData
+from storage import load_descriptions, load_scraped_data
+
+
+def described_after(first):
+    return lambda i: f"d{i}" if i >= first else None
+
+
+def test_load_descriptions_fills_batches_without_descriptions(app_context, store, make_listings):
+    # Only the last of six batches has descriptions, so the first five store no chunks
+    data_id = store(make_listings(600, described_after(500)), batch_size=100)
+
+    assert load_descriptions(data_id, 0, 5) == [None] * 5
+    assert load_descriptions(data_id, 498, 4) == [None, None, 'd500', 'd501']
+    assert load_descriptions(data_id, 598) == ['d598', 'd599']
+    assert load_descriptions(data_id, 600) == []
+
+    descriptions = load_descriptions(data_id)
+    assert len(descriptions) == 600
+    assert descriptions[:500] == [None] * 500
+    assert descriptions[500:] == [f"d{i}" for i in range(500, 600)]
+
+
+def test_load_descriptions_fills_gaps_between_batches(app_context, store, make_listings):
+    data_id = store(make_listings(300, lambda i: f"d{i}" if i < 100 or i >= 200 else None), batch_size=100)
+
+    descriptions = load_descriptions(data_id, 95, 110)
+    assert descriptions == [f"d{i}" for i in range(95, 100)] + [None] * 100 + [f"d{i}" for i in range(200, 205)]
+
+
+def test_load_descriptions_without_any_descriptions(app_context, store, make_listings):
+    data_id = store(make_listings(50), batch_size=20)
+
+    assert load_descriptions(data_id, 10, 3) == [None] * 3
+
+
+def test_load_scraped_data_merges_descriptions_by_position(app_context, store, make_listings):
+    data_id = store(make_listings(600, described_after(500)), batch_size=100)
+
+    scraped_data = db.session.get(ScrapedData, data_id)
+    listings = load_scraped_data(scraped_data, include_descriptions=True)['listings']
+
+    assert len(listings) == 600
+    assert listings[0]['description'] is None
+    assert listings[499]['description'] is None
+    assert listings[500]['description'] == 'd500'
+    assert listings[599]['description'] == 'd599'
+
+
+def test_descriptions_endpoint_keeps_positions(client, store, make_listings):
+    data_id = store(make_listings(600, described_after(500)), batch_size=100)
+
+    response = client.get(f'/api/data/{data_id}/descriptions?offset=0&limit=3')
+    assert response.get_json()['descriptions'] == [None, None, None]
+
+    response = client.get(f'/api/data/{data_id}/descriptions?offset=499&limit=2')
+    assert response.get_json()['descriptions'] == [None, 'd500']
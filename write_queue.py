@@ -0,0 +1,142 @@
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from app import app, db
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+class WriteQueue:
+    """
+    Single writer thread that runs database writes and commits them in groups
+
+    With SQLite only one connection can write at a time, so concurrent request threads
+    committing on their own connections wait for each other's locks and fail with
+    "database is locked" once the busy timeout runs out. Here request threads hand their
+    writes to one thread instead. The thread runs all writes waiting in the queue (up to
+    max_batch) in a single transaction and commits once, so a burst of writes costs one
+    fsync instead of one per write.
+    """
+
+    def __init__(self, flask_app, max_batch=32):
+        """
+        Args:
+            flask_app (Flask): Application whose database the writes use
+            max_batch (int, optional): Maximum number of writes committed together
+        """
+        self.app = flask_app
+        self.max_batch = max_batch
+        self.commits = 0
+        self.writes = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Queues a write
+
+        The function runs on the writer thread with its own session (db.session) and must not
+        commit. It should return plain values such as row IDs rather than ORM objects, which
+        belong to the writer session.
+
+        Returns:
+            concurrent.futures.Future: Result of the function, set after the commit
+        """
+        future = Future()
+        self._queue.put((future, function, args, kwargs))
+        return future
+
+    def run(self, function, *args, **kwargs):
+        """
+        Runs a write on the writer thread and waits until it is committed
+
+        Returns:
+            Return value of function
+
+        Raises:
+            Exception: Whatever function or the commit raised
+        """
+        if threading.current_thread() is self._thread:
+            return function(*args, **kwargs)
+        return self.submit(function, *args, **kwargs).result()
+
+    def _loop(self):
+        with self.app.app_context():
+            while True:
+                batch = [self._queue.get()]
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        """
+        Runs a batch of writes in one transaction, falling back to one transaction per write
+        if any of them fails, so a bad write does not fail the others
+        """
+        if len(batch) > 1:
+            try:
+                results = []
+                for _, function, args, kwargs in batch:
+                    results.append(function(*args, **kwargs))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f"Batched write failed, retrying {len(batch)} writes one by one: {str(e)}")
+            else:
+                self.commits += 1
+                self.writes += len(batch)
+                for (future, _, _, _), result in zip(batch, results):
+                    future.set_result(result)
+                return
+
+        for future, function, args, kwargs in batch:
+            try:
+                result = function(*args, **kwargs)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                future.set_exception(e)
+            else:
+                self.commits += 1
+                self.writes += 1
+                future.set_result(result)
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+def run_write(function, *args, **kwargs):
+    """
+    Runs a database write and commits it
+
+    In SQLite production mode (SQLITE_PRODUCTION_MODE) the write goes through the process-wide
+    WriteQueue; otherwise it runs in the current session and is committed directly.
+
+    Args:
+        function (callable): Function performing the write without committing; it should
+            return plain values such as row IDs
+        *args, **kwargs: Arguments of function
+
+    Returns:
+        Return value of function
+    """
+    global _write_queue
+    if not app.config["SQLITE_PRODUCTION_MODE"]:
+        try:
+            result = function(*args, **kwargs)
+            db.session.commit()
+            return result
+        except Exception:
+            db.session.rollback()
+            raise
+
+    if _write_queue is None:
+        with _write_queue_lock:
+            if _write_queue is None:
+                _write_queue = WriteQueue(app, app.config["WRITE_QUEUE_MAX_BATCH"])
+    return _write_queue.run(function, *args, **kwargs)